@@ -1,19 +1,28 @@
 import asyncio
 import json
 import os
-import requests
 import base64
+import hashlib
 import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 from typing import Annotated, Literal, TypedDict, Any, Dict, List, Optional
 
 from langchain_core.tools import StructuredTool
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import AIMessageChunk, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph, START
-from langgraph.prebuilt import ToolNode
 from langgraph.graph.message import add_messages
 from pydantic import create_model, Field
 
+from tool_output import compact_tool_output, estimate_tokens, read_tool_output
+from history import HistoryManager
+from tool_runner import ToolRunner
+from tool_selector import ToolSelector
+from downloads import DOWNLOADER
+from tool_latency import TOOL_LATENCY
+
 # --- Configuration ---
 BASE_URL = "https://aihubmix.com/v1"
 # BASE_URL = None # Use default OpenAI URL
@@ -69,14 +78,15 @@ You have access to tools for controlling the browser. You MUST use them correctl
 
 **5. Content Extraction (`chrome_get_web_content`, `extract_images_from_page`)**
    - **Usage**: `chrome_get_web_content(htmlContent=False)` for text.
-   - **Usage**: `extract_images_from_page()` for images (especially on Xiaohongshu).
+   - **Usage**: `extract_images_from_page()` for images (especially on Xiaohongshu). If `hasMore` is true, page with `offset`; after scrolling, use `only_new=True`.
+   - **Long results**: Large outputs are truncated with a note like `[Output truncated: page 1/5 ...]`. Only if you need more, call `read_tool_output(handle="...", page=2)`; the first page is often enough.
 
 ### 🚨 CRITICAL RULES
 - **Arguments**: Ensure all tool arguments are valid JSON. Do not pass empty objects `{}` if the tool requires parameters.
 - **Xiaohongshu (XHS) Specifics**:
   - **Search**: The "Enter" key often fails on XHS. **ALWAYS** try to click the "Search" button/icon next to the input bar.
   - **Images**: Images are often in `background-image`. Use `extract_images_from_page`.
-  - **Anti-scraping**: Use `download_file` tool which mimics browser headers.
+  - **Anti-scraping**: Use `download_file` tool which mimics browser headers. To save several images, pass all URLs to `download_files` in one call.
 - **Errors**: If a tool returns an error, READ it. If it says "Element not found", do not retry the exact same selector. Get new selectors.
 
 ### 🏁 GOAL
@@ -87,7 +97,354 @@ Your goal is to complete the user's request efficiently. When done, provide a su
 class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
 
+# --- Session Handle ---
+# Exceptions raised by the MCP client's streams once the stdio bridge process is gone.
+CONNECTION_LOST_ERRORS = {"ClosedResourceError", "BrokenResourceError", "EndOfStream", "BrokenPipeError"}
+# How long a tool call waits for a not-yet-attached MCP session.
+DEFAULT_ATTACH_TIMEOUT = 60.0
+
+class SessionHandle:
+    """
+    Stand-in for an MCP ClientSession that can exist before (or between) connections.
+    Tools and tab leases are built against the handle; `call_tool` waits until a live
+    session is attached, so the agent graph can be built from a cached tool catalog
+    while the MCP server is still starting.
+    """
+
+    def __init__(self, session=None, attach_timeout: float = DEFAULT_ATTACH_TIMEOUT):
+        self.attach_timeout = attach_timeout
+        self._session = session
+        self._error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        # Set when a caller reports the attached session dead (see mcp_supervisor).
+        self._lost = asyncio.Event()
+        self.lost_error: Optional[BaseException] = None
+        if session is not None:
+            self._ready.set()
+
+    @property
+    def connected(self) -> bool:
+        return self._session is not None
+
+    def attach(self, session):
+        self._session = session
+        self._error = None
+        self.lost_error = None
+        self._lost.clear()
+        self._ready.set()
+
+    def report_lost(self, error: BaseException):
+        """Called by tools that saw the connection break; the supervisor reconnects."""
+        if self._session is not None and self.lost_error is None:
+            self.lost_error = error
+            self._lost.set()
+
+    async def wait_lost(self):
+        await self._lost.wait()
+
+    def detach(self, error: Optional[BaseException] = None, final: bool = False):
+        """Drops the live session. Pending and new calls wait for the next attach, or fail if `final`."""
+        self._session = None
+        self._error = error
+        if final:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    async def wait(self, timeout: Optional[float] = None):
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout or self.attach_timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"Failed to connect to MCP server within {timeout or self.attach_timeout:.0f}s")
+        if self._session is None:
+            raise ConnectionError(f"Failed to connect to MCP server: {self._error}")
+        return self._session
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None):
+        session = await self.wait()
+        return await session.call_tool(name, arguments=arguments)
+
+    async def list_tools(self):
+        session = await self.wait()
+        return await session.list_tools()
+
+# --- Tab Binding ---
+# Bridge tools that never touch the active tab, so they need no focus handling.
+TAB_INDEPENDENT_TOOLS = {
+    "get_windows_and_tabs",
+    "search_tabs_content",
+    "chrome_history",
+    "chrome_bookmark_search",
+    "chrome_bookmark_add",
+    "chrome_bookmark_delete",
+}
+
+class TabBinding:
+    """
+    Ties one agent run to its own browser tab so concurrent runs don't share the active tab.
+    `focus` is an async context manager factory (see tab_leases.TabLeaser) that makes the
+    bound tab active for the duration of one active-tab tool call; `leased_elsewhere`
+    tells whether a tab id belongs to another run's lease.
+    """
+
+    def __init__(self, tab_id: Optional[int] = None, session=None, focus=None, label: str = "", leased_elsewhere=None):
+        self.tab_id = tab_id
+        self.session = session
+        self.label = label
+        self.opened_tabs: List[int] = [tab_id] if tab_id is not None else []
+        self._focus = focus
+        self._leased_elsewhere = leased_elsewhere
+
+    def adopt(self, tab_id: Optional[int]):
+        """Follow the agent into a tab it opened (e.g. via chrome_navigate)."""
+        if tab_id is None:
+            return
+        self.tab_id = tab_id
+        if tab_id not in self.opened_tabs:
+            self.opened_tabs.append(tab_id)
+
+    def focus(self):
+        return self._focus(self) if self._focus else nullcontext()
+
+    def foreign_tabs(self, tab_ids) -> List[int]:
+        """The ids in `tab_ids` that are leased by another run."""
+        if not self._leased_elsewhere:
+            return []
+        return [tab_id for tab_id in tab_ids if self._leased_elsewhere(self, tab_id)]
+
+CURRENT_TAB: ContextVar[Optional[TabBinding]] = ContextVar("current_tab", default=None)
+
+@contextmanager
+def bound_tab(binding: TabBinding):
+    """Binds `binding` to every tool call made from the current task (and tasks it spawns)."""
+    token = CURRENT_TAB.set(binding)
+    try:
+        yield binding
+    finally:
+        CURRENT_TAB.reset(token)
+
+def navigated_tab_id(result) -> Optional[int]:
+    """Reads the tab id out of a chrome_navigate result (new tab or new window)."""
+    data = tool_result_json(result)
+    if not isinstance(data, dict):
+        return None
+    if data.get("tabId") is not None:
+        return data["tabId"]
+    tabs = data.get("tabs") or []
+    if tabs and tabs[0].get("tabId") is not None:
+        return tabs[0]["tabId"]
+    return None
+
+class ToolTimeout(asyncio.TimeoutError):
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"Tool '{name}' timed out after {timeout:.0f} seconds")
+        self.timeout = timeout
+
+async def _timed_call_tool(session, name: str, arguments: Dict[str, Any]):
+    """
+    `session.call_tool` under the tool's adaptive timeout, recording its latency.
+    Only the MCP call itself is timed, not the wait for the bound tab's focus.
+    """
+    timeout = TOOL_LATENCY.timeout_for(name)
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(session.call_tool(name, arguments=arguments), timeout=timeout)
+    except asyncio.TimeoutError:
+        TOOL_LATENCY.record(name, timeout, "timeout")
+        raise ToolTimeout(name, timeout) from None
+    except Exception:
+        TOOL_LATENCY.record(name, time.perf_counter() - started, "error")
+        raise
+    TOOL_LATENCY.record(name, time.perf_counter() - started, "error" if getattr(result, "isError", False) else "ok")
+    return result
+
+async def call_tool_in_bound_tab(session, name: str, arguments: Dict[str, Any], accepts_tab_id: bool = False):
+    """
+    Calls an MCP tool on behalf of the tab bound to the current task (if any).
+    Tools that take `tabId` get it injected; tools that act on the active tab run
+    while the bound tab holds focus. Raises ToolTimeout past the tool's adaptive timeout.
+    """
+    binding = CURRENT_TAB.get()
+    if binding is None or name in TAB_INDEPENDENT_TOOLS:
+        return await _timed_call_tool(session, name, arguments)
+    if name == "chrome_close_tabs":
+        return await _close_tabs_in_lease(session, binding, arguments)
+
+    if accepts_tab_id and binding.tab_id is not None:
+        if "tabId" not in arguments:
+            arguments = {**arguments, "tabId": binding.tab_id}
+        return await _timed_call_tool(session, name, arguments)
+
+    async with binding.focus():
+        result = await _timed_call_tool(session, name, arguments)
+        if name == "chrome_navigate" and not arguments.get("refresh"):
+            binding.adopt(navigated_tab_id(result))
+    return result
+
+async def _close_tabs_in_lease(session, binding: TabBinding, arguments: Dict[str, Any]):
+    """
+    chrome_close_tabs for a bound run: never closes a tab leased by another run.
+    Without tabIds or url the bridge would close whatever tab is active, so the
+    run's own tab is closed instead.
+    """
+    tab_ids = arguments.get("tabIds")
+    url = arguments.get("url")
+    if not tab_ids and not url:
+        if binding.tab_id is None:
+            raise RuntimeError("No tab bound to this run; pass tabIds to close specific tabs")
+        tab_ids = [binding.tab_id]
+        arguments = {**arguments, "tabIds": tab_ids}
+    if url:
+        data = tool_result_json(await session.call_tool("get_windows_and_tabs", arguments={}))
+        tab_ids = [
+            tab.get("tabId")
+            for window in (data or {}).get("windows", [])
+            for tab in window.get("tabs", [])
+            if str(tab.get("url", "")).startswith(url)
+        ]
+    foreign = binding.foreign_tabs(tab_ids or [])
+    if foreign:
+        raise RuntimeError(f"Tabs {foreign} are in use by another task and cannot be closed")
+    result = await _timed_call_tool(session, "chrome_close_tabs", arguments)
+    if not getattr(result, "isError", False):
+        binding.opened_tabs = [tab_id for tab_id in binding.opened_tabs if tab_id not in (tab_ids or [])]
+    return result
+
+# --- Page Scripts ---
+MAX_IMAGES_PER_CALL = 100
+# Smaller images (icons, spacers) are skipped by extract_images_from_page.
+MIN_IMAGE_SIZE = 40
+# Registers `handler` (a JS function body taking `payload`) under `action` in the page's
+# isolated world. chrome_send_command_to_inject_script then returns whatever the handler
+# resolves to, so results come back directly instead of through a side channel.
+PAGE_SCRIPT_TEMPLATE = """
+(function() {
+    const handlers = window.__mcpPageHandlers = window.__mcpPageHandlers || {};
+    handlers[__ACTION__] = async function(payload) { __BODY__ };
+    if (window.__mcpPageListener) return;
+    window.__mcpPageListener = true;
+    chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
+        const handler = msg && handlers[msg.action];
+        if (!handler) return;
+        let payload = msg.payload;
+        if (typeof payload === 'string') {
+            try { payload = JSON.parse(payload); } catch (e) {}
+        }
+        Promise.resolve()
+            .then(() => handler(payload || {}))
+            .then(data => sendResponse({ data }), err => sendResponse({ error: String(err) }));
+        return true;
+    });
+})();
+"""
+
+async def run_page_script(session, action: str, body: str, payload: Optional[Dict[str, Any]] = None, tab_id: Optional[int] = None):
+    """
+    Injects a handler into the target tab and invokes it, returning its JSON result.
+    Without `tab_id`, the active tab (or the tab bound to the current task) is used.
+    Raises RuntimeError when the bridge or the handler reports an error.
+    """
+    binding = CURRENT_TAB.get()
+    if tab_id is None and binding is not None:
+        tab_id = binding.tab_id
+    js_script = PAGE_SCRIPT_TEMPLATE.replace("__ACTION__", json.dumps(action)).replace("__BODY__", body)
+
+    # chrome_inject_script only targets the active tab, so inject while our tab holds focus.
+    async with (binding.focus() if binding else nullcontext()):
+        injected = await session.call_tool("chrome_inject_script", arguments={"jsScript": js_script, "type": "ISOLATED"})
+    if getattr(injected, "isError", False):
+        raise RuntimeError(f"Script injection failed: {parse_tool_output(_result_text(injected))}")
+
+    arguments = {"eventName": action, "payload": json.dumps(payload or {}, ensure_ascii=False)}
+    if tab_id is not None:
+        arguments["tabId"] = tab_id
+    response = tool_result_json(await session.call_tool("chrome_send_command_to_inject_script", arguments=arguments))
+    if not isinstance(response, dict):
+        raise RuntimeError(f"Page script '{action}' returned no response")
+    if response.get("error"):
+        raise RuntimeError(f"Page script '{action}' failed: {response['error']}")
+    return response.get("data")
+
+# Image extraction handler for run_page_script. Only <img>/<picture> elements and elements
+# likely to carry a background image (inline style or image-ish class names) are inspected,
+# and getComputedStyle is only called on those that are rendered (and near the viewport
+# when visibleOnly). The per-page seen set in the isolated world backs `onlyNew`.
+EXTRACT_IMAGES_SCRIPT = """
+const minSize = payload.minSize || 0;
+const margin = window.innerHeight;
+const rendered = (el) => {
+    const r = el.getBoundingClientRect();
+    if (r.width < minSize || r.height < minSize) return null;
+    if (payload.visibleOnly && (r.bottom < -margin || r.top > window.innerHeight + margin)) return null;
+    return r;
+};
+if (window.__mcpImagesPage !== location.href) {
+    window.__mcpImagesPage = location.href;
+    window.__mcpImagesSeen = new Set();
+}
+const seen = window.__mcpImagesSeen;
+const images = [];
+const found = new Set();
+const add = (src, type, r, meta) => {
+    if (!src || !src.startsWith('http') || found.has(src)) return;
+    found.add(src);
+    if (payload.onlyNew && seen.has(src)) return;
+    images.push({ src, type, alt: (meta || '').trim().replace(/\\s+/g, ' ').slice(0, 60),
+                  width: Math.round(r.width), height: Math.round(r.height) });
+};
+for (const img of document.querySelectorAll('img')) {
+    const r = rendered(img);
+    if (r) add(img.currentSrc || img.src || img.getAttribute('data-src'), 'img', r, img.alt || img.title);
+}
+const bgCandidates = document.querySelectorAll(
+    '[style*="background"], [class*="cover"], [class*="img"], [class*="image"], [class*="pic"], [class*="photo"], [class*="avatar"]'
+);
+for (const el of bgCandidates) {
+    if (el.tagName === 'IMG') continue;
+    const r = rendered(el);
+    if (!r) continue;
+    const bg = getComputedStyle(el).backgroundImage;
+    const match = bg && bg.match(/url\\(["']?(.*?)["']?\\)/);
+    if (match) add(match[1], 'bg', r, el.getAttribute('aria-label') || el.title);
+}
+const page = images.slice(payload.offset, payload.offset + payload.limit);
+page.forEach(image => seen.add(image.src));
+return {
+    url: location.href,
+    total: images.length,
+    offset: payload.offset,
+    count: page.length,
+    hasMore: payload.offset + page.length < images.length,
+    images: page,
+};
+"""
+
+def _result_text(result) -> str:
+    return "\n".join(c.text for c in (result.content or []) if c.type == "text")
+
 # --- Helper: Output Parser ---
+def tool_result_json(result) -> Optional[Any]:
+    """Extracts the JSON payload from a bridge tool result (handles the nested bridge envelope)."""
+    if result is None or getattr(result, "isError", False):
+        return None
+    for content in result.content or []:
+        if content.type != "text":
+            continue
+        try:
+            data = json.loads(content.text)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if isinstance(data, dict) and isinstance(data.get("data"), dict):
+            inner = data["data"].get("content") or []
+            if isinstance(inner, list) and inner:
+                try:
+                    return json.loads(inner[0].get("text", ""))
+                except (json.JSONDecodeError, TypeError):
+                    return None
+        return data
+    return None
+
 def parse_tool_output(raw_output):
     """Parses the nested JSON output from the bridge."""
     try:
@@ -122,9 +479,10 @@ def parse_tool_output(raw_output):
             inner_data = json.loads(text_content)
             if isinstance(inner_data, dict):
                 # If it has a 'message', return that (it's usually the human readable part)
+                # Compact separators: indentation only costs prompt tokens on every later turn
                 if "message" in inner_data:
-                    return f"✅ {inner_data['message']}\n\nFull Data: {json.dumps(inner_data, indent=2, ensure_ascii=False)}"
-                return json.dumps(inner_data, indent=2, ensure_ascii=False)
+                    return f"✅ {inner_data['message']}\n\nFull Data: {json.dumps(inner_data, ensure_ascii=False, separators=(',', ':'))}"
+                return json.dumps(inner_data, ensure_ascii=False, separators=(",", ":"))
         except:
             pass
             
@@ -133,44 +491,61 @@ def parse_tool_output(raw_output):
         return f"Error parsing output: {str(e)}\nRaw: {raw_output}"
 
 # --- Local Tools ---
-def download_file(url: str, filename: str = None) -> str:
+async def download_file(url: str, filename: str = None) -> str:
     """
     Downloads a file from a URL to the local 'downloads' folder.
     Includes headers to mimic a real browser to avoid 403/404 errors.
+    Files are stored by content hash; `filename` only hints the extension.
     """
-    try:
-        if not os.path.exists("downloads"):
-            os.makedirs("downloads")
-            
-        if not filename:
-            # Clean filename from URL
-            filename = url.split("/")[-1].split("?")[0] or "downloaded_file"
-            if not "." in filename:
-                filename += ".jpg" # Default extension
-            
-        filepath = os.path.join("downloads", filename)
-        
-        print(f"[TOOL] Downloading {url} to {filepath}...")
-        
-        # Mimic Chrome to avoid anti-scraping
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": "https://www.xiaohongshu.com/",
-            "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
-        }
-        
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        with open(filepath, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                
-        return f"✅ Successfully downloaded to: {filepath}"
-    except Exception as e:
-        return f"❌ Download failed: {str(e)}"
+    print(f"[TOOL] Downloading {url}...")
+    result = await DOWNLOADER.download(url, filename)
+    if result["status"] != "ok":
+        return f"❌ Download failed: {result['error']}"
+    note = " (already downloaded)" if result["duplicate"] else ""
+    return f"✅ Successfully downloaded to: {result['path']}{note}"
+
+async def download_files(urls: List[str]) -> str:
+    """
+    Downloads many files concurrently to the local 'downloads' folder.
+    Returns per-file status plus total bytes and throughput.
+    """
+    print(f"[TOOL] Downloading {len(urls)} files...")
+    summary = await DOWNLOADER.download_many(urls)
+    print(f"[TOOL] Downloaded {summary['ok']}/{len(summary['files'])} files, "
+          f"{summary['total_bytes']} bytes in {summary['seconds']}s")
+    for entry in summary["files"]:
+        entry.pop("sha256", None)
+    return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """Stable hash of a JSON schema (key order independent)."""
+    payload = json.dumps(schema or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def tool_schema_fingerprint(tools_list) -> str:
+    """
+    Hashes a `list_tools()` result (names, descriptions and input schemas).
+    Two sessions with the same fingerprint can share tool models and agent graphs.
+    """
+    entries = sorted(
+        (t.name, t.description or "", schema_hash(t.inputSchema or {}))
+        for t in tools_list.tools
+    )
+    return hashlib.sha256(json.dumps(entries, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# Generated arg models keyed by (tool name, schema hash); create_model is the slow part of tool setup.
+_ARGS_MODEL_CACHE: Dict[str, Any] = {}
 
 def create_pydantic_model_from_schema(name: str, schema: Dict[str, Any]):
+    cache_key = f"{name}:{schema_hash(schema)}"
+    cached = _ARGS_MODEL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    model = _build_pydantic_model_from_schema(name, schema)
+    _ARGS_MODEL_CACHE[cache_key] = model
+    return model
+
+def _build_pydantic_model_from_schema(name: str, schema: Dict[str, Any]):
     properties = schema.get("properties", {})
     required = schema.get("required", [])
     
@@ -200,12 +575,14 @@ def create_pydantic_model_from_schema(name: str, schema: Dict[str, Any]):
     return create_model(f"{name}Schema", **fields)
 
 # --- Tool Factory ---
-async def create_mcp_tools(session):
+async def create_mcp_tools(session, tools_list=None):
     """
     Dynamically creates LangChain tools from an MCP session.
-    Includes argument unwrapping and timeouts.
+    Includes argument unwrapping and per-tool adaptive timeouts (see tool_latency).
+    Pass `tools_list` to reuse a `list_tools()` result that was already fetched.
     """
-    tools_list = await session.list_tools()
+    if tools_list is None:
+        tools_list = await session.list_tools()
     langchain_tools = []
 
     # 1. Add MCP Tools
@@ -221,8 +598,10 @@ async def create_mcp_tools(session):
              except Exception as e:
                  print(f"Warning: Could not create schema for {tool_name}: {e}")
 
+        accepts_tab_id = "tabId" in (tool_info.inputSchema or {}).get("properties", {})
+
         # Factory to capture the specific tool_name for this iteration
-        def create_tool_wrapper(name):
+        def create_tool_wrapper(name, accepts_tab_id):
             async def _dynamic_tool(**kwargs):
                 # 1. Unwrap arguments (Fix for LangChain/DeepSeek kwargs issue)
                 actual_args = kwargs
@@ -232,12 +611,18 @@ async def create_mcp_tools(session):
                 print(f"\n[AGENT] Calling Tool: {name}")
                 print(f"[AGENT] Args: {json.dumps(actual_args, ensure_ascii=False)}")
 
+                # Don't spend the tool's timeout waiting for the MCP session to (re)attach
+                wait_for_session = getattr(session, "wait", None)
+                if wait_for_session is not None:
+                    try:
+                        await wait_for_session()
+                    except ConnectionError as e:
+                        print(f"\n[CRITICAL] Connection to MCP server lost: {e}")
+                        raise ConnectionError("MCP Connection Lost") from e
+
                 try:
-                    # 2. Call with Timeout (30s)
-                    result = await asyncio.wait_for(
-                        session.call_tool(name, arguments=actual_args),
-                        timeout=30.0
-                    )
+                    # 2. Call with the tool's adaptive timeout (derived from its observed latencies)
+                    result = await call_tool_in_bound_tab(session, name, actual_args, accepts_tab_id)
                     
                     # 3. Format Output
                     output = ""
@@ -265,17 +650,24 @@ async def create_mcp_tools(session):
                     
                     parsed_output = parse_tool_output(output.strip())
                     print(f"[TOOL] Result: {parsed_output[:200]}...") # Log summary
-                    return parsed_output
+                    # 4. Enforce the tool's token budget (oversized output is paged via read_tool_output)
+                    return compact_tool_output(name, parsed_output)
 
-                except asyncio.TimeoutError:
-                    err_msg = f"Error: Tool '{name}' timed out after 30 seconds."
+                except ToolTimeout as e:
+                    err_msg = f"Error: {e}."
                     print(f"[TOOL] {err_msg}")
                     return err_msg
                 except Exception as e:
                     err_msg = str(e)
                     # Detect critical connection errors
-                    if "Failed to connect" in err_msg or "Broken pipe" in err_msg or "Connection refused" in err_msg:
-                        print(f"\n[CRITICAL] Connection to MCP server lost: {err_msg}")
+                    if (
+                        "Failed to connect" in err_msg or "Broken pipe" in err_msg or "Connection refused" in err_msg
+                        or type(e).__name__ in CONNECTION_LOST_ERRORS
+                    ):
+                        print(f"\n[CRITICAL] Connection to MCP server lost: {err_msg or type(e).__name__}")
+                        report_lost = getattr(session, "report_lost", None)
+                        if report_lost is not None:
+                            report_lost(e)
                         raise ConnectionError("MCP Connection Lost") from e
                     
                     err_msg = f"Error calling {name}: {err_msg}"
@@ -284,7 +676,7 @@ async def create_mcp_tools(session):
             return _dynamic_tool
 
         # Create the wrapper
-        tool_func = create_tool_wrapper(tool_name)
+        tool_func = create_tool_wrapper(tool_name, accepts_tab_id)
         tool_func.__name__ = tool_name
         tool_func.__doc__ = tool_description
         
@@ -300,106 +692,102 @@ async def create_mcp_tools(session):
     
     # 2. Add Local Tools
     langchain_tools.append(StructuredTool.from_function(
-        func=download_file,
+        func=None,
+        coroutine=download_file,
         name="download_file",
         description="Downloads a file from a URL to the local 'downloads' folder. Use this to save images or files."
     ))
 
+    langchain_tools.append(StructuredTool.from_function(
+        func=None,
+        coroutine=download_files,
+        name="download_files",
+        description="Downloads many files (e.g. all images of a note) concurrently to the local 'downloads' folder. Prefer this over repeated download_file calls."
+    ))
+
+    langchain_tools.append(StructuredTool.from_function(
+        func=read_tool_output,
+        name="read_tool_output",
+        description="Reads the next page of a tool result that was truncated. Pass the handle and page number from the truncation note."
+    ))
+
     # 3. Add Image Extraction Tool (Specialized for XHS)
-    async def extract_images_from_page():
+    async def extract_images_from_page(offset: int = 0, limit: int = 30, only_new: bool = False, visible_only: bool = True):
         """
-        Scans the current page for all images, including hidden CSS background-images.
+        Scans the current page for images, including CSS background-images.
         Useful for sites like Xiaohongshu where images are not simple <img> tags.
         """
-        # JS to find images and set document.title
-        js_script = """
-        (function() {
-            const images = [];
-            const seen = new Set();
-            
-            function add(src, type, meta) {
-                if (src && src.startsWith('http') && !seen.has(src)) {
-                    seen.add(src);
-                    images.push({src, type, meta: meta.trim().replace(/\\n/g, ' ')});
-                }
-            }
-
-            document.querySelectorAll('img').forEach(img => {
-                add(img.src, 'img', img.alt || img.title || '');
-            });
-
-            document.querySelectorAll('div, span, a, section').forEach(el => {
-                const style = window.getComputedStyle(el);
-                const bg = style.backgroundImage;
-                if (bg && bg.startsWith('url(')) {
-                    const url = bg.slice(4, -1).replace(/["']/g, "");
-                    add(url, 'bg', el.innerText.slice(0, 30));
-                }
-            });
-            
-            const result = JSON.stringify(images.slice(0, 50));
-            document.title = "MCP_IMAGES_RESULT:" + result;
-        })();
-        """
         print(f"\n[AGENT] Calling Tool: extract_images_from_page")
+        payload = {
+            "offset": max(0, offset),
+            "limit": max(1, min(limit, MAX_IMAGES_PER_CALL)),
+            "onlyNew": only_new,
+            "visibleOnly": visible_only,
+            "minSize": MIN_IMAGE_SIZE,
+        }
         try:
-            # 1. Inject Script
-            # Note: chrome_inject_script expects 'jsScript' and 'type'='js'
-            await session.call_tool("chrome_inject_script", arguments={"jsScript": js_script, "type": "js"})
-            
-            # 2. Read Title
-            await asyncio.sleep(0.5)
-            content_result = await session.call_tool("chrome_get_web_content", arguments={})
-            
-            # Parse output
-            title = ""
-            if content_result.content:
-                for content in content_result.content:
-                    if content.type == "text":
-                        try:
-                            # The tool returns a JSON string
-                            data = json.loads(content.text)
-                            if isinstance(data, dict):
-                                title = data.get("title", "")
-                        except:
-                            pass
-            
-            if title.startswith("MCP_IMAGES_RESULT:"):
-                json_str = title.replace("MCP_IMAGES_RESULT:", "", 1)
-                return json_str
-            else:
-                return "[]" # No images found or script failed
-            
+            data = await run_page_script(session, "extractImages", EXTRACT_IMAGES_SCRIPT, payload)
         except Exception as e:
             return f"Error extracting images: {str(e)}"
+        if not isinstance(data, dict):
+            return "[]" # No images found or script failed
+        return compact_tool_output("extract_images_from_page", json.dumps(data, ensure_ascii=False))
 
     langchain_tools.append(StructuredTool.from_function(
         func=None,
         coroutine=extract_images_from_page,
         name="extract_images_from_page",
-        description="Scans the current page for all images, including hidden CSS background-images. Returns a list of image URLs."
+        description=(
+            "Scans the current page for images, including CSS background-images. Returns image URLs with "
+            "`total` and `hasMore`. Page with offset/limit. After scrolling, pass only_new=True to get only "
+            "images not returned before on this page. visible_only=False also scans off-screen images."
+        )
     ))
         
     return langchain_tools
 
 # --- Graph Builder ---
-def build_agent_graph(tools, checkpointer=None, interrupt=True):
-    """Builds the LangGraph agent."""
+def build_agent_graph(
+    tools,
+    checkpointer=None,
+    interrupt=True,
+    history_manager: Optional[HistoryManager] = None,
+    tool_runner: Optional[ToolRunner] = None,
+    tool_selector: Optional[ToolSelector] = None,
+):
+    """
+    Builds the LangGraph agent. With `tool_selector`, each turn binds only the tools it
+    selects for the task (tools should then be `tool_selector.tools`, which adds the
+    request_more_tools escape hatch).
+    """
+    history = history_manager or HistoryManager()
+    # Read-only tool calls of one turn run concurrently; mutating ones keep their order
+    runner = tool_runner or ToolRunner(tools)
     
     llm = ChatOpenAI(
         base_url=BASE_URL,
         api_key=API_KEY,
         model="gpt-5-chat-latest",
         temperature=0,
+        # Emit token callbacks so astream(stream_mode="messages") sees partial text.
+        streaming=True,
     )
     
-    llm_with_tools = llm.bind_tools(tools)
+    llm_with_tools = llm.bind_tools(tools) if tool_selector is None else None
+    system_tokens = estimate_tokens(SYSTEM_PROMPT)
 
-    def agent_node(state: AgentState):
+    async def agent_node(state: AgentState, config: RunnableConfig):
         messages = state["messages"]
-        # Prepend System Prompt
-        full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
-        response = llm_with_tools.invoke(full_messages)
+        # Prepend System Prompt; older history is compacted so each turn's prompt stays bounded
+        full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + history.prepare(messages)
+        bound_llm = llm_with_tools
+        if tool_selector is not None:
+            # Bind only the tools relevant to the current task (the schemas are a large fixed cost)
+            selected = tool_selector.select(messages, prompt_tokens=system_tokens + history.stats["last_tokens_out"])
+            bound_llm = tool_selector.bind(llm, selected)
+        # Async call keeps the event loop free during the LLM turn; passing config
+        # forwards the run's callbacks so tokens are streamed to astream consumers.
+        response = await bound_llm.ainvoke(full_messages, config=config)
         return {"messages": [response]}
 
     def should_continue(state: AgentState) -> Literal["tools", END]:
@@ -411,7 +799,7 @@ def build_agent_graph(tools, checkpointer=None, interrupt=True):
 
     workflow = StateGraph(AgentState)
     workflow.add_node("agent", agent_node)
-    workflow.add_node("tools", ToolNode(tools))
+    workflow.add_node("tools", runner)
 
     workflow.add_edge(START, "agent")
     workflow.add_conditional_edges("agent", should_continue)
@@ -419,3 +807,16 @@ def build_agent_graph(tools, checkpointer=None, interrupt=True):
 
     interrupt_before = ["tools"] if (checkpointer and interrupt) else None
     return workflow.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
+
+async def stream_agent(agent, inputs, config):
+    """
+    Runs the agent and yields ("token", text) for partial assistant text as it is
+    generated, and ("update", event) for each node update (same shape as astream()).
+    """
+    async for mode, chunk in agent.astream(inputs, config=config, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if isinstance(message, AIMessageChunk) and metadata.get("langgraph_node") == "agent" and message.content:
+                yield "token", message.content
+        else:
+            yield "update", chunk
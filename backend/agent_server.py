@@ -2,20 +2,33 @@ import asyncio
 import os
 import sys
 import json
-from contextlib import asynccontextmanager
+import time
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import replace
 from typing import List, Dict, Any
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal, Dict, Any
+from typing import Optional, List, Literal, Dict, Any, Union
 from langchain_core.tools import StructuredTool
 from langchain_core.messages import ToolMessage
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from langgraph.checkpoint.memory import MemorySaver
+from mcp import StdioServerParameters
 
-from agent_core import create_mcp_tools, build_agent_graph
+from agent_core import SessionHandle, create_mcp_tools, build_agent_graph, bound_tab, stream_agent
 from session_manager import inject_session
+from checkpoint import BoundedMemorySaver
+from sqlite_checkpoint import DEFAULT_DB_PATH, SQLiteSaver
+from canvas_state import CanvasStateCache, CanvasUpdate, CanvasVersionMismatch, render_canvas_context
+from tab_leases import TabLeaser
+from tool_runner import ToolRunner
+from downloads import DOWNLOADER
+from tool_catalog import ToolCatalog, DEFAULT_CATALOG_PATH
+from tool_latency import TOOL_LATENCY
+from mcp_supervisor import MCPSupervisor
+from job_queue import Job, JobQueue, JobQueueFull
+from intent_router import IntentRouter
+from tool_selector import ToolSelector, task_message
 
 # --- Configuration ---
 # Adjust path if necessary, matching agent_chrome.py
@@ -25,6 +38,33 @@ SERVER_PARAMS = StdioServerParameters(
     env=None
 )
 
+# Conversation threads: one per client/canvas, bounded in count, age and memory.
+DEFAULT_THREAD_ID = "server_thread"
+MAX_THREADS = int(os.getenv("AGENT_MAX_THREADS", "200"))
+THREAD_TTL_SECONDS = float(os.getenv("AGENT_THREAD_TTL", str(2 * 60 * 60)))
+CHECKPOINT_MAX_BYTES = int(os.getenv("AGENT_CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+# "sqlite" keeps threads across restarts; "memory" keeps them in-process only.
+CHECKPOINTER = os.getenv("AGENT_CHECKPOINTER", "sqlite")
+CHECKPOINT_DB = os.getenv("AGENT_CHECKPOINT_DB", DEFAULT_DB_PATH)
+# Persisted threads outlive restarts, so they expire much later than in-memory ones.
+CHECKPOINT_TTL_SECONDS = float(os.getenv("AGENT_CHECKPOINT_TTL", str(7 * 24 * 60 * 60)))
+# Runs on different threads execute concurrently, each in its own browser tab.
+MAX_CONCURRENT_TABS = int(os.getenv("AGENT_MAX_TABS", "4"))
+# Publishing runs as background jobs: at most this many at once, this many more waiting.
+PUBLISH_WORKERS = int(os.getenv("AGENT_PUBLISH_WORKERS", "2"))
+PUBLISH_MAX_QUEUED = int(os.getenv("AGENT_PUBLISH_MAX_QUEUED", "20"))
+# Tools bound per agent turn besides the always-bound and already-used ones (0 binds every tool).
+TOOL_TOP_K = int(os.getenv("AGENT_TOOL_TOP_K", "10"))
+# Cached list_tools() result; lets the agent serve requests before the MCP server is up.
+CATALOG = ToolCatalog(os.getenv("AGENT_TOOL_CATALOG", DEFAULT_CATALOG_PATH))
+# Tool calls made before the MCP session is attached wait this long for it.
+MCP_ATTACH_TIMEOUT = float(os.getenv("AGENT_MCP_ATTACH_TIMEOUT", "60"))
+# Without a cached catalog, startup waits this long for the bridge, then serves degraded (503) until it connects.
+MCP_STARTUP_TIMEOUT = float(os.getenv("AGENT_MCP_STARTUP_TIMEOUT", "60"))
+# Bounds for the adaptive per-tool timeouts (per-tool clamps live in tool_latency.py).
+TOOL_LATENCY.floor = float(os.getenv("AGENT_TOOL_TIMEOUT_FLOOR", str(TOOL_LATENCY.floor)))
+TOOL_LATENCY.ceiling = float(os.getenv("AGENT_TOOL_TIMEOUT_CEILING", str(TOOL_LATENCY.ceiling)))
+
 # --- Canvas Tool Definition ---
 class CanvasStyle(BaseModel):
     color: Optional[str] = None
@@ -63,60 +103,178 @@ def modify_canvas(rationale: str, actions: List[CanvasAction], suggestions: List
 
 # Global State
 class AppState:
-    session: ClientSession = None
+    # SessionHandle: tools and tab leases call through it; the live session is attached later
+    handle: SessionHandle = None
     agent = None
-    config = None
-    exit_stack = None
+    memory: Union[SQLiteSaver, BoundedMemorySaver] = None
+    tabs: TabLeaser = None
+    tool_runner: ToolRunner = None
+    tool_selector: ToolSelector = None
+    jobs: JobQueue = None
+    router: IntentRouter = None
+    canvases: CanvasStateCache = CanvasStateCache()
+    supervisor: MCPSupervisor = None
+    connection_task: asyncio.Task = None
+    shutdown: asyncio.Event = None
+    tools_ready: asyncio.Future = None
+    started_at: float = 0.0
+    startup: Dict[str, Any] = {}
+    thread_locks: Dict[str, asyncio.Lock] = {}
+    thread_lock_users: Dict[str, int] = {}
 
 state = AppState()
 
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
+
+@asynccontextmanager
+async def thread_run(thread_id: str, browser: bool = True):
+    """
+    Serializes runs within one conversation thread (its history is sequential) while
+    letting different threads run concurrently, each bound to its own browser tab.
+    With browser=False no tab is leased; take one later with `thread_tab()`.
+    """
+    lock = state.thread_locks.setdefault(thread_id, asyncio.Lock())
+    state.thread_lock_users[thread_id] = state.thread_lock_users.get(thread_id, 0) + 1
+    try:
+        async with lock:
+            with state.memory.in_use(thread_id):
+                if not browser:
+                    yield thread_config(thread_id)
+                    return
+                async with thread_tab(thread_id):
+                    yield thread_config(thread_id)
+    finally:
+        state.thread_lock_users[thread_id] -= 1
+        if not state.thread_lock_users[thread_id]:
+            del state.thread_lock_users[thread_id]
+            state.thread_locks.pop(thread_id, None)
+
+@asynccontextmanager
+async def thread_tab(thread_id: str):
+    """Leases a browser tab for the thread and binds it to the current task."""
+    async with state.tabs.lease(state.handle, label=thread_id) as binding:
+        with bound_tab(binding):
+            yield binding
+
+async def build_tools_and_agent(tools_list):
+    """Builds the tool set (against the session handle) and the agent graph for `tools_list`."""
+    started = time.perf_counter()
+    # With tools_list given, create_mcp_tools never touches the (possibly unattached) session.
+    tools = await create_mcp_tools(state.handle, tools_list=tools_list)
+
+    # Add the Canvas Modification Tool
+    canvas_tool = StructuredTool.from_function(
+        func=modify_canvas,
+        name="modify_canvas",
+        description="Modify the user's canvas (add/update/delete elements).",
+        args_schema=ModifyCanvasSchema
+    )
+    tools.append(canvas_tool)
+    # Canvas-only requests skip the browser agent (see intent_router.py)
+    if state.router is None:
+        state.router = IntentRouter(canvas_tool)
+
+    # Each turn binds only the tools relevant to the task (plus a request_more_tools escape hatch)
+    state.tool_selector = ToolSelector(tools, top_k=TOOL_TOP_K) if TOOL_TOP_K > 0 else None
+    if state.tool_selector:
+        tools = state.tool_selector.tools
+
+    # Disable interrupts for the server so it executes tools automatically
+    state.tool_runner = ToolRunner(tools)
+    state.agent = build_agent_graph(
+        tools,
+        checkpointer=state.memory,
+        interrupt=False,
+        tool_runner=state.tool_runner,
+        tool_selector=state.tool_selector,
+    )
+    state.startup["graph_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Agent ready with {len(tools)} tools.")
+
+async def prepare_session(session):
+    """
+    Runs on every (re)connect before the session is attached: injects cookies when
+    they are stale and reconciles the tool catalog with the live tool list.
+    """
+    timings = state.startup
+    first = "mcp_connect_seconds" not in timings
+    if first:
+        timings["mcp_connect_seconds"] = round(time.perf_counter() - state.started_at, 3)
+    print("Connected to MCP Server.")
+
+    # Inject Session (Cookies); skipped by inject_session while the injected session is fresh
+    print("Injecting session cookies...")
+    inject_started = time.perf_counter()
+    await inject_session(session)
+    if first:
+        timings["inject_seconds"] = round(time.perf_counter() - inject_started, 3)
+
+    tools_list = await session.list_tools()
+    if state.agent is None or not CATALOG.is_current(tools_list):
+        if state.agent is not None:
+            print("[STARTUP] MCP tool schemas changed since the cached catalog; rebuilding agent.")
+            timings["catalog"] = "drift"
+        await build_tools_and_agent(tools_list)
+        CATALOG.save(tools_list)
+
+    if first:
+        timings["attached_seconds"] = round(time.perf_counter() - state.started_at, 3)
+        print(f"[STARTUP] MCP session attached after {timings['attached_seconds']:.2f}s")
+    if not state.tools_ready.done():
+        state.tools_ready.set_result(True)
+    if state.startup.get("degraded"):
+        state.startup["degraded"] = False
+        print("[STARTUP] MCP bridge connected; agent available")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("=== Starting MCP Agent Server ===")
+    state.started_at = time.perf_counter()
     
     # Windows asyncio fix
     if sys.platform.startswith('win'):
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-    # We need to manually manage the context managers since they are async
-    # and we want them to persist across requests.
-    # Using an ExitStack would be cleaner but async exit stack is Python 3.7+
-    from contextlib import AsyncExitStack
-    state.exit_stack = AsyncExitStack()
+    state.handle = SessionHandle(attach_timeout=MCP_ATTACH_TIMEOUT)
+    state.shutdown = asyncio.Event()
+    state.tools_ready = asyncio.get_running_loop().create_future()
+    # Initialize Memory (bounded: per-thread checkpoints are pruned, idle threads evicted)
+    if CHECKPOINTER == "sqlite":
+        state.memory = SQLiteSaver(CHECKPOINT_DB, ttl=CHECKPOINT_TTL_SECONDS)
+        print(f"Checkpoints: {CHECKPOINT_DB}")
+    else:
+        state.memory = BoundedMemorySaver(
+            max_threads=MAX_THREADS,
+            ttl=THREAD_TTL_SECONDS,
+            max_bytes=CHECKPOINT_MAX_BYTES,
+        )
+    state.tabs = TabLeaser(max_tabs=MAX_CONCURRENT_TABS)
+    state.jobs = JobQueue(max_workers=PUBLISH_WORKERS, max_queued=PUBLISH_MAX_QUEUED)
+    state.jobs.start()
 
     try:
-        # 1. Connect to MCP Server
-        read, write = await state.exit_stack.enter_async_context(stdio_client(SERVER_PARAMS))
-        state.session = await state.exit_stack.enter_async_context(ClientSession(read, write))
-        
-        await state.session.initialize()
-        print("Connected to MCP Server.")
-
-        # 2. Inject Session (Cookies)
-        print("Injecting session cookies...")
-        await inject_session(state.session)
-
-        # 3. Create Tools & Agent
-        print("Creating tools...")
-        tools = await create_mcp_tools(state.session)
-        
-        # Add the Canvas Modification Tool
-        tools.append(StructuredTool.from_function(
-            func=modify_canvas,
-            name="modify_canvas",
-            description="Modify the user's canvas (add/update/delete elements).",
-            args_schema=ModifyCanvasSchema
-        ))
-        
-        # Initialize Memory
-        memory = MemorySaver()
-        # Disable interrupts for the server so it executes tools automatically
-        state.agent = build_agent_graph(tools, checkpointer=memory, interrupt=False)
-        
-        # Config for the agent
-        state.config = {"configurable": {"thread_id": "server_thread"}, "recursion_limit": 50}
-        
-        print(f"Agent ready with {len(tools)} tools.")
+        # 1. Build the agent from the cached tool catalog; the MCP session is attached when it is up
+        cached_tools = CATALOG.load()
+        if cached_tools is not None:
+            state.startup["catalog"] = "hit"
+            await build_tools_and_agent(cached_tools)
+        else:
+            state.startup["catalog"] = "miss"
+
+        # 2. Connect to MCP Server in the background (reconnects with backoff if the bridge dies)
+        state.supervisor = MCPSupervisor(SERVER_PARAMS, state.handle, on_session=prepare_session)
+        state.connection_task = asyncio.create_task(state.supervisor.run(state.shutdown))
+        if state.agent is None:
+            # First start: the graph needs the live tool list.
+            try:
+                await asyncio.wait_for(asyncio.shield(state.tools_ready), MCP_STARTUP_TIMEOUT)
+            except asyncio.TimeoutError:
+                state.startup["degraded"] = True
+                print(f"[STARTUP] MCP bridge not up after {MCP_STARTUP_TIMEOUT:.0f}s; serving degraded until it connects")
+
+        state.startup["ready_seconds"] = round(time.perf_counter() - state.started_at, 3)
+        print(f"[STARTUP] Ready for requests after {state.startup['ready_seconds']:.2f}s (catalog {state.startup['catalog']})")
         
         yield
         
@@ -125,33 +283,72 @@ async def lifespan(app: FastAPI):
         raise e
     finally:
         print("Shutting down MCP Agent Server...")
-        if state.exit_stack:
-            await state.exit_stack.aclose()
+        await state.jobs.stop()
+        await DOWNLOADER.aclose()
+        state.shutdown.set()
+        if state.connection_task:
+            await asyncio.gather(state.connection_task, return_exceptions=True)
+        if isinstance(state.memory, SQLiteSaver):
+            state.memory.close()
 
 app = FastAPI(lifespan=lifespan)
 
+def repair_history(config: Dict[str, Any]):
+    """Debug: Inspect the thread's current history & repair dangling tool calls if needed."""
+    try:
+        current_state = state.agent.get_state(config)
+        if current_state and current_state.values:
+            msgs = current_state.values.get("messages", [])
+            print(f"[API] Current History ({len(msgs)} messages):")
+            for i, m in enumerate(msgs):
+                tc = getattr(m, 'tool_calls', [])
+                print(f"  {i}. {m.type}: {str(m.content)[:50]}... ToolCalls: {len(tc)}")
+                if tc:
+                    print(f"     - {tc}")
+            
+            # REPAIR: Check for dangling tool calls
+            if msgs and msgs[-1].type == "ai" and getattr(msgs[-1], 'tool_calls', None):
+                print("[API] WARNING: Found dangling tool call! Appending dummy tool message to fix history.")
+                dummy_msgs = []
+                for tc in msgs[-1].tool_calls:
+                    dummy_msgs.append(ToolMessage(
+                        tool_call_id=tc['id'], 
+                        content="Error: Tool execution failed or was interrupted in previous turn."
+                    ))
+                state.agent.update_state(config, {"messages": dummy_msgs})
+
+    except Exception as e:
+        print(f"[API] Error inspecting/repairing state: {e}")
+
 class PublishRequest(BaseModel):
     platform: str
     elements: List[Dict[str, Any]]
+    threadId: Optional[str] = None
+    canvasId: Optional[str] = None
+    # Lower runs first when jobs are waiting for a worker.
+    priority: int = 0
 
 class ChatRequest(BaseModel):
     prompt: str
-    elements: List[Dict[str, Any]]
+    # Full canvas. With a canvasId, clients may instead send `changes` against `baseVersion`.
+    elements: Optional[List[Dict[str, Any]]] = None
+    changes: Optional[List[Dict[str, Any]]] = None
+    baseVersion: Optional[int] = None
     selectedIds: Optional[List[str]] = []
+    threadId: Optional[str] = None
+    canvasId: Optional[str] = None
 
-@app.post("/chat")
-async def chat_post(request: ChatRequest):
-    if not state.agent:
-        raise HTTPException(status_code=503, detail="Agent not initialized")
+def resolve_thread_id(request) -> str:
+    """Conversation thread for a request: explicit threadId, else one per canvas."""
+    return request.threadId or (f"canvas:{request.canvasId}" if request.canvasId else DEFAULT_THREAD_ID)
 
-    print(f"\n[API] Received chat request: {request.prompt}")
-    
-    # Construct Prompt with Context
-    elements_desc = json.dumps(request.elements, indent=2)
-    selected_desc = json.dumps(request.selectedIds, indent=2)
+def build_chat_prompt(request: ChatRequest, canvas: CanvasUpdate) -> str:
+    """Construct Prompt with Context (only the canvas delta when the thread has seen the canvas before)"""
+    canvas_desc = render_canvas_context(canvas, request.selectedIds or [])
+    selected_desc = json.dumps(request.selectedIds or [])
     
-    context_prompt = (
-        f"User is working on a canvas with the following elements:\n{elements_desc}\n\n"
+    return (
+        f"{canvas_desc}\n\n"
         f"The user has selected these element IDs: {selected_desc}\n\n"
         f"User says: '{request.prompt}'\n"
         "Please provide advice, suggestions, or perform actions based on this context. "
@@ -166,79 +363,259 @@ async def chat_post(request: ChatRequest):
         "Even if you are not modifying the canvas (actions=[]), you MUST call modify_canvas with empty actions just to provide the suggestions."
     )
 
-    print(f"[API] Context Prompt: {context_prompt[:100]}...")
+def thread_has_history(thread_id: str) -> bool:
+    snapshot = state.agent.get_state(thread_config(thread_id))
+    return bool(snapshot and snapshot.values and snapshot.values.get("messages"))
+
+def canvas_key(request: ChatRequest, thread_id: str) -> Optional[str]:
+    """Canvases are cached per thread: a delta is only meaningful against what that conversation saw."""
+    return thread_id if request.canvasId else None
 
-    # Debug: Inspect current state/history & Repair if needed
+def prepare_chat(request: ChatRequest) -> str:
+    """
+    Resolves the thread. Raises 409 when the client's `changes` are based on a canvas
+    version the server no longer has (re-checked under the thread lock in chat_events).
+    """
+    print(f"\n[API] Received chat request: {request.prompt}")
+    thread_id = resolve_thread_id(request)
     try:
-        current_state = state.agent.get_state(state.config)
-        if current_state and current_state.values:
-            msgs = current_state.values.get("messages", [])
-            print(f"[API] Current History ({len(msgs)} messages):")
-            for i, m in enumerate(msgs):
-                tc = getattr(m, 'tool_calls', [])
-                print(f"  {i}. {m.type}: {str(m.content)[:50]}... ToolCalls: {len(tc)}")
-                if tc:
-                    print(f"     - {tc}")
-            
-            # REPAIR: Check for dangling tool calls
-            if msgs and msgs[-1].type == "ai" and getattr(msgs[-1], 'tool_calls', None):
-                print("[API] WARNING: Found dangling tool call! Appending dummy tool message to fix history.")
-                dummy_msgs = []
-                for tc in msgs[-1].tool_calls:
-                    dummy_msgs.append(ToolMessage(
-                        tool_call_id=tc['id'], 
-                        content="Error: Tool execution failed or was interrupted in previous turn."
-                    ))
-                state.agent.update_state(state.config, {"messages": dummy_msgs})
+        state.canvases.check(canvas_key(request, thread_id), elements=request.elements, base_version=request.baseVersion)
+    except CanvasVersionMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return thread_id
 
-    except Exception as e:
-        print(f"[API] Error inspecting/repairing state: {e}")
+def stage_canvas(request: ChatRequest, thread_id: str):
+    """
+    Stages the request's canvas for the thread (call under the thread lock) and builds
+    the prompts. Returns (canvas, context_prompt, canvas_prompt); the canvas is committed
+    by the caller once the turn succeeds.
+    """
+    canvas = state.canvases.stage(
+        canvas_key(request, thread_id),
+        elements=request.elements,
+        changes=request.changes,
+        base_version=request.baseVersion,
+    )
+    if not canvas.fresh and not thread_has_history(thread_id):
+        # The conversation was evicted, so the model has never seen this canvas.
+        canvas.fresh = True
+    context_prompt = build_chat_prompt(request, canvas)
+    print(f"[API] Context Prompt ({len(context_prompt)} chars, {len(canvas.delta)} changes): {context_prompt[:100]}... (thread {thread_id})")
+    canvas_prompt = None
+    if state.router and state.router.classify(request.prompt, has_selection=bool(request.selectedIds)) == "canvas":
+        canvas_prompt = build_canvas_prompt(request, canvas)
+    return canvas, context_prompt, canvas_prompt
+
+def build_canvas_prompt(request: ChatRequest, canvas: CanvasUpdate) -> str:
+    """Prompt for the canvas fast path. It sees no thread history, so the whole canvas is always listed."""
+    canvas_desc = render_canvas_context(replace(canvas, fresh=True), request.selectedIds or [])
+    return (
+        f"{canvas_desc}\n\n"
+        f"The user has selected these element IDs: {json.dumps(request.selectedIds or [])}\n\n"
+        f"User says: '{request.prompt}'"
+    )
+
+async def canvas_turn(config: Dict[str, Any], context_prompt: str, canvas_prompt: str) -> Optional[List[Any]]:
+    """
+    Serves a canvas-only turn without the browser agent and records it in the thread
+    (call under the thread lock). Returns the recorded messages, or None when the
+    request needs the full agent.
+    """
+    response = await state.router.edit(canvas_prompt)
+    if response is None:
+        return None
+    messages = state.router.turn_messages(context_prompt, response)
+    # Recorded as the agent's output, so the thread ends where a full agent turn would.
+    await state.agent.aupdate_state(config, {"messages": messages}, as_node="agent")
+    return messages
+
+async def chat_events(request: ChatRequest, thread_id: str):
+    """
+    Runs one chat turn and yields (event, data) pairs as soon as they are known:
+    thread, token, message, tool_start, tool_end, canvas_action, suggestions,
+    then done (the same payload /chat returns) or error.
+    Canvas-only requests try the canvas fast path first (same events, no tokens).
+    The canvas version in `done` is committed only when the turn succeeds.
+    """
+    yield "thread", {"threadId": thread_id}
+
+    started = time.perf_counter()
+    final_response = ""
+    canvas_actions = []
+    new_suggestions = []
+    pending_tools: Dict[str, str] = {}
+    prompt_tokens = 0
 
     try:
-        final_response = ""
-        canvas_actions = []
-        new_suggestions = []
+        async with thread_run(thread_id, browser=False) as config:
+            try:
+                canvas, context_prompt, canvas_prompt = stage_canvas(request, thread_id)
+            except CanvasVersionMismatch as e:
+                # Another turn on this thread committed since prepare_chat checked.
+                yield "error", {"status": "error", "message": str(e), "threadId": thread_id, "code": "canvas_version_mismatch"}
+                return
+            repair_history(config)
+
+            if canvas_prompt is not None:
+                turn = await canvas_turn(config, context_prompt, canvas_prompt)
+                if turn is not None:
+                    state.canvases.commit(canvas)
+                    _, call_msg, tool_msg, final_msg = turn
+                    tool_call = call_msg.tool_calls[0]
+                    canvas_actions = tool_call['args'].get('actions') or []
+                    new_suggestions = tool_call['args'].get('suggestions') or []
+                    for action in canvas_actions:
+                        yield "canvas_action", {"action": action}
+                    if new_suggestions:
+                        yield "suggestions", {"suggestions": new_suggestions}
+                    yield "tool_start", {"id": tool_call['id'], "name": tool_call['name'], "args": tool_call['args']}
+                    yield "tool_end", {"id": tool_call['id'], "name": tool_call['name'], "status": "success", "preview": str(tool_msg.content)[:200]}
+                    final_response = final_msg.content
+                    yield "message", {"content": final_response}
+                    usage = getattr(call_msg, "usage_metadata", None) or {}
+                    state.router.record("canvas", time.perf_counter() - started, usage.get("input_tokens"))
+                    yield "done", {
+                        "status": "success",
+                        "message": final_response,
+                        "actions": canvas_actions,
+                        "suggestions": new_suggestions,
+                        "threadId": thread_id,
+                        "canvasVersion": canvas.version,
+                    }
+                    return
+
+            async with thread_tab(thread_id):
+                # If the MCP bridge drops mid-run, the thread resumes from its checkpoint after reconnecting
+                async for kind, payload in state.supervisor.stream_with_resume(
+                    lambda inputs: stream_agent(state.agent, inputs, config),
+                    {"messages": [task_message(context_prompt, request.prompt)]},
+                ):
+                    if kind == "token":
+                        yield "token", {"text": payload}
+                        continue
+
+                    event = payload
+                    if "agent" in event:
+                        msg = event["agent"]["messages"][0]
+                        print(f"[Agent]: {msg.content}")
+                        final_response = msg.content
+                        prompt_tokens += (getattr(msg, "usage_metadata", None) or {}).get("input_tokens", 0)
+                        if msg.content:
+                            yield "message", {"content": msg.content}
+
+                        # Check for tool calls in the agent's message
+                        for tool_call in getattr(msg, 'tool_calls', None) or []:
+                            if tool_call['name'] == 'modify_canvas':
+                                print(f"[API] Captured modify_canvas action: {tool_call['args']}")
+                                # Canvas actions are applied by the frontend; emit them before the tool "runs".
+                                for action in tool_call['args'].get('actions') or []:
+                                    canvas_actions.append(action)
+                                    yield "canvas_action", {"action": action}
+                                if tool_call['args'].get('suggestions'):
+                                    new_suggestions = tool_call['args']['suggestions']
+                                    yield "suggestions", {"suggestions": new_suggestions}
+                            pending_tools[tool_call['id']] = tool_call['name']
+                            yield "tool_start", {"id": tool_call['id'], "name": tool_call['name'], "args": tool_call['args']}
+
+                    if "tools" in event:
+                        for msg in event["tools"]["messages"]:
+                            print(f"[Tool]: {msg.content[:100]}...")
+                            yield "tool_end", {
+                                "id": msg.tool_call_id,
+                                "name": pending_tools.pop(msg.tool_call_id, getattr(msg, "name", None)),
+                                "status": getattr(msg, "status", "success"),
+                                "preview": str(msg.content)[:200],
+                            }
+            state.canvases.commit(canvas)
+
+        if state.router:
+            state.router.record("browser", time.perf_counter() - started, prompt_tokens)
+        yield "done", {
+            "status": "success", 
+            "message": final_response,
+            "actions": canvas_actions,
+            "suggestions": new_suggestions,
+            "threadId": thread_id,
+            "canvasVersion": canvas.version,
+        }
+
+    except Exception as e:
+        print(f"[API] Error: {e}")
+        yield "error", {"status": "error", "message": str(e), "threadId": thread_id}
 
-        async for event in state.agent.astream(
-            {"messages": [("user", context_prompt)]},
-            config=state.config
+def require_agent():
+    """503 until the agent exists (first start without a cached catalog, bridge not up yet)."""
+    if state.agent:
+        return
+    if state.supervisor and not state.handle.connected:
+        reason = state.supervisor.stats.get("last_error") or "not connected yet"
+        raise HTTPException(status_code=503, detail=f"MCP bridge unavailable ({reason}); retrying in the background")
+    raise HTTPException(status_code=503, detail="Agent not initialized")
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/chat")
+async def chat_post(request: ChatRequest):
+    require_agent()
+
+    thread_id = prepare_chat(request)
+    # Close the generator on early return so it releases the thread lock right away.
+    async with aclosing(chat_events(request, thread_id)) as events:
+        async for event, data in events:
+            if event == "error" and data.get("code") == "canvas_version_mismatch":
+                raise HTTPException(status_code=409, detail=data["message"])
+            if event in ("done", "error"):
+                return data
+
+@app.post("/chat/stream")
+async def chat_stream_post(request: ChatRequest):
+    """Same as /chat, streamed as Server-Sent Events (see chat_events for the event types)."""
+    require_agent()
+
+    thread_id = prepare_chat(request)
+
+    async def body():
+        async with aclosing(chat_events(request, thread_id)) as events:
+            async for event, data in events:
+                yield sse_event(event, data)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def publish_job(job: Job, thread_id: str, prompt: str) -> Dict[str, Any]:
+    """Runs the publishing agent for one job, reporting each tool step as job progress."""
+    final_response = ""
+    step = 0
+    async with thread_run(thread_id) as config:
+        job.log("Browser tab leased, agent running")
+        async for event in state.supervisor.stream_with_resume(
+            lambda inputs: state.agent.astream(inputs, config=config),
+            {"messages": [("user", prompt)]},
         ):
             if "agent" in event:
                 msg = event["agent"]["messages"][0]
                 print(f"[Agent]: {msg.content}")
                 final_response = msg.content
-                
-                # Check for tool calls in the agent's message
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        if tool_call['name'] == 'modify_canvas':
-                            print(f"[API] Captured modify_canvas action: {tool_call['args']}")
-                            # Extract actions from the tool call arguments
-                            if 'actions' in tool_call['args']:
-                                canvas_actions.extend(tool_call['args']['actions'])
-                            # Extract suggestions
-                            if 'suggestions' in tool_call['args'] and tool_call['args']['suggestions']:
-                                new_suggestions = tool_call['args']['suggestions']
-
+                if msg.content:
+                    job.log(msg.content, source="agent")
+                for tool_call in getattr(msg, "tool_calls", None) or []:
+                    step += 1
+                    job.update(step=step, tool=tool_call["name"])
+                    job.log(f"Calling {tool_call['name']}", source="tool", args=tool_call["args"])
             if "tools" in event:
                 for msg in event["tools"]["messages"]:
                     print(f"[Tool]: {msg.content[:100]}...")
+                    job.log(str(msg.content)[:200], source="tool", status=getattr(msg, "status", "success"))
+    return {"message": final_response, "threadId": thread_id}
 
-        return {
-            "status": "success", 
-            "message": final_response,
-            "actions": canvas_actions,
-            "suggestions": new_suggestions
-        }
-
-    except Exception as e:
-        print(f"[API] Error: {e}")
-        return {"status": "error", "message": str(e)}
-
-@app.post("/publish")
+@app.post("/publish", status_code=202)
 async def publish_post(request: PublishRequest):
-    if not state.agent:
-        raise HTTPException(status_code=503, detail="Agent not initialized")
+    """Queues a publishing run and returns its job ID; poll GET /jobs/{jobId} or stream /jobs/{jobId}/logs."""
+    require_agent()
 
     print(f"\n[API] Received publish request for {request.platform}")
     
@@ -254,31 +631,92 @@ async def publish_post(request: PublishRequest):
         "or describe how you would do it."
     )
 
-    print(f"[API] Prompt: {prompt[:100]}...")
+    # Publishing is its own task; keep it out of the canvas chat history.
+    thread_id = f"publish:{resolve_thread_id(request)}"
+    print(f"[API] Prompt: {prompt[:100]}... (thread {thread_id})")
 
     try:
-        # Run Agent
-        # We use astream to process steps, but for the API we'll collect the final response
-        # or stream logs. For now, let's just run it and return the final message.
-        
-        final_response = ""
-        async for event in state.agent.astream(
-            {"messages": [("user", prompt)]},
-            config=state.config
-        ):
-            if "agent" in event:
-                msg = event["agent"]["messages"][0]
-                print(f"[Agent]: {msg.content}")
-                final_response = msg.content
-            if "tools" in event:
-                for msg in event["tools"]["messages"]:
-                    print(f"[Tool]: {msg.content[:100]}...")
-
-        return {"status": "success", "message": final_response}
+        job = state.jobs.submit(
+            "publish",
+            lambda job: publish_job(job, thread_id, prompt),
+            label=f"{request.platform} {thread_id}",
+            priority=request.priority,
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return {"status": "queued", "jobId": job.id, "threadId": thread_id, "position": state.jobs.position(job.id)}
+
+def get_job_or_404(job_id: str) -> Job:
+    job = state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+@app.get("/jobs")
+async def jobs_get(status: Optional[str] = None):
+    """Lists known jobs (queued, running, and recently finished) with queue metrics."""
+    jobs = state.jobs.list(status)
+    return {
+        "jobs": [{**job.to_dict(), "position": state.jobs.position(job.id)} for job in jobs],
+        "metrics": state.jobs.snapshot(),
+    }
+
+@app.get("/jobs/{job_id}")
+async def job_get(job_id: str, logs: bool = False):
+    job = get_job_or_404(job_id)
+    return {**job.to_dict(include_logs=logs), "position": state.jobs.position(job_id)}
+
+@app.delete("/jobs/{job_id}")
+async def job_delete(job_id: str):
+    """Cancels a queued or running job; finished jobs are returned unchanged."""
+    job = state.jobs.cancel(get_job_or_404(job_id).id)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/logs")
+async def job_logs_get(job_id: str, after: int = 0):
+    """Streams the job's log as Server-Sent Events ("log" per entry, then "done" with the final job)."""
+    job = get_job_or_404(job_id)
+
+    async def body():
+        async for entry in state.jobs.follow(job.id, after=after):
+            yield sse_event("log", entry)
+        yield sse_event("done", job.to_dict())
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    except Exception as e:
-        print(f"[API] Error: {e}")
-        return {"status": "error", "message": str(e)}
+@app.get("/stats")
+async def stats_get():
+    return {
+        "checkpoints": state.memory.snapshot() if state.memory else None,
+        "tabs": state.tabs.snapshot() if state.tabs else None,
+        "running_threads": len(state.thread_locks),
+        "canvases": state.canvases.snapshot(),
+        "tools": state.tool_runner.snapshot() if state.tool_runner else None,
+        "tool_selection": state.tool_selector.snapshot() if state.tool_selector else None,
+        "downloads": DOWNLOADER.snapshot(),
+        "startup": {**state.startup, "mcp_attached": bool(state.handle and state.handle.connected)},
+        "mcp": state.supervisor.snapshot() if state.supervisor else None,
+        "jobs": state.jobs.snapshot() if state.jobs else None,
+        "intents": state.router.snapshot() if state.router else None,
+        "tool_timeouts": TOOL_LATENCY.timeouts(),
+    }
+
+@app.get("/stats/tools")
+async def tool_stats_get():
+    """Per-tool latency histograms, percentiles and the adaptive timeout currently in force."""
+    return {"defaults": {
+        "timeout": TOOL_LATENCY.default_timeout,
+        "floor": TOOL_LATENCY.floor,
+        "ceiling": TOOL_LATENCY.ceiling,
+        "percentile": TOOL_LATENCY.percentile,
+        "headroom": TOOL_LATENCY.headroom,
+        "min_samples": TOOL_LATENCY.min_samples,
+    }, "tools": TOOL_LATENCY.snapshot()}
 
 if __name__ == "__main__":
     import uvicorn
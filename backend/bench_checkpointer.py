@@ -0,0 +1,113 @@
+"""
+Compares checkpointers on a simulated agent run: put latency, retained memory and storage.
+
+    python bench_checkpointer.py [--steps 50] [--payload 4000]
+
+Each step is one graph node (agent and tool alternate), so a 50-step run appends 50
+messages; the tool messages carry `--payload` bytes of page-like text.
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from sqlite_checkpoint import SQLiteSaver
+
+PAGE_TEXT = "商品标题 价格 ¥199 月销 1000+ 评价 4.9 店铺 官方旗舰店 包邮 规格 颜色 尺码 "
+
+def build_graph(steps: int, payload: int):
+    def agent(state: MessagesState):
+        n = len(state["messages"])
+        return {"messages": [AIMessage(content=f"Step {n}: reading the page", tool_calls=[
+            {"name": "chrome_get_web_content", "args": {"selector": f"#item-{n}"}, "id": f"call_{n}"}
+        ])]}
+
+    def tools(state: MessagesState):
+        call = state["messages"][-1].tool_calls[0]
+        text = (PAGE_TEXT * (payload // len(PAGE_TEXT.encode()) + 1))[:payload // 3]
+        return {"messages": [ToolMessage(content=f"{call['args']}\n{text}", tool_call_id=call["id"])]}
+
+    def route(state: MessagesState):
+        return END if len(state["messages"]) > steps else "tools"
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("agent", agent)
+    workflow.add_node("tools", tools)
+    workflow.add_edge(START, "agent")
+    workflow.add_conditional_edges("agent", route, ["tools", END])
+    workflow.add_edge("tools", "agent")
+    return workflow
+
+def run(name: str, saver, steps: int, payload: int):
+    put_times = []
+    put = saver.put
+
+    def timed_put(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return put(*args, **kwargs)
+        finally:
+            put_times.append(time.perf_counter() - started)
+
+    saver.put = timed_put
+    graph = build_graph(steps, payload).compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": steps * 2 + 10}
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    graph.invoke({"messages": [HumanMessage(content="Collect the product details")]}, config)
+    total = time.perf_counter() - started
+    del graph
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    latest = saver.get_tuple({"configurable": {"thread_id": "bench"}})
+    read_ms = (time.perf_counter() - started) * 1000
+    assert len(latest.checkpoint["channel_values"]["messages"]) > steps
+
+    put_ms = sorted(t * 1000 for t in put_times)
+    return {
+        "checkpointer": name,
+        "puts": len(put_ms),
+        "put_avg_ms": round(statistics.mean(put_ms), 3),
+        "put_p95_ms": round(put_ms[int(len(put_ms) * 0.95) - 1], 3),
+        "put_last_ms": round(put_times[-1] * 1000, 3),
+        "read_latest_ms": round(read_ms, 3),
+        "run_seconds": round(total, 3),
+        "retained_kb": round(retained / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--payload", type=int, default=4000, help="bytes of text per tool message")
+    args = parser.parse_args()
+
+    results = [run("MemorySaver", MemorySaver(), args.steps, args.payload)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite")
+        saver = SQLiteSaver(path)
+        results.append(run("SQLiteSaver", saver, args.steps, args.payload))
+        stats = saver.snapshot()
+        saver.close()
+
+    columns = list(results[0])
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print(" | ".join(f"{str(row[c]):>14}" for c in columns))
+    print(f"\nSQLite: {stats['db_bytes'] / 1024:.1f} KB on disk, compression x{stats['compression_ratio']}, "
+          f"{stats['delta_blobs']} delta / {stats['full_blobs']} full blobs, {stats['pruned_checkpoints']} checkpoints pruned")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import copy
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# --- Configuration ---
+DEFAULT_MAX_CANVASES = 500
+DEFAULT_CANVAS_TTL = 2 * 60 * 60
+# Longest text shown per element in prompt summaries.
+SUMMARY_TEXT_LIMIT = 40
+# Image/data URLs longer than this are replaced by a placeholder in prompts.
+INLINE_CONTENT_LIMIT = 300
+
+class CanvasVersionMismatch(Exception):
+    """The client's baseVersion does not match the cached canvas; it must resend all elements."""
+
+@dataclass
+class CanvasSnapshot:
+    version: int = 0
+    elements: "OrderedDict[str, Dict[str, Any]]" = field(default_factory=OrderedDict)
+    updated_at: float = field(default_factory=time.monotonic)
+
+@dataclass
+class CanvasUpdate:
+    # Cache key: the conversation thread the canvas is rendered into (None when stateless).
+    key: Optional[str]
+    version: int
+    elements: List[Dict[str, Any]]
+    # Changes since the previous turn, in CanvasAction shape ({action, elementId, element}).
+    delta: List[Dict[str, Any]]
+    # True when there is no previous turn to diff against (new or evicted canvas).
+    fresh: bool
+    # The snapshot `commit()` stores; None for stateless requests.
+    pending: Optional[CanvasSnapshot] = field(default=None, repr=False)
+
+def _merge(element: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(element)
+    for key, value in patch.items():
+        if key == "styles" and isinstance(value, dict):
+            merged["styles"] = {**(element.get("styles") or {}), **value}
+        else:
+            merged[key] = value
+    return merged
+
+def _changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    patch = {k: v for k, v in new.items() if k != "styles" and old.get(k) != v}
+    old_styles, new_styles = old.get("styles") or {}, new.get("styles") or {}
+    style_patch = {k: v for k, v in new_styles.items() if old_styles.get(k) != v}
+    if style_patch:
+        patch["styles"] = style_patch
+    return patch
+
+class CanvasStateCache:
+    """
+    Server-side copy of the canvas each conversation thread last saw, so /chat can send
+    the model only what changed since the previous turn.
+
+    Clients either send the full `elements` list (diffed here) or `changes` in
+    CanvasAction shape against `baseVersion`. `stage()` computes the new version without
+    storing it; `commit()` stores it once the turn that showed it to the model succeeded,
+    so a failed turn leaves the previous version in place. Canvases are evicted LRU /
+    after `ttl`; a client whose baseVersion is unknown gets CanvasVersionMismatch and
+    resends everything.
+    """
+
+    def __init__(self, max_canvases: int = DEFAULT_MAX_CANVASES, ttl: Optional[float] = DEFAULT_CANVAS_TTL):
+        self.max_canvases = max(1, max_canvases)
+        self.ttl = ttl
+        self._canvases: "OrderedDict[str, CanvasSnapshot]" = OrderedDict()
+        self.stats: Dict[str, Any] = {
+            "full_syncs": 0,
+            "delta_syncs": 0,
+            "version_mismatches": 0,
+            "evicted": 0,
+            "discarded": 0,
+        }
+
+    def check(self, key: Optional[str], elements: Optional[List[Dict[str, Any]]] = None, base_version: Optional[int] = None) -> None:
+        """Raises CanvasVersionMismatch if a `changes` request could not be applied right now."""
+        if key is None or elements is not None:
+            return
+        previous = self._canvases.get(key)
+        if previous is None or base_version != previous.version:
+            self.stats["version_mismatches"] += 1
+            raise CanvasVersionMismatch(
+                f"Canvas for {key} is at version {previous.version if previous else None}, got baseVersion {base_version}"
+            )
+
+    def stage(
+        self,
+        key: Optional[str],
+        elements: Optional[List[Dict[str, Any]]] = None,
+        changes: Optional[List[Dict[str, Any]]] = None,
+        base_version: Optional[int] = None,
+    ) -> CanvasUpdate:
+        """The canvas after this request and its delta; nothing is stored until `commit()`."""
+        self._evict()
+        if key is None:
+            # Stateless request: nothing to diff against.
+            return CanvasUpdate(None, 0, list(elements or []), [], fresh=True)
+
+        self.check(key, elements, base_version)
+        previous = self._canvases.get(key)
+        if elements is not None:
+            self.stats["full_syncs"] += 1
+            new_elements = OrderedDict((self._element_id(e, i), copy.deepcopy(e)) for i, e in enumerate(elements))
+            delta = self._diff(previous.elements, new_elements) if previous else []
+        else:
+            self.stats["delta_syncs"] += 1
+            new_elements = copy.deepcopy(previous.elements)
+            delta = self._apply_changes(new_elements, changes or [])
+
+        snapshot = CanvasSnapshot(version=(previous.version + 1) if previous else 1, elements=new_elements)
+        return CanvasUpdate(key, snapshot.version, list(new_elements.values()), delta, fresh=previous is None, pending=snapshot)
+
+    def commit(self, update: CanvasUpdate) -> None:
+        """Stores a staged canvas as the version its thread has now seen."""
+        if update.key is None or update.pending is None:
+            return
+        current = self._canvases.get(update.key)
+        if current is not None and current.version >= update.version:
+            # Another turn committed first; keep its version so the client's next baseVersion matches it.
+            self.stats["discarded"] += 1
+            return
+        self._canvases[update.key] = update.pending
+        self._canvases.move_to_end(update.key)
+
+    def update(
+        self,
+        key: Optional[str],
+        elements: Optional[List[Dict[str, Any]]] = None,
+        changes: Optional[List[Dict[str, Any]]] = None,
+        base_version: Optional[int] = None,
+    ) -> CanvasUpdate:
+        """`stage()` and `commit()` in one step."""
+        update = self.stage(key, elements, changes, base_version)
+        self.commit(update)
+        return update
+
+    def forget(self, key: str) -> None:
+        self._canvases.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"canvases": len(self._canvases), "max_canvases": self.max_canvases, **self.stats}
+
+    # --- Internals ---
+    @staticmethod
+    def _element_id(element: Dict[str, Any], index: int) -> str:
+        return element.get("id") or f"__index_{index}"
+
+    @staticmethod
+    def _diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        delta = []
+        for element_id, element in new.items():
+            if element_id not in old:
+                delta.append({"action": "add", "elementId": element_id, "element": element})
+            else:
+                patch = _changed_fields(old[element_id], element)
+                if patch:
+                    delta.append({"action": "update", "elementId": element_id, "element": patch})
+        for element_id in old:
+            if element_id not in new:
+                delta.append({"action": "delete", "elementId": element_id})
+        return delta
+
+    @staticmethod
+    def _apply_changes(elements: Dict[str, Dict[str, Any]], changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        applied = []
+        for change in changes:
+            action = change.get("action")
+            element = change.get("element") or {}
+            element_id = change.get("elementId") or element.get("id")
+            if not element_id:
+                continue
+            if action == "add" or (action == "update" and element_id not in elements):
+                elements[element_id] = _merge(elements.get(element_id, {}), {**element, "id": element_id})
+                applied.append({"action": "add", "elementId": element_id, "element": elements[element_id]})
+            elif action == "update":
+                merged = _merge(elements[element_id], element)
+                # Clients may send whole elements; only report fields that actually changed.
+                patch = _changed_fields(elements[element_id], merged)
+                elements[element_id] = merged
+                if patch:
+                    applied.append({"action": "update", "elementId": element_id, "element": patch})
+            elif action == "delete" and elements.pop(element_id, None) is not None:
+                applied.append({"action": "delete", "elementId": element_id})
+        return applied
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._canvases:
+            canvas_id, snapshot = next(iter(self._canvases.items()))
+            expired = self.ttl is not None and now - snapshot.updated_at > self.ttl
+            if len(self._canvases) <= self.max_canvases and not expired:
+                break
+            del self._canvases[canvas_id]
+            self.stats["evicted"] += 1
+
+# --- Prompt Rendering ---
+def compact_content(content: Any) -> Any:
+    """Large inline payloads (data URLs) are replaced by a short placeholder."""
+    if isinstance(content, str) and len(content) > INLINE_CONTENT_LIMIT and content.startswith("data:"):
+        return f"<{content[5:content.find(';')] or 'data'} {len(content) // 1024}KB inline>"
+    return content
+
+def compact_element(element: Dict[str, Any]) -> Dict[str, Any]:
+    compact = {k: v for k, v in element.items() if v not in (None, "", {}, [])}
+    if "content" in compact:
+        compact["content"] = compact_content(compact["content"])
+    if isinstance(compact.get("styles"), dict):
+        compact["styles"] = {k: v for k, v in compact["styles"].items() if v not in (None, "")}
+    return compact
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def summarize_element(element: Dict[str, Any]) -> str:
+    content = compact_content(element.get("content"))
+    text = ""
+    if isinstance(content, str) and content:
+        text = content if len(content) <= SUMMARY_TEXT_LIMIT else content[:SUMMARY_TEXT_LIMIT] + "…"
+        text = f' "{text}"'
+    geometry = "@{x},{y} {w}x{h}".format(
+        x=element.get("x", "?"), y=element.get("y", "?"), w=element.get("width", "?"), h=element.get("height", "?")
+    )
+    return f"- {element.get('id')} {element.get('type', '?')}{text} {geometry}"
+
+def render_canvas_context(update: CanvasUpdate, selected_ids: List[str]) -> str:
+    """
+    Canvas section of the chat prompt. A fresh canvas is listed in full (compact JSON);
+    later turns get the delta, full details of selected elements, and a one-line
+    summary of every other element.
+    """
+    selected = set(selected_ids or [])
+    if update.fresh:
+        elements = [compact_element(e) for e in update.elements]
+        return f"User is working on a canvas with the following elements:\n{compact_json(elements)}"
+
+    lines = []
+    if update.delta:
+        delta = [
+            {**change, "element": compact_element(change["element"])} if change.get("element") else change
+            for change in update.delta
+        ]
+        lines.append(f"Canvas changes since the previous turn:\n{compact_json(delta)}")
+    else:
+        lines.append("The canvas has not changed since the previous turn.")
+
+    changed_ids = {change["elementId"] for change in update.delta}
+    selected_elements = [compact_element(e) for e in update.elements if e.get("id") in selected and e.get("id") not in changed_ids]
+    if selected_elements:
+        lines.append(f"Selected elements (full details):\n{compact_json(selected_elements)}")
+
+    others = [summarize_element(e) for e in update.elements if e.get("id") not in changed_ids and e.get("id") not in selected]
+    if others:
+        lines.append("Other elements on the canvas (unchanged, summary):\n" + "\n".join(others))
+    return "\n\n".join(lines)
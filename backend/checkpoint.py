@@ -0,0 +1,180 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set, Tuple
+
+from langgraph.checkpoint.memory import MemorySaver
+
+# --- Configuration ---
+DEFAULT_MAX_THREADS = 200
+DEFAULT_THREAD_TTL = 2 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Checkpoints kept per thread; older ones are only needed for time travel.
+DEFAULT_KEEP_CHECKPOINTS = 8
+
+def _payload_size(value) -> int:
+    """Approximate retained size of serialized checkpoint data (bytes dominate)."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_payload_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(v) for v in value.values())
+    return 8
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver with bounded growth, for servers hosting many conversation threads.
+
+    - Each thread keeps only its latest `keep_checkpoints` checkpoints (plus the
+      channel blobs they reference).
+    - Whole threads are evicted least-recently-used first when there are more than
+      `max_threads`, when the estimated size exceeds `max_bytes`, or after `ttl`
+      seconds without access.
+    - Threads marked with `in_use()` are never evicted.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        ttl: Optional[float] = DEFAULT_THREAD_TTL,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        keep_checkpoints: int = DEFAULT_KEEP_CHECKPOINTS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.max_threads = max(1, max_threads)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.keep_checkpoints = max(1, keep_checkpoints)
+        self._lock = threading.RLock()
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._active: Dict[str, int] = {}
+        # (thread_id, checkpoint_ns, checkpoint_id) -> channel_versions of that checkpoint
+        self._versions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.stats: Dict[str, Any] = {
+            "evicted_threads": 0,
+            "pruned_checkpoints": 0,
+        }
+
+    # --- Public helpers ---
+    @contextmanager
+    def in_use(self, thread_id: str):
+        """Pin a thread while a run is using it."""
+        with self._lock:
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+                self._touch(thread_id)
+                self._evict()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threads": len(self._access),
+                "active_threads": len(self._active),
+                "approx_bytes": sum(self._sizes.values()),
+                "max_threads": self.max_threads,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
+
+    # --- Checkpointer overrides (async variants delegate to these) ---
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id in self._access:
+                self._touch(thread_id)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+            self._versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint.get("channel_versions", {}))
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._touch(thread_id)
+            self._evict()
+            return next_config
+
+    def put_writes(self, config, writes, task_id, *args, **kwargs):
+        with self._lock:
+            super().put_writes(config, writes, task_id, *args, **kwargs)
+            self._touch(config["configurable"]["thread_id"])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    # --- Internals ---
+    def _touch(self, thread_id: str):
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage.get(thread_id, {}).get(checkpoint_ns)
+        if checkpoints and len(checkpoints) > self.keep_checkpoints:
+            # Checkpoint ids are monotonically increasing (uuid6), so sorting gives age order.
+            stale_ids = sorted(checkpoints)[:-self.keep_checkpoints]
+            for checkpoint_id in stale_ids:
+                del checkpoints[checkpoint_id]
+                self._versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for key in [k for k in self.writes if k[:3] == (thread_id, checkpoint_ns, checkpoint_id)]:
+                    del self.writes[key]
+            self.stats["pruned_checkpoints"] += len(stale_ids)
+
+            blobs = getattr(self, "blobs", None)
+            if blobs:
+                referenced: Set[Tuple[str, Any]] = set()
+                for checkpoint_id in checkpoints:
+                    versions = self._versions.get((thread_id, checkpoint_ns, checkpoint_id), {})
+                    referenced.update(versions.items())
+                for key in [k for k in blobs if k[0] == thread_id and k[1] == checkpoint_ns]:
+                    if (key[2], key[3]) not in referenced:
+                        del blobs[key]
+
+        self._sizes[thread_id] = self._thread_size(thread_id)
+
+    def _thread_size(self, thread_id: str) -> int:
+        size = _payload_size(self.storage.get(thread_id, {}))
+        size += sum(_payload_size(v) for k, v in self.writes.items() if k[0] == thread_id)
+        blobs = getattr(self, "blobs", None)
+        if blobs:
+            size += sum(_payload_size(v) for k, v in blobs.items() if k[0] == thread_id)
+        return size
+
+    def _evict(self):
+        now = time.monotonic()
+        for thread_id, last_access in list(self._access.items()):
+            over_count = len(self._access) > self.max_threads
+            over_bytes = self.max_bytes is not None and sum(self._sizes.values()) > self.max_bytes
+            expired = self.ttl is not None and now - last_access > self.ttl
+            if not (over_count or over_bytes or expired):
+                # Remaining threads are newer (LRU order), so none of them are expired either.
+                break
+            if thread_id in self._active:
+                continue
+            self._drop_thread(thread_id)
+            self.stats["evicted_threads"] += 1
+
+    def _drop_thread(self, thread_id: str):
+        self.storage.pop(thread_id, None)
+        for key in [k for k in self.writes if k[0] == thread_id]:
+            del self.writes[key]
+        blobs = getattr(self, "blobs", None)
+        if blobs:
+            for key in [k for k in blobs if k[0] == thread_id]:
+                del blobs[key]
+        for key in [k for k in self._versions if k[0] == thread_id]:
+            del self._versions[key]
+        self._access.pop(thread_id, None)
+        self._sizes.pop(thread_id, None)
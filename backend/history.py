@@ -0,0 +1,131 @@
+import json
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from tool_output import estimate_tokens
+
+# --- Configuration ---
+# Above this estimated size, older history is compacted before each LLM call.
+DEFAULT_MAX_HISTORY_TOKENS = 16000
+# Most recent steps (a user message, or an AI message with its tool results) kept verbatim.
+DEFAULT_KEEP_LAST_STEPS = 6
+# Length of the excerpts that replace older message bodies.
+TOOL_SUMMARY_CHARS = 240
+TEXT_SUMMARY_CHARS = 600
+ARG_SUMMARY_CHARS = 200
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, default=str)
+    tokens = estimate_tokens(content) + 4
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(json.dumps(tool_call.get("args", {}), ensure_ascii=False, default=str)) + 8
+    return tokens
+
+def _excerpt(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… [{estimate_tokens(text[limit:])} tokens omitted]"
+
+def _shorten_args(value: Any) -> Any:
+    if isinstance(value, str):
+        return _excerpt(value, ARG_SUMMARY_CHARS)
+    if isinstance(value, list):
+        return [_shorten_args(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _shorten_args(v) for k, v in value.items()}
+    return value
+
+def _replace(message: BaseMessage, **update) -> BaseMessage:
+    if hasattr(message, "model_copy"):
+        return message.model_copy(update=update)
+    return message.copy(update=update)
+
+class HistoryManager:
+    """
+    Shapes the message history sent to the LLM so per-turn prompt size stays flat.
+
+    While the history is under `max_tokens` it is sent unchanged. Beyond that, the
+    last `keep_last_steps` steps stay verbatim; older tool results, AI text and tool
+    arguments are collapsed to short excerpts, and if that is still too large the
+    oldest steps are dropped behind a one-line note. Steps are never split, so every
+    tool_call keeps its ToolMessage. The checkpointed state itself is not modified.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_HISTORY_TOKENS, keep_last_steps: int = DEFAULT_KEEP_LAST_STEPS):
+        self.max_tokens = max_tokens
+        self.keep_last_steps = max(1, keep_last_steps)
+        self.stats: Dict[str, Any] = {
+            "calls": 0,
+            "compacted_calls": 0,
+            "dropped_messages": 0,
+            "last_tokens_in": 0,
+            "last_tokens_out": 0,
+        }
+
+    def prepare(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        self.stats["calls"] += 1
+        total = sum(message_tokens(m) for m in messages)
+        self.stats["last_tokens_in"] = self.stats["last_tokens_out"] = total
+        if total <= self.max_tokens:
+            return list(messages)
+
+        steps = self._split_steps(messages)
+        step_tokens = [sum(message_tokens(m) for m in step) for step in steps]
+        # Shrink the verbatim window if the recent steps alone exceed the limit.
+        keep = min(self.keep_last_steps, len(steps))
+        while keep > 1 and sum(step_tokens[-keep:]) > self.max_tokens:
+            keep -= 1
+        split = len(steps) - keep
+
+        # The latest user message states the current task; it is compacted but never dropped.
+        task_index = max((i for i, step in enumerate(steps) if isinstance(step[0], HumanMessage)), default=None)
+        older = [[self._compact(m) for m in step] for step in steps[:split]]
+        older_tokens = [sum(message_tokens(m) for m in step) for step in older]
+        total = sum(older_tokens) + sum(step_tokens[split:])
+
+        kept_older: List[List[BaseMessage]] = []
+        dropped = 0
+        for index, step in enumerate(older):
+            if total > self.max_tokens and index != task_index:
+                total -= older_tokens[index]
+                dropped += len(step)
+            else:
+                kept_older.append(step)
+        older = kept_older
+        recent = steps[split:]
+
+        prepared: List[BaseMessage] = []
+        if dropped:
+            prepared.append(SystemMessage(content=f"[{dropped} earlier messages of this conversation were omitted to save context.]"))
+        for step in older + recent:
+            prepared.extend(step)
+
+        self.stats["compacted_calls"] += 1
+        self.stats["dropped_messages"] += dropped
+        self.stats["last_tokens_out"] = total
+        return prepared
+
+    @staticmethod
+    def _split_steps(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+        steps: List[List[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, ToolMessage) and steps:
+                steps[-1].append(message)
+            else:
+                steps.append([message])
+        return steps
+
+    @staticmethod
+    def _compact(message: BaseMessage) -> BaseMessage:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False, default=str)
+        if isinstance(message, ToolMessage):
+            return _replace(message, content=_excerpt(content, TOOL_SUMMARY_CHARS))
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tool_calls = [{**tc, "args": _shorten_args(tc.get("args", {}))} for tc in message.tool_calls]
+            return _replace(message, content=_excerpt(content, TEXT_SUMMARY_CHARS), tool_calls=tool_calls)
+        if len(content) > TEXT_SUMMARY_CHARS:
+            return _replace(message, content=_excerpt(content, TEXT_SUMMARY_CHARS))
+        return message
@@ -0,0 +1,156 @@
+import re
+import statistics
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field, ValidationError
+
+from agent_core import API_KEY, BASE_URL
+
+# --- Configuration ---
+CANVAS_MODEL = "gpt-5-chat-latest"
+# Requests longer than this go to the full agent; design edits are short commands.
+MAX_CANVAS_PROMPT_CHARS = 300
+RECENT_TURNS = 200
+
+# Anything that needs the web, files or another site goes to the browser agent.
+BROWSER_PATTERN = re.compile(
+    r"https?://|www\.|\.(com|cn|net|org)\b"
+    r"|\b(search|find|look\s*up|google|browse|website|web\s*page|online|internet|download|upload|publish|post\s+to|"
+    r"open|navigate|tab|xiaohongshu|xhs|pinterest|douyin|tiktok|instagram|twitter|trending|latest|news|reference|"
+    r"inspiration|examples?|image|images|photo|photos|picture|pictures|pic|pics)\b"
+    r"|搜索|搜一下|查找|查一下|找一|找些|下载|上传|发布|打开|网页|网站|浏览|小红书|抖音|热门|爆款|参考|灵感|图片|照片|素材",
+    re.IGNORECASE,
+)
+# Edits the canvas tool can express on its own.
+CANVAS_PATTERN = re.compile(
+    r"\b(colou?r|red|blue|green|yellow|black|white|orange|purple|pink|gr[ae]y|bigger|smaller|larger|size|resize|"
+    r"font|bold|italic|text|title|heading|subtitle|caption|move|left|right|up|down|center|centre|align|rotate|"
+    r"delete|remove|background|opacity|width|height|wider|narrower|taller|shorter|rename|rewrite|shorten|translate|"
+    r"layout|spacing|position)\b"
+    r"|颜色|红色|蓝色|绿色|黄色|黑色|白色|放大|缩小|大小|字体|字号|加粗|标题|文字|文案|移动|左|右|居中|对齐|旋转|删除|背景|透明|宽|高|改成|换成",
+    re.IGNORECASE,
+)
+
+CANVAS_SYSTEM_PROMPT = """You edit a design canvas for the user. Reply by calling exactly one tool.
+- modify_canvas: apply the user's change with add/update/delete actions on the listed elements, explain it in one sentence in `rationale`, and give EXACTLY 3 follow-up `suggestions` phrased as short commands the user would say to you (e.g. 'Make the title bold'), never questions.
+- EscalateToBrowser: the request needs anything outside this canvas (searching the web, finding or downloading images, reading a website, publishing)."""
+
+class EscalateToBrowser(BaseModel):
+    """Hand the request to the browser agent because it needs resources outside the canvas."""
+    reason: str = Field(..., description="What outside resource is needed")
+
+def classify_intent(prompt: str, has_selection: bool = False) -> Tuple[str, str]:
+    """
+    Returns ("canvas", reason) for requests the canvas tool alone can serve and
+    ("browser", reason) for everything else. Unclear requests go to the browser agent.
+    """
+    text = prompt.strip()
+    if not text:
+        return "browser", "empty"
+    if len(text) > MAX_CANVAS_PROMPT_CHARS:
+        return "browser", "long"
+    match = BROWSER_PATTERN.search(text)
+    if match:
+        return "browser", f"keyword:{match.group(0).lower()}"
+    match = CANVAS_PATTERN.search(text)
+    if match:
+        return "canvas", f"keyword:{match.group(0).lower()}"
+    if has_selection and len(text) <= 60:
+        # Short command about the selected elements ("make it pop", "更醒目一点").
+        return "canvas", "selection"
+    return "browser", "unclassified"
+
+class IntentRouter:
+    """
+    Serves canvas-only chat turns without the browser agent.
+
+    `classify()` is a keyword heuristic. Canvas turns go to `edit()`: one LLM call whose
+    only tools are modify_canvas and EscalateToBrowser, with a short system prompt
+    instead of the browser agent's prompt and MCP tool schemas. If the model escalates,
+    the caller runs the full agent. `record()` keeps per-route latency for /stats.
+    """
+
+    def __init__(self, canvas_tool, llm=None):
+        self.canvas_tool = canvas_tool
+        llm = llm or ChatOpenAI(base_url=BASE_URL, api_key=API_KEY, model=CANVAS_MODEL, temperature=0)
+        self.llm = llm.bind_tools([canvas_tool, EscalateToBrowser], tool_choice="any")
+        self._latency: Dict[str, Deque[float]] = {}
+        self._prompt_tokens: Dict[str, Deque[int]] = {}
+        self.stats: Dict[str, Any] = {
+            "canvas": 0,
+            "browser": 0,
+            "escalated": 0,
+            "fast_errors": 0,
+            "reasons": {},
+        }
+
+    def classify(self, prompt: str, has_selection: bool = False) -> str:
+        route, reason = classify_intent(prompt, has_selection)
+        self.stats["reasons"][reason] = self.stats["reasons"].get(reason, 0) + 1
+        print(f"[ROUTER] {route} ({reason})")
+        return route
+
+    async def edit(self, prompt: str) -> Optional[AIMessage]:
+        """
+        Returns the model's AIMessage carrying one valid modify_canvas call, or None when
+        the request must go to the browser agent (the model escalated, the call failed,
+        or its arguments don't match the tool's schema).
+        """
+        try:
+            response = await self.llm.ainvoke([SystemMessage(content=CANVAS_SYSTEM_PROMPT), HumanMessage(content=prompt)])
+        except Exception as e:
+            print(f"[ROUTER] Canvas fast path failed, escalating: {e}")
+            self.stats["fast_errors"] += 1
+            return None
+        calls = [c for c in response.tool_calls or [] if c["name"] == self.canvas_tool.name]
+        if not calls:
+            reason = next((c["args"].get("reason") for c in response.tool_calls or [] if c["name"] == "EscalateToBrowser"), None)
+            print(f"[ROUTER] Escalating to browser agent: {reason or 'no canvas action'}")
+            self.stats["escalated"] += 1
+            return None
+        try:
+            self.canvas_tool.args_schema.model_validate(calls[0]["args"])
+        except ValidationError as e:
+            print(f"[ROUTER] Canvas fast path returned invalid arguments, escalating: {e.error_count()} errors")
+            self.stats["fast_errors"] += 1
+            return None
+        return AIMessage(content=response.content or "", tool_calls=calls[:1], id=response.id, usage_metadata=response.usage_metadata)
+
+    def turn_messages(self, context_prompt: str, response: AIMessage) -> List[Any]:
+        """
+        The fast-path turn as the agent would have recorded it (user, tool call, tool
+        result, final answer), so the thread history stays complete for later turns.
+        """
+        call = response.tool_calls[0]
+        call_id = call.get("id") or f"call_{uuid.uuid4().hex[:12]}"
+        result = self.canvas_tool.invoke(call["args"])
+        return [
+            HumanMessage(content=context_prompt),
+            AIMessage(content=response.content, tool_calls=[{**call, "id": call_id}], usage_metadata=response.usage_metadata),
+            ToolMessage(content=str(result), tool_call_id=call_id, name=call["name"]),
+            AIMessage(content=call["args"].get("rationale") or response.content or "Canvas updated."),
+        ]
+
+    def record(self, route: str, seconds: float, prompt_tokens: Optional[int] = None):
+        """Records one finished /chat turn; `prompt_tokens` is the LLM input tokens it used, when reported."""
+        self.stats[route] += 1
+        self._latency.setdefault(route, deque(maxlen=RECENT_TURNS)).append(seconds)
+        if prompt_tokens:
+            self._prompt_tokens.setdefault(route, deque(maxlen=RECENT_TURNS)).append(prompt_tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = {
+            route: {"p50": round(statistics.median(values), 3), "max": round(max(values), 3), "count": len(values)}
+            for route, values in self._latency.items() if values
+        }
+        tokens = {route: round(statistics.median(values)) for route, values in self._prompt_tokens.items() if values}
+        return {
+            **self.stats,
+            "reasons": dict(self.stats["reasons"]),
+            "latency_seconds": latency,
+            "prompt_tokens_p50": tokens,
+        }
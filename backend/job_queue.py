@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+# --- Configuration ---
+DEFAULT_MAX_WORKERS = 2
+# Submissions beyond this many waiting jobs are rejected instead of queued.
+DEFAULT_MAX_QUEUED = 20
+# Finished jobs kept for polling; older ones are forgotten.
+DEFAULT_KEEP_FINISHED = 200
+MAX_LOG_LINES = 500
+# Durations of recent jobs used for the duration/wait percentiles.
+RECENT_JOBS = 200
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobQueueFull(Exception):
+    pass
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+class Job:
+    """One queued unit of work, with its progress and log as reported by the job function."""
+
+    def __init__(self, kind: str, fn: Callable[["Job"], Awaitable[Any]], label: str = "", priority: int = 0):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.priority = priority
+        self.fn = fn
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.logs: Deque[Dict[str, Any]] = deque(maxlen=MAX_LOG_LINES)
+        self.log_count = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def log(self, message: str, **fields):
+        self.log_count += 1
+        self.logs.append({"seq": self.log_count, "time": time.time(), "message": message, **fields})
+        self._notify()
+
+    def update(self, **progress):
+        """Merges `progress` (e.g. step, tool) into the job's reported progress."""
+        self.progress.update(progress)
+        self._notify()
+
+    def to_dict(self, include_logs: bool = False) -> Dict[str, Any]:
+        data = {
+            "jobId": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "priority": self.priority,
+            "status": self.status,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "waitSeconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "runSeconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+        }
+        if include_logs:
+            data["logs"] = list(self.logs)
+        return data
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+class JobQueue:
+    """
+    Runs long tasks (publishing) in the background on a bounded pool of workers.
+
+    - `submit()` returns a Job immediately; jobs run in priority order (lower first,
+      FIFO within a priority) on at most `max_workers` workers.
+    - When `max_queued` jobs are already waiting, submit raises JobQueueFull.
+    - `cancel()` drops a queued job or cancels a running one (its task is cancelled,
+      so context managers such as tab leases unwind).
+    - Finished jobs stay queryable until `keep_finished` newer ones have finished.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_queued: int = DEFAULT_MAX_QUEUED, keep_finished: int = DEFAULT_KEEP_FINISHED):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.keep_finished = max(1, keep_finished)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._stopping = False
+        self._waits: Deque[float] = deque(maxlen=RECENT_JOBS)
+        self._durations: Deque[float] = deque(maxlen=RECENT_JOBS)
+        self.stats: Dict[str, Any] = {
+            "submitted": 0,
+            "rejected": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "max_queue_depth": 0,
+        }
+
+    def start(self):
+        if self._workers:
+            return
+        self._stopping = False
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_workers)]
+
+    async def stop(self):
+        """Cancels running and queued jobs and stops the workers."""
+        self._stopping = True
+        # cancel() can evict finished jobs, so iterate over a copy.
+        for job in list(self._jobs.values()):
+            if not job.done:
+                self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, kind: str, fn: Callable[[Job], Awaitable[Any]], label: str = "", priority: int = 0) -> Job:
+        """Queues `fn(job)`; its return value becomes the job's result."""
+        if self._queue is None:
+            self.start()
+        if self.queue_depth >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise JobQueueFull(f"Job queue is full ({self.queue_depth} waiting)")
+        job = Job(kind, fn, label=label, priority=priority)
+        self._jobs[job.id] = job
+        self._queue.put_nowait((priority, next(self._seq), job.id))
+        self.stats["submitted"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+        job.log(f"Queued {kind} job (position {self.position(job.id)})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None) -> List[Job]:
+        return [job for job in self._jobs.values() if status is None or job.status == status]
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place in the queue of a waiting job (None once it runs)."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != QUEUED:
+            return None
+        waiting = sorted((j.priority, j.created_at) for j in self.list(QUEUED))
+        return waiting.index((job.priority, job.created_at)) + 1
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == QUEUED:
+            # The worker skips it when it reaches the front of the queue.
+            self._finish(job, CANCELLED, error="Cancelled before start")
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    async def follow(self, job_id: str, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the job's log entries with seq > `after`, then new ones as they arrive, until it finishes."""
+        job = self._jobs[job_id]
+        while True:
+            changed = job._changed
+            for entry in list(job.logs):
+                if entry["seq"] > after:
+                    after = entry["seq"]
+                    yield entry
+            if job.done:
+                return
+            await changed.wait()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == RUNNING)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "queue_depth": self.queue_depth,
+            "running": self.running,
+            "busy_ratio": round(self.running / self.max_workers, 2),
+            "wait_p50": _percentile(self._waits, 0.5),
+            "wait_p95": _percentile(self._waits, 0.95),
+            "duration_p50": _percentile(self._durations, 0.5),
+            "duration_p95": _percentile(self._durations, 0.95),
+            "duration_max": _percentile(self._durations, 1.0),
+            **self.stats,
+        }
+
+    # --- Internals ---
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._waits.append(job.started_at - job.created_at)
+            job.log(f"Started on worker {index}")
+            job.task = asyncio.create_task(job.fn(job))
+            try:
+                job.result = await asyncio.shield(job.task)
+                self._finish(job, SUCCEEDED)
+            except asyncio.CancelledError:
+                if self._stopping:
+                    # The worker itself is being stopped.
+                    job.task.cancel()
+                    if not job.done:
+                        self._finish(job, CANCELLED, error="Server shutting down")
+                    raise
+                self._finish(job, CANCELLED, error="Cancelled")
+            except Exception as e:
+                self._finish(job, FAILED, error=str(e) or type(e).__name__)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self.stats[status] += 1
+        if job.started_at is not None:
+            self._durations.append(job.finished_at - job.started_at)
+        job.log(f"Job {status}" + (f": {error}" if error else ""))
+        print(f"[JOBS] {job.kind} {job.id} {status} ({job.to_dict()['runSeconds'] or 0:.1f}s)")
+        self._evict()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
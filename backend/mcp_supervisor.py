@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from mcp import ClientSession
+from mcp.client.stdio import stdio_client
+
+from agent_core import SessionHandle
+
+# --- Configuration ---
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+BACKOFF_FACTOR = 2.0
+# The live session is pinged this often; a failed ping counts as a lost connection.
+HEALTH_INTERVAL = 15.0
+HEALTH_TIMEOUT = 5.0
+# A run interrupted by a lost connection is resumed from its checkpoint at most this often.
+MAX_RESUMES = 2
+
+class MCPSupervisor:
+    """
+    Keeps an MCP stdio session attached to a SessionHandle for the server's lifetime.
+
+    Connects, runs `on_session(session)` (cookie injection, tool reconciliation) and
+    attaches the session to the handle. When the connection is lost (a tool reports it
+    through the handle, a health ping fails, or the bridge process exits) the handle is
+    detached, so tool calls wait, and the bridge is restarted with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        server_params,
+        handle: SessionHandle,
+        on_session: Optional[Callable[[Any], Awaitable[None]]] = None,
+        backoff_initial: float = BACKOFF_INITIAL,
+        backoff_max: float = BACKOFF_MAX,
+        health_interval: float = HEALTH_INTERVAL,
+    ):
+        self.server_params = server_params
+        self.handle = handle
+        self.on_session = on_session
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.health_interval = health_interval
+        self._down_since: Optional[float] = time.monotonic()
+        self.stats: Dict[str, Any] = {
+            "connects": 0,
+            "reconnects": 0,
+            "failed_attempts": 0,
+            "resumed_runs": 0,
+            "total_downtime_seconds": 0.0,
+            "last_downtime_seconds": None,
+            "last_error": None,
+        }
+
+    async def run(self, shutdown: asyncio.Event):
+        delay = self.backoff_initial
+        while not shutdown.is_set():
+            error: Optional[BaseException] = None
+            try:
+                async with stdio_client(self.server_params) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        if self.on_session is not None:
+                            await self.on_session(session)
+                        self._attached(session)
+                        delay = self.backoff_initial
+                        await self._watch(session, shutdown)
+            except Exception as e:
+                error = e
+            if shutdown.is_set():
+                break
+
+            self._lost(error)
+            print(f"[MCP] Connection lost ({self.stats['last_error']}); reconnecting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(shutdown.wait(), delay * (1 + random.uniform(0, 0.2)))
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * BACKOFF_FACTOR, self.backoff_max)
+
+        self.handle.detach(ConnectionError("MCP server shut down"), final=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        current = round(time.monotonic() - self._down_since, 3) if self._down_since is not None else 0.0
+        return {"connected": self.handle.connected, "current_downtime_seconds": current, **self.stats}
+
+    async def stream_with_resume(
+        self,
+        make_stream: Callable[[Any], AsyncIterator[Any]],
+        inputs: Any,
+        max_resumes: int = MAX_RESUMES,
+    ) -> AsyncIterator[Any]:
+        """
+        Yields from `make_stream(inputs)`. When the run dies with ConnectionError, waits
+        for the session to be re-attached and continues with `make_stream(None)`, which
+        resumes the LangGraph thread from its last checkpoint instead of restarting the
+        task. The interrupted tool step runs again, but ToolRunner skips the calls that
+        had finished and does not replay a mutating call that was cut off.
+        """
+        resumes = 0
+        while True:
+            try:
+                async for item in make_stream(inputs):
+                    yield item
+                return
+            except ConnectionError as e:
+                if resumes >= max_resumes:
+                    raise
+                resumes += 1
+                print(f"[MCP] Run interrupted ({e}); resuming from checkpoint after reconnect ({resumes}/{max_resumes})")
+                await self.handle.wait()
+                self.stats["resumed_runs"] += 1
+                inputs = None
+
+    # --- Internals ---
+    def _attached(self, session):
+        self.handle.attach(session)
+        if self.stats["connects"]:
+            self.stats["reconnects"] += 1
+        self.stats["connects"] += 1
+        if self._down_since is not None and self.stats["reconnects"]:
+            downtime = time.monotonic() - self._down_since
+            self.stats["last_downtime_seconds"] = round(downtime, 3)
+            self.stats["total_downtime_seconds"] = round(self.stats["total_downtime_seconds"] + downtime, 3)
+            print(f"[MCP] Reconnected after {downtime:.2f}s of downtime")
+        self._down_since = None
+
+    def _lost(self, error: Optional[BaseException]):
+        error = error or self.handle.lost_error or ConnectionError("MCP connection closed")
+        self.stats["last_error"] = str(error) or type(error).__name__
+        if self._down_since is None:
+            self._down_since = time.monotonic()
+        else:
+            # Never got attached: the connection attempt itself failed.
+            self.stats["failed_attempts"] += 1
+        self.handle.detach(error)
+
+    async def _watch(self, session, shutdown: asyncio.Event):
+        """Returns on shutdown; raises ConnectionError when the session is lost."""
+        waiters = [asyncio.ensure_future(shutdown.wait()), asyncio.ensure_future(self.handle.wait_lost())]
+        try:
+            while True:
+                await asyncio.wait(waiters, timeout=self.health_interval, return_when=asyncio.FIRST_COMPLETED)
+                if shutdown.is_set():
+                    return
+                if self.handle.lost_error is not None:
+                    raise ConnectionError(str(self.handle.lost_error))
+                try:
+                    await asyncio.wait_for(session.send_ping(), HEALTH_TIMEOUT)
+                except Exception as e:
+                    raise ConnectionError(f"Health check failed: {e or type(e).__name__}")
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
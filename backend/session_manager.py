@@ -1,7 +1,19 @@
 import json
+import os
+import time
 import asyncio
+from typing import Any, Dict, Optional
+
+from agent_core import run_page_script, tool_result_json
 
 AUTH_FILE = "auth.json"
+TARGET_ORIGIN = "https://www.xiaohongshu.com"
+
+# How long an injected session is trusted before we inject again.
+SESSION_FRESH_SECONDS = 30 * 60
+# Upper bound for waiting on a tab to finish loading (replaces the old fixed sleeps).
+READY_TIMEOUT = 10.0
+READY_POLL_INTERVAL = 0.25
 
 def load_auth_data():
     try:
@@ -13,25 +25,174 @@ def load_auth_data():
         print(f"Error loading auth.json: {e}")
         return None
 
-async def inject_session(mcp_session):
+def _auth_mtime() -> float:
+    try:
+        return os.path.getmtime(AUTH_FILE)
+    except OSError:
+        return 0.0
+
+# --- Cookie State Tracking ---
+class CookieStateTracker:
+    """
+    Remembers when each origin last received the auth.json session.
+    All MCP sessions drive the same browser, so state is tracked per origin.
+    An entry stops being fresh when its TTL passes, when the earliest injected
+    cookie expires, or when auth.json changes on disk. The browser can also lose
+    the session on its own (restart, logout, cleared site data), so a fresh entry
+    is only a hint: inject_session confirms it against the live browser.
+    """
+
+    def __init__(self, ttl: float = SESSION_FRESH_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats: Dict[str, Any] = {
+            "injections": 0,
+            "skipped": 0,
+            "probe_failures": 0,
+            "total_injection_seconds": 0.0,
+            "last_elapsed": None,
+            "last_ready_wait": None,
+        }
+
+    def lock(self, origin: str) -> asyncio.Lock:
+        """Serializes check-and-inject per origin so concurrent connects inject once."""
+        return self._locks.setdefault(origin, asyncio.Lock())
+
+    def is_fresh(self, origin: str, auth_mtime: float) -> bool:
+        entry = self._entries.get(origin)
+        if not entry:
+            return False
+        if entry["auth_mtime"] != auth_mtime:
+            return False
+        return time.time() < entry["fresh_until"]
+
+    def mark(self, origin: str, auth_mtime: float, cookie_expiry: Optional[float]) -> None:
+        fresh_until = time.time() + self.ttl
+        if cookie_expiry:
+            fresh_until = min(fresh_until, cookie_expiry)
+        self._entries[origin] = {"auth_mtime": auth_mtime, "fresh_until": fresh_until}
+
+    def invalidate(self, origin: Optional[str] = None) -> None:
+        if origin is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(origin, None)
+
+    def record(self, elapsed: float, ready_wait: float, skipped: bool) -> None:
+        if skipped:
+            self.stats["skipped"] += 1
+        else:
+            self.stats["injections"] += 1
+            self.stats["total_injection_seconds"] += elapsed
+        self.stats["last_elapsed"] = round(elapsed, 3)
+        self.stats["last_ready_wait"] = round(ready_wait, 3)
+
+SESSION_TRACKER = CookieStateTracker()
+
+# --- Bridge Helpers ---
+async def _active_tab(mcp_session) -> Optional[Dict[str, Any]]:
+    result = await mcp_session.call_tool("get_windows_and_tabs", arguments={})
+    data = tool_result_json(result)
+    if not isinstance(data, dict):
+        return None
+    for window in data.get("windows", []):
+        for tab in window.get("tabs", []):
+            if tab.get("active"):
+                return tab
+    return None
+
+async def wait_for_tab_ready(mcp_session, origin: str, timeout: float = READY_TIMEOUT) -> float:
+    """
+    Polls the bridge until the active tab is on `origin` and its document has loaded.
+    `chrome_get_web_content` injects its helper at document_idle, so a successful
+    response means document.readyState has settled. Returns the seconds waited;
+    gives up silently at the deadline so callers degrade to the old behaviour.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        try:
+            tab = await _active_tab(mcp_session)
+            if tab and tab.get("url", "").startswith(origin):
+                remaining = max(0.5, deadline - time.monotonic())
+                probe = await asyncio.wait_for(
+                    mcp_session.call_tool("chrome_get_web_content", arguments={"textContent": False}),
+                    timeout=remaining,
+                )
+                data = tool_result_json(probe)
+                if isinstance(data, dict) and data.get("success") and str(data.get("url", "")).startswith(origin):
+                    return time.monotonic() - started
+        except Exception:
+            pass
+        await asyncio.sleep(READY_POLL_INTERVAL)
+    print(f"[SESSION] Tab on {origin} not ready after {timeout:.1f}s, continuing anyway.")
+    return time.monotonic() - started
+
+def _earliest_cookie_expiry(cookies) -> Optional[float]:
+    expiries = [c["expires"] for c in cookies if isinstance(c.get("expires"), (int, float)) and c["expires"] > 0]
+    return min(expiries) if expiries else None
+
+def _injectable_cookies(data) -> list:
+    return [c for c in data.get("cookies", []) if not c.get("httpOnly") and "xiaohongshu.com" in c.get("domain", "")]
+
+# Page-script handler: reports whether document.cookie still carries the named cookie.
+HAS_COOKIE_SCRIPT = """
+return document.cookie.split('; ').some(part => part.split('=')[0] === payload.name);
+"""
+
+async def _browser_has_session(mcp_session, origin: str, cookies) -> bool:
+    """
+    Cheap check that the browser still holds the injected session: reads one known
+    cookie from a tab on `origin` (the active one, so nothing is opened or focused).
+    Any doubt -- no probe cookie, no tab on the origin, a bridge error -- returns False.
+    """
+    name = next((c.get("name") for c in cookies if c.get("name")), None)
+    if not name:
+        return False
+    try:
+        tab = await _active_tab(mcp_session)
+        if not tab or not tab.get("url", "").startswith(origin) or tab.get("tabId") is None:
+            return False
+        return bool(await run_page_script(mcp_session, "hasCookie", HAS_COOKIE_SCRIPT, {"name": name}, tab_id=tab["tabId"]))
+    except Exception:
+        return False
+
+async def inject_session(mcp_session, force: bool = False):
     """
     Injects cookies and localStorage from auth.json into the current browser session.
+    Skips the work when the origin already carries a fresh injected session and the
+    browser still holds its cookie. Check and injection run under a per-origin lock.
     """
+    started = time.monotonic()
     data = load_auth_data()
     if not data:
         return "Error: auth.json not found or invalid."
 
+    target_origin = TARGET_ORIGIN
+    async with SESSION_TRACKER.lock(target_origin):
+        return await _inject(mcp_session, data, target_origin, force, started)
+
+async def _inject(mcp_session, data, target_origin: str, force: bool, started: float):
+    auth_mtime = _auth_mtime()
+    if not force and SESSION_TRACKER.is_fresh(target_origin, auth_mtime):
+        if await _browser_has_session(mcp_session, target_origin, _injectable_cookies(data)):
+            elapsed = time.monotonic() - started
+            SESSION_TRACKER.record(elapsed, 0.0, skipped=True)
+            print(f"[SESSION] Session for {target_origin} is still fresh, skipping injection.")
+            return "Session already injected and fresh (skipped)."
+        SESSION_TRACKER.stats["probe_failures"] += 1
+        SESSION_TRACKER.invalidate(target_origin)
+        print(f"[SESSION] Could not confirm the session for {target_origin} in the browser, injecting again.")
+
     # 1. Open XHS in a new window to ensure we are on the right origin
     # We use chrome_navigate with newWindow=True
     print("Opening XHS to inject session...")
-    await mcp_session.call_tool("chrome_navigate", arguments={"url": "https://www.xiaohongshu.com", "newWindow": True})
-    
-    # Wait for the window to be ready (simple sleep for now, ideally we check tabs)
-    await asyncio.sleep(3)
-    
+    await mcp_session.call_tool("chrome_navigate", arguments={"url": target_origin, "newWindow": True})
+    ready_wait = await wait_for_tab_ready(mcp_session, target_origin)
+
     # 2. Prepare Injection Script
     # We need to find the localStorage for www.xiaohongshu.com
-    target_origin = "https://www.xiaohongshu.com"
     local_storage_items = []
     
     if "origins" in data:
@@ -41,8 +202,7 @@ async def inject_session(mcp_session):
                 break
     
     # Prepare Cookies (Non-HttpOnly)
-    cookies = data.get("cookies", [])
-    valid_cookies = [c for c in cookies if not c.get("httpOnly") and "xiaohongshu.com" in c.get("domain", "")]
+    valid_cookies = _injectable_cookies(data)
 
     js_script = f"""
     console.log("Starting Session Injection...");
@@ -78,7 +238,12 @@ async def inject_session(mcp_session):
     })
     
     # 4. Reload to apply changes
-    await asyncio.sleep(1)
     await mcp_session.call_tool("chrome_navigate", arguments={"refresh": True})
-    
-    return "Session injected successfully! (Note: HttpOnly cookies cannot be injected via this method, so full login might not persist if session relies on them.)"
+    ready_wait += await wait_for_tab_ready(mcp_session, target_origin)
+
+    SESSION_TRACKER.mark(target_origin, auth_mtime, _earliest_cookie_expiry(valid_cookies))
+    elapsed = time.monotonic() - started
+    SESSION_TRACKER.record(elapsed, ready_wait, skipped=False)
+    print(f"[SESSION] Injected session in {elapsed:.2f}s ({ready_wait:.2f}s waiting for page readiness).")
+
+    return f"Session injected successfully in {elapsed:.2f}s! (Note: HttpOnly cookies cannot be injected via this method, so full login might not persist if session relies on them.)"
@@ -0,0 +1,492 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.base import writes_sort_key
+
+# --- Configuration ---
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "checkpoints.sqlite")
+# Checkpoints kept per thread; older ones are only needed for time travel.
+DEFAULT_KEEP_CHECKPOINTS = 8
+# A list channel (e.g. messages) is stored as appended items on top of its previous
+# version; every SNAPSHOT_EVERY versions a full copy bounds the chain read on load.
+SNAPSHOT_EVERY = 16
+# Threads untouched for this long are deleted (None keeps them forever).
+DEFAULT_THREAD_TTL = 7 * 24 * 60 * 60
+COMPRESSION_LEVEL = 6
+# Pruning and expiry run every this many puts, not on every put.
+MAINTENANCE_EVERY = 16
+# List values remembered (by reference) to detect appends; bounds the live objects kept.
+MAX_DELTA_BASES = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    channel_versions TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB,
+    base_version TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    data BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS latest (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+"""
+
+# Returned by _load_channel for empty channels and broken delta chains.
+_MISSING = object()
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+class SQLiteSaver(BaseCheckpointSaver):
+    """
+    Durable checkpointer for agent threads in a local SQLite database (WAL mode).
+
+    - Payloads are serialized with the graph's serde and zlib-compressed.
+    - Like MemorySaver, only channels whose version changed are written per checkpoint.
+      List channels that grew by appending (the message history) are stored as the
+      appended items on top of the previous version, with a full copy every
+      `snapshot_every` versions.
+    - A `latest` table points at each thread's newest checkpoint, so loading the
+      current state is a handful of primary-key lookups regardless of history length.
+    - Each thread keeps its newest `keep_checkpoints` checkpoints; threads idle
+      longer than `ttl` are deleted unless pinned with `in_use()`.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        *,
+        keep_checkpoints: int = DEFAULT_KEEP_CHECKPOINTS,
+        snapshot_every: int = SNAPSHOT_EVERY,
+        ttl: Optional[float] = DEFAULT_THREAD_TTL,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_checkpoints = max(1, keep_checkpoints)
+        self.snapshot_every = max(1, snapshot_every)
+        self.ttl = ttl
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._active: Dict[str, int] = {}
+        # (thread_id, checkpoint_ns, channel) -> (version, items, depth) of the last list value written
+        self._last_lists: "OrderedDict[Tuple[str, str, str], Tuple[str, List[Any], int]]" = OrderedDict()
+        self._puts_since_maintenance = 0
+        self.stats: Dict[str, Any] = {
+            "puts": 0,
+            "put_seconds": 0.0,
+            "full_blobs": 0,
+            "delta_blobs": 0,
+            "raw_bytes": 0,
+            "stored_bytes": 0,
+            "pruned_checkpoints": 0,
+            "expired_threads": 0,
+        }
+
+    # --- Public helpers ---
+    @contextmanager
+    def in_use(self, thread_id: str):
+        """Pin a thread while a run is using it (it is never expired meanwhile)."""
+        with self._lock:
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            threads = self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM latest").fetchone()[0]
+        size = 0
+        for suffix in ("", "-wal"):
+            try:
+                size += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        raw, stored = self.stats["raw_bytes"], self.stats["stored_bytes"]
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "active_threads": len(self._active),
+            "db_bytes": size,
+            "compression_ratio": round(raw / stored, 2) if stored else None,
+            "avg_put_ms": round(self.stats["put_seconds"] / self.stats["puts"] * 1000, 3) if self.stats["puts"] else None,
+            **self.stats,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Checkpointer interface ---
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            checkpoint_id = get_checkpoint_id(config)
+            if not checkpoint_id:
+                row = self._conn.execute(
+                    "SELECT checkpoint_id FROM latest WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+                if row is None:
+                    return None
+                checkpoint_id = row[0]
+            row = self._conn.execute(
+                "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[4], row[5])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                yield self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+        started = time.perf_counter()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        checkpoint_type, checkpoint_data = self._dumps(c)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            blob_rows = [
+                (thread_id, checkpoint_ns, channel, version, *self._encode_channel(thread_id, checkpoint_ns, channel, version, values))
+                for channel, version in new_versions.items()
+            ]
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, data, base_version, depth) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    blob_rows,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+                    "metadata_type, metadata, channel_versions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                        checkpoint_type, checkpoint_data, metadata_type, metadata_data,
+                        json.dumps(checkpoint.get("channel_versions", {})),
+                    ),
+                )
+                self._conn.execute(
+                    "INSERT INTO latest (thread_id, checkpoint_ns, checkpoint_id, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET "
+                    "checkpoint_id = MAX(checkpoint_id, excluded.checkpoint_id), updated_at = excluded.updated_at",
+                    (thread_id, checkpoint_ns, checkpoint["id"], time.time()),
+                )
+
+            self._puts_since_maintenance += 1
+            if self._puts_since_maintenance >= MAINTENANCE_EVERY:
+                self._puts_since_maintenance = 0
+                self._prune_all()
+                self._expire()
+
+            self.stats["puts"] += 1
+            self.stats["put_seconds"] += time.perf_counter() - started
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        replace = False
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            replace = replace or write_idx < 0
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, *self._dumps(value), task_path))
+        # Regular writes are idempotent per (task, idx); special channels (errors, interrupts) overwrite.
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, data, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            for table in ("checkpoints", "blobs", "writes", "latest"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [k for k in self._last_lists if k[0] == thread_id]:
+                del self._last_lists[key]
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Serialization ---
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        self.stats["raw_bytes"] += len(data)
+        self.stats["stored_bytes"] += len(compressed)
+        return type_, compressed
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data)))
+
+    def _encode_channel(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, values: Dict[str, Any]):
+        """Returns (type, data, base_version, depth) for one channel blob row."""
+        key = (thread_id, checkpoint_ns, channel)
+        if channel not in values:
+            self._last_lists.pop(key, None)
+            return "empty", b"", None, 0
+        value = values[channel]
+        if not isinstance(value, list):
+            self._last_lists.pop(key, None)
+            self.stats["full_blobs"] += 1
+            return (*self._dumps(value), None, 0)
+
+        previous = self._last_lists.get(key)
+        items = list(value)
+        if (
+            previous is not None
+            and previous[2] + 1 < self.snapshot_every
+            and len(items) >= len(previous[1])
+            and all(a is b for a, b in zip(items, previous[1]))
+        ):
+            # Same leading items (by identity) as the previous version: store only the appended tail.
+            base_version, base_items, depth = previous
+            self._remember(key, (version, items, depth + 1))
+            self.stats["delta_blobs"] += 1
+            return (*self._dumps(items[len(base_items):]), base_version, depth + 1)
+
+        self._remember(key, (version, items, 0))
+        self.stats["full_blobs"] += 1
+        return (*self._dumps(value), None, 0)
+
+    def _remember(self, key, entry):
+        self._last_lists[key] = entry
+        self._last_lists.move_to_end(key)
+        while len(self._last_lists) > MAX_DELTA_BASES:
+            self._last_lists.popitem(last=False)
+
+    def _load_channel(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Any:
+        """Resolves a channel value (or _MISSING), following delta rows back to their full snapshot."""
+        parts = []
+        while version is not None:
+            row = self._conn.execute(
+                "SELECT type, data, base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                return _MISSING
+            parts.append(self._loads(row[0], row[1]))
+            version = row[2]
+        value = parts.pop()
+        if not parts:
+            return value
+        value = list(value)
+        for tail in reversed(parts):
+            value.extend(tail)
+        return value
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, checkpoint_type, checkpoint_data, metadata_type, metadata_data = row
+        checkpoint = self._loads(checkpoint_type, checkpoint_data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            value = self._load_channel(thread_id, checkpoint_ns, channel, version)
+            if value is not _MISSING:
+                channel_values[channel] = value
+        writes = self._conn.execute(
+            "SELECT task_id, idx, channel, type, data, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._loads(metadata_type, metadata_data),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self._loads(type_, data)) for task_id, _, channel, type_, data, _ in writes],
+        )
+
+    # --- Maintenance ---
+    def _prune_all(self):
+        counts = self._conn.execute(
+            "SELECT thread_id, checkpoint_ns FROM checkpoints GROUP BY thread_id, checkpoint_ns HAVING COUNT(*) > ?",
+            (self.keep_checkpoints,),
+        ).fetchall()
+        for thread_id, checkpoint_ns in counts:
+            self._prune_thread(thread_id, checkpoint_ns)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        rows = self._conn.execute(
+            "SELECT checkpoint_id, channel_versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        kept, stale = rows[:self.keep_checkpoints], rows[self.keep_checkpoints:]
+        if not stale:
+            return
+
+        # Blobs still needed: those referenced by kept checkpoints plus the delta chains beneath them.
+        bases = {
+            (channel, version): base
+            for channel, version, base in self._conn.execute(
+                "SELECT channel, version, base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            )
+        }
+        needed = set()
+        for _, versions in kept:
+            for channel, version in json.loads(versions or "{}").items():
+                key = (channel, version)
+                while key in bases and key not in needed:
+                    needed.add(key)
+                    key = (channel, bases[key])
+
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _ in stale],
+            )
+            self._conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _ in stale],
+            )
+            self._conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                [(thread_id, checkpoint_ns, channel, version) for channel, version in bases if (channel, version) not in needed],
+            )
+        for key, (version, _, _) in list(self._last_lists.items()):
+            if key[:2] == (thread_id, checkpoint_ns) and (key[2], version) not in needed:
+                del self._last_lists[key]
+        self.stats["pruned_checkpoints"] += len(stale)
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        cutoff = time.time() - self.ttl
+        expired = [
+            thread_id
+            for (thread_id,) in self._conn.execute(
+                "SELECT thread_id FROM latest GROUP BY thread_id HAVING MAX(updated_at) < ?", (cutoff,)
+            ).fetchall()
+            if thread_id not in self._active
+        ]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        self.stats["expired_threads"] += len(expired)
+
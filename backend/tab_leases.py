@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Set
+
+from agent_core import TabBinding, navigated_tab_id, tool_result_json
+
+# --- Configuration ---
+DEFAULT_MAX_TABS = 4
+
+class TabLeaser:
+    """
+    Hands out browser tabs to concurrent agent runs on one Chrome instance.
+
+    - At most `max_tabs` leases are active; waiters are served strictly FIFO.
+    - Each lease opens its own tab and yields a TabBinding for agent_core.bound_tab().
+    - Most bridge tools act on the *active* tab, so active-tab calls are serialized
+      through one focus lock that first re-activates the caller's tab if needed.
+      The bridge can only activate a tab by URL, so if two tabs share a URL the
+      first one wins; leased tabs start on a unique URL fragment to avoid that.
+    - That focus lock is global to the browser: active-tab tools (clicks, fills,
+      screenshots, page scripts) from different sessions run one at a time, and a
+      slow one holds up the others. Only tools that take a tabId run in parallel,
+      so more leases add concurrency for those, not for active-tab work.
+    - chrome_close_tabs from a leased run is refused for tabs leased by another run.
+    """
+
+    def __init__(self, max_tabs: int = DEFAULT_MAX_TABS):
+        self.max_tabs = max(1, max_tabs)
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._bindings: Set[TabBinding] = set()
+        self._focus_lock = asyncio.Lock()
+        self._focused_tab: Optional[int] = None
+        self._ids = itertools.count(1)
+        self.stats: Dict[str, Any] = {
+            "leases": 0,
+            "waited": 0,
+            "focus_switches": 0,
+            "focus_misses": 0,
+        }
+
+    @asynccontextmanager
+    async def lease(self, session, start_url: Optional[str] = None, label: str = ""):
+        """
+        Lease a tab for one agent run. With `start_url`, a fresh tab is opened there;
+        without it the binding adopts the first tab the agent navigates to.
+        Tabs opened during the lease are closed when it ends.
+        """
+        await self._acquire_slot()
+        binding = TabBinding(session=session, focus=self._focus, label=label, leased_elsewhere=self._leased_elsewhere)
+        self._bindings.add(binding)
+        try:
+            self.stats["leases"] += 1
+            if start_url:
+                url = f"{start_url}#mcp-tab-{next(self._ids)}"
+                async with self._focus_lock:
+                    result = await session.call_tool("chrome_navigate", arguments={"url": url})
+                    binding.adopt(navigated_tab_id(result))
+                    self._focused_tab = binding.tab_id
+            yield binding
+        finally:
+            try:
+                await self._close_tabs(session, binding.opened_tabs)
+            finally:
+                self._bindings.discard(binding)
+                self._release_slot()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        """Hold the browser focus without a tab (e.g. for session injection in a new window)."""
+        async with self._focus_lock:
+            try:
+                yield
+            finally:
+                self._focused_tab = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_tabs": self.max_tabs,
+            "active": self._active,
+            "waiting": len(self._waiters),
+            **self.stats,
+        }
+
+    # --- Scheduling ---
+    async def _acquire_slot(self):
+        if self._active < self.max_tabs and not self._waiters:
+            self._active += 1
+            return
+        self.stats["waited"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The releasing lease hands its slot straight to us (no re-check race).
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self._active -= 1
+
+    def _leased_elsewhere(self, binding: TabBinding, tab_id: int) -> bool:
+        return any(tab_id in other.opened_tabs for other in self._bindings if other is not binding)
+
+    # --- Focus ---
+    @asynccontextmanager
+    async def _focus(self, binding: TabBinding):
+        async with self._focus_lock:
+            if binding.tab_id is not None and self._focused_tab != binding.tab_id:
+                await self._activate(binding)
+            try:
+                yield
+            finally:
+                self._focused_tab = binding.tab_id
+
+    async def _activate(self, binding: TabBinding):
+        session = binding.session
+        data = tool_result_json(await session.call_tool("get_windows_and_tabs", arguments={}))
+        url = None
+        for window in (data or {}).get("windows", []):
+            for tab in window.get("tabs", []):
+                if tab.get("tabId") == binding.tab_id:
+                    url = tab.get("url")
+        if not url:
+            print(f"[TABS] Tab {binding.tab_id} ({binding.label}) is gone; continuing in the active tab.")
+            self.stats["focus_misses"] += 1
+            return
+        activated = navigated_tab_id(await session.call_tool("chrome_navigate", arguments={"url": url}))
+        self.stats["focus_switches"] += 1
+        if activated != binding.tab_id:
+            print(f"[TABS] Focused tab {activated} instead of {binding.tab_id}: another tab shares {url}")
+            self.stats["focus_misses"] += 1
+
+    async def _close_tabs(self, session, tab_ids):
+        if not tab_ids:
+            return
+        try:
+            await session.call_tool("chrome_close_tabs", arguments={"tabIds": list(tab_ids)})
+        except Exception as e:
+            print(f"[TABS] Failed to close tabs {tab_ids}: {e}")
+        if self._focused_tab in tab_ids:
+            self._focused_tab = None
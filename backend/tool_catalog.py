@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from agent_core import schema_hash, tool_schema_fingerprint
+
+# --- Configuration ---
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tool_catalog.json")
+CATALOG_VERSION = 1
+
+class ToolCatalog:
+    """
+    On-disk copy of the MCP server's `list_tools()` result.
+
+    Lets the agent graph be built at startup before the MCP connection exists. Each
+    tool is stored with the hash of its input schema, the same key that memoizes its
+    generated args model (see create_pydantic_model_from_schema). After connecting,
+    `is_current()` tells whether the live schemas drifted from the cached ones.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.fingerprint: Optional[str] = None
+
+    def load(self) -> Optional[SimpleNamespace]:
+        """Returns a `list_tools()`-shaped object (`.tools` with name/description/inputSchema), or None."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[CATALOG] Ignoring unreadable tool catalog {self.path}: {e}")
+            return None
+        if data.get("version") != CATALOG_VERSION:
+            return None
+
+        tools = [
+            SimpleNamespace(name=t["name"], description=t.get("description"), inputSchema=t.get("inputSchema") or {})
+            for t in data.get("tools", [])
+        ]
+        tools_list = SimpleNamespace(tools=tools)
+        # Recompute rather than trust the file, so a hand-edited catalog can't mask drift.
+        self.fingerprint = tool_schema_fingerprint(tools_list)
+        return tools_list
+
+    def save(self, tools_list) -> str:
+        fingerprint = tool_schema_fingerprint(tools_list)
+        data: Dict[str, Any] = {
+            "version": CATALOG_VERSION,
+            "fingerprint": fingerprint,
+            "saved_at": time.time(),
+            "tools": [
+                {
+                    "name": t.name,
+                    "description": t.description,
+                    "inputSchema": t.inputSchema or {},
+                    "schemaHash": schema_hash(t.inputSchema or {}),
+                }
+                for t in tools_list.tools
+            ],
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.fingerprint = fingerprint
+        return fingerprint
+
+    def is_current(self, tools_list) -> bool:
+        return self.fingerprint is not None and self.fingerprint == tool_schema_fingerprint(tools_list)
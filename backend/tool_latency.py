@@ -0,0 +1,142 @@
+import bisect
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# --- Configuration ---
+# Used until a tool has MIN_SAMPLES observations.
+DEFAULT_TOOL_TIMEOUT = 30.0
+TIMEOUT_FLOOR = 5.0
+TIMEOUT_CEILING = 120.0
+# Per-tool clamps: page loads may legitimately take long, tab listing never should.
+TOOL_TIMEOUT_FLOORS = {
+    "chrome_navigate": 15.0,
+    "chrome_get_web_content": 10.0,
+    "chrome_screenshot": 10.0,
+    "chrome_inject_script": 10.0,
+    "chrome_send_command_to_inject_script": 10.0,
+}
+TOOL_TIMEOUT_CEILINGS = {
+    "get_windows_and_tabs": 10.0,
+    "chrome_close_tabs": 10.0,
+}
+# timeout = percentile(recent latencies) * headroom, clamped to [floor, ceiling].
+TIMEOUT_PERCENTILE = 0.99
+TIMEOUT_HEADROOM = 2.0
+MIN_SAMPLES = 20
+RECENT_SAMPLES = 200
+# Histogram bucket upper bounds in seconds (the last bucket is open-ended).
+BUCKET_BOUNDS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0]
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class LatencyHistogram:
+    """Bucketed latency counts for one tool, plus a window of recent samples for percentiles."""
+
+    def __init__(self, recent: int = RECENT_SAMPLES):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.recent: Deque[float] = deque(maxlen=recent)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.errors = 0
+        self.timeouts = 0
+
+    def record(self, seconds: float):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.recent.append(seconds)
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        return _percentile(sorted(self.recent), q)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+        labels = [f"<={b:g}s" for b in BUCKET_BOUNDS] + [f">{BUCKET_BOUNDS[-1]:g}s"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg": round(self.total_seconds / self.count, 3) if self.count else None,
+            "max": round(self.max_seconds, 3),
+            "p50": round(_percentile(ordered, 0.5), 3) if ordered else None,
+            "p90": round(_percentile(ordered, 0.9), 3) if ordered else None,
+            "p99": round(_percentile(ordered, 0.99), 3) if ordered else None,
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+class ToolLatencyTracker:
+    """
+    Records per-tool call latencies and derives each tool's timeout from them.
+
+    Until a tool has `min_samples` observations it gets `default_timeout`. After that
+    the timeout is the `percentile` of its recent latencies times `headroom`, clamped
+    to the tool's floor and ceiling. Timed-out calls are recorded at the timeout value,
+    so a tool that keeps timing out has its limit raised (up to the ceiling).
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        floor: float = TIMEOUT_FLOOR,
+        ceiling: float = TIMEOUT_CEILING,
+        percentile: float = TIMEOUT_PERCENTILE,
+        headroom: float = TIMEOUT_HEADROOM,
+        min_samples: int = MIN_SAMPLES,
+        floors: Optional[Dict[str, float]] = None,
+        ceilings: Optional[Dict[str, float]] = None,
+    ):
+        self.default_timeout = default_timeout
+        self.floor = floor
+        self.ceiling = ceiling
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floors = dict(TOOL_TIMEOUT_FLOORS if floors is None else floors)
+        self.ceilings = dict(TOOL_TIMEOUT_CEILINGS if ceilings is None else ceilings)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, tool_name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(tool_name)
+        if histogram is None:
+            histogram = self._histograms[tool_name] = LatencyHistogram()
+        return histogram
+
+    def bounds(self, tool_name: str):
+        floor = self.floors.get(tool_name, self.floor)
+        ceiling = max(floor, self.ceilings.get(tool_name, self.ceiling))
+        return floor, ceiling
+
+    def timeout_for(self, tool_name: str) -> float:
+        floor, ceiling = self.bounds(tool_name)
+        histogram = self._histograms.get(tool_name)
+        if histogram is None or len(histogram.recent) < self.min_samples:
+            return min(max(self.default_timeout, floor), ceiling)
+        observed = histogram.percentile(self.percentile) * self.headroom
+        return min(max(observed, floor), ceiling)
+
+    def record(self, tool_name: str, seconds: float, outcome: str = "ok"):
+        """`outcome` is "ok", "error" (the call failed) or "timeout"."""
+        histogram = self.histogram(tool_name)
+        histogram.record(seconds)
+        if outcome == "error":
+            histogram.errors += 1
+        elif outcome == "timeout":
+            histogram.timeouts += 1
+
+    def timeouts(self) -> Dict[str, float]:
+        return {name: round(self.timeout_for(name), 2) for name in sorted(self._histograms)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {**histogram.snapshot(), "timeout": round(self.timeout_for(name), 2)}
+            for name, histogram in sorted(self._histograms.items())
+        }
+
+TOOL_LATENCY = ToolLatencyTracker()
@@ -0,0 +1,142 @@
+import json
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# --- Configuration ---
+# Approximate token budget for one tool result as it enters the conversation.
+DEFAULT_TOOL_TOKEN_BUDGET = 1500
+TOOL_TOKEN_BUDGETS = {
+    "chrome_get_web_content": 2000,
+    "chrome_get_interactive_elements": 1500,
+    "extract_images_from_page": 1500,
+    "get_windows_and_tabs": 600,
+    "chrome_screenshot": 300,
+    "read_tool_output": 2000,
+    "download_files": 2000,
+}
+# Out-of-band store for oversized results (pages are re-read with read_tool_output).
+STORE_MAX_ENTRIES = 64
+STORE_MAX_CHARS = 8 * 1024 * 1024
+
+_WS_RUN = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 chars per token for ASCII, ~1 token per CJK/other char."""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+def budget_for(tool_name: str) -> int:
+    return TOOL_TOKEN_BUDGETS.get(tool_name, DEFAULT_TOOL_TOKEN_BUDGET)
+
+def compact_text(text: str) -> str:
+    """Re-serializes JSON without indentation; otherwise collapses runs of whitespace and blank lines."""
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return json.dumps(json.loads(stripped), ensure_ascii=False, separators=(",", ":"))
+        except (json.JSONDecodeError, TypeError):
+            pass
+    lines = (_WS_RUN.sub(" ", line).strip() for line in stripped.splitlines())
+    return _BLANK_LINES.sub("\n", "\n".join(lines))
+
+def _cut(text: str, token_budget: int) -> int:
+    """Largest prefix length of `text` that fits in `token_budget` (by estimate_tokens)."""
+    # Any prefix longer than this exceeds the budget, so only search within it.
+    window = text[:token_budget * 4 + 8]
+    if len(window) == len(text) and estimate_tokens(text) <= token_budget:
+        return len(text)
+    text = window
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= token_budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    # Prefer to break at a line or word boundary.
+    boundary = max(text.rfind("\n", 0, lo), text.rfind(" ", 0, lo))
+    return boundary if boundary > lo * 0.8 else max(lo, 1)
+
+class ToolOutputStore:
+    """LRU store of full tool outputs too large for the conversation, split into pages."""
+
+    def __init__(self, max_entries: int = STORE_MAX_ENTRIES, max_chars: int = STORE_MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._chars = 0
+        self.stats: Dict[str, Any] = {"stored": 0, "reads": 0, "misses": 0, "evicted": 0}
+
+    def put(self, tool_name: str, text: str, page_tokens: int) -> Dict[str, Any]:
+        pages = []
+        rest = text
+        while rest:
+            cut = _cut(rest, page_tokens)
+            pages.append(rest[:cut])
+            rest = rest[cut:].lstrip()
+        handle = f"{tool_name}-{uuid.uuid4().hex[:8]}"
+        entry = {"tool": tool_name, "pages": pages, "created": time.time(), "chars": len(text)}
+        self._entries[handle] = entry
+        self._chars += len(text)
+        self.stats["stored"] += 1
+        self._evict()
+        return {"handle": handle, **entry}
+
+    def get(self, handle: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(handle)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(handle)
+        self.stats["reads"] += 1
+        return entry
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "chars": self._chars, **self.stats}
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._chars > self.max_chars):
+            _, entry = self._entries.popitem(last=False)
+            self._chars -= entry["chars"]
+            self.stats["evicted"] += 1
+
+OUTPUT_STORE = ToolOutputStore()
+
+def _page_footer(handle: str, page: int, total: int, total_tokens: Optional[int] = None) -> str:
+    size = f", ~{total_tokens} tokens total" if total_tokens else ""
+    if page < total:
+        return (f"\n[Output truncated: page {page}/{total}{size}. "
+                f"Call read_tool_output(handle=\"{handle}\", page={page + 1}) for more.]")
+    return f"\n[End of output: page {page}/{total}{size}.]"
+
+def compact_tool_output(tool_name: str, text: str, budget: Optional[int] = None, store: ToolOutputStore = OUTPUT_STORE) -> str:
+    """
+    Compacts a tool result and enforces the tool's token budget. Oversized results are
+    stored out-of-band; the first page is returned with a handle for read_tool_output.
+    """
+    budget = budget or budget_for(tool_name)
+    compact = compact_text(text)
+    total_tokens = estimate_tokens(compact)
+    if total_tokens <= budget:
+        return compact
+    entry = store.put(tool_name, compact, page_tokens=budget)
+    pages = entry["pages"]
+    print(f"[TOOL] {tool_name} output ~{total_tokens} tokens > budget {budget}; stored as {entry['handle']} ({len(pages)} pages)")
+    return pages[0] + _page_footer(entry["handle"], 1, len(pages), total_tokens)
+
+def read_tool_output(handle: str, page: int = 1) -> str:
+    """
+    Reads one page of a large tool output that was truncated in an earlier tool result.
+    Use the handle and page number given in the truncation note.
+    """
+    entry = OUTPUT_STORE.get(handle)
+    if entry is None:
+        return f"Error: No stored output for handle '{handle}' (it may have expired). Call the original tool again."
+    pages = entry["pages"]
+    if not 1 <= page <= len(pages):
+        return f"Error: Page {page} out of range; '{handle}' has {len(pages)} pages."
+    return pages[page - 1] + _page_footer(handle, page, len(pages))
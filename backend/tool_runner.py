@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+# --- Configuration ---
+# Tools without side effects on the browser or disk layout; calls to these within one
+# model turn may overlap. Everything else (click, fill, navigate, ...) runs serially.
+READ_ONLY_TOOLS = {
+    "get_windows_and_tabs",
+    "search_tabs_content",
+    "chrome_get_web_content",
+    "chrome_get_interactive_elements",
+    "chrome_screenshot",
+    "chrome_history",
+    "chrome_bookmark_search",
+    "chrome_console",
+    "extract_images_from_page",
+    "download_file",
+    "download_files",
+    "read_tool_output",
+    "request_more_tools",
+}
+# Threads whose interrupted tool turn may still be resumed; older records are dropped.
+MAX_PENDING_TURNS = 64
+INTERRUPTED_WRITE = (
+    "Error: The browser connection was lost while this action was running, so it may or may not "
+    "have taken effect. It was not repeated automatically. Check the page before trying it again."
+)
+
+def side_effect_class(tool_name: str) -> str:
+    """"read" for tools that may run concurrently, "write" for ones that must keep their order."""
+    return "read" if tool_name in READ_ONLY_TOOLS else "write"
+
+def _error_message(call: Dict[str, Any], error: Exception) -> ToolMessage:
+    return ToolMessage(
+        content=f"Error: {error!r}\n Please fix your mistakes.",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+class ToolRunner:
+    """
+    Executes the tool calls of one model turn (replaces ToolNode in the agent graph).
+
+    Consecutive read-only calls run concurrently; a mutating call waits for everything
+    before it and blocks everything after it, so the order of side effects matches the
+    order the model asked for. ToolMessages are returned in tool_call order. Tools acting
+    on the active tab are additionally serialized by the tab binding's focus lock.
+
+    When the MCP connection drops mid-turn, the run is resumed from its checkpoint and the
+    same turn runs again. Calls that had already finished are not re-run (their recorded
+    ToolMessage is reused), and a mutating call that was cut off is reported to the model
+    as interrupted instead of being replayed.
+    """
+
+    def __init__(self, tools: List[Any]):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.stats: Dict[str, Any] = {
+            "turns": 0,
+            "calls": 0,
+            "parallel_calls": 0,
+            "serial_calls": 0,
+            "errors": 0,
+            "last_turn_seconds": 0.0,
+            "total_turn_seconds": 0.0,
+            # Sum of individual call durations minus wall time: what overlapping saved.
+            "saved_seconds": 0.0,
+            "resumed_calls_skipped": 0,
+            "interrupted_writes": 0,
+        }
+        # Per thread: tool_call_id -> result of the call, kept until its turn completes.
+        self._finished: "OrderedDict[str, Dict[str, ToolMessage]]" = OrderedDict()
+
+    async def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        message = state["messages"][-1]
+        tool_calls = message.tool_calls if isinstance(message, AIMessage) else []
+        started = time.perf_counter()
+        durations: List[float] = []
+        results: List[Optional[ToolMessage]] = [None] * len(tool_calls)
+        parallel = 0
+        thread_id = (config.get("configurable") or {}).get("thread_id", "")
+        finished = self._finished.setdefault(thread_id, {})
+        self._finished.move_to_end(thread_id)
+        while len(self._finished) > MAX_PENDING_TURNS:
+            self._finished.popitem(last=False)
+
+        for batch in self._batches(tool_calls):
+            pending = []
+            for i in batch:
+                if tool_calls[i]["id"] in finished:
+                    # Resumed turn: this call already ran before the connection dropped.
+                    results[i] = finished[tool_calls[i]["id"]]
+                    self.stats["resumed_calls_skipped"] += 1
+                else:
+                    pending.append(i)
+            if len(pending) > 1:
+                parallel += len(pending)
+            outcomes = await asyncio.gather(*(self._run_call(tool_calls[i], config, finished) for i in pending))
+            for index, (tool_message, seconds) in zip(pending, outcomes):
+                results[index] = tool_message
+                durations.append(seconds)
+
+        self._finished.pop(thread_id, None)
+        wall = time.perf_counter() - started
+        self._record(len(tool_calls), parallel, wall, sum(durations), results)
+        if tool_calls:
+            print(f"[TOOLS] Turn: {len(tool_calls)} calls ({parallel} parallel) in {wall:.2f}s "
+                  f"(sequential ~{sum(durations):.2f}s)")
+        return {"messages": results}
+
+    def snapshot(self) -> Dict[str, Any]:
+        turns = self.stats["turns"]
+        return {
+            **self.stats,
+            "avg_turn_seconds": round(self.stats["total_turn_seconds"] / turns, 3) if turns else 0.0,
+        }
+
+    # --- Internals ---
+    @staticmethod
+    def _batches(tool_calls: List[Dict[str, Any]]) -> List[List[int]]:
+        """Groups call indices: runs of read-only calls share a batch, each write is alone."""
+        batches: List[List[int]] = []
+        for index, call in enumerate(tool_calls):
+            if side_effect_class(call["name"]) == "read" and batches and side_effect_class(tool_calls[batches[-1][0]]["name"]) == "read":
+                batches[-1].append(index)
+            else:
+                batches.append([index])
+        return batches
+
+    async def _run_call(self, call: Dict[str, Any], config: RunnableConfig, finished: Dict[str, ToolMessage]):
+        started = time.perf_counter()
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            available = ", ".join(sorted(self.tools_by_name))
+            error = ValueError(f"{call['name']} is not a valid tool, try one of [{available}].")
+            return _error_message(call, error), time.perf_counter() - started
+        try:
+            result = await tool.ainvoke({**call, "type": "tool_call"}, config=config)
+        except ConnectionError:
+            if side_effect_class(call["name"]) == "write":
+                # It may have taken effect; on resume the model is told instead of it being replayed.
+                self.stats["interrupted_writes"] += 1
+                finished[call["id"]] = ToolMessage(
+                    content=INTERRUPTED_WRITE, name=call["name"], tool_call_id=call["id"], status="error"
+                )
+            # Lost MCP connection: let the caller reconnect instead of feeding it to the model.
+            raise
+        except Exception as e:
+            result = _error_message(call, e)
+        if not isinstance(result, ToolMessage):
+            result = ToolMessage(content=str(result), name=call["name"], tool_call_id=call["id"])
+        finished[call["id"]] = result
+        return result, time.perf_counter() - started
+
+    def _record(self, calls: int, parallel: int, wall: float, busy: float, results: List[Optional[ToolMessage]]):
+        self.stats["turns"] += 1
+        self.stats["calls"] += calls
+        self.stats["parallel_calls"] += parallel
+        self.stats["serial_calls"] += calls - parallel
+        self.stats["errors"] += sum(1 for r in results if r is not None and getattr(r, "status", None) == "error")
+        self.stats["last_turn_seconds"] = round(wall, 3)
+        self.stats["total_turn_seconds"] = round(self.stats["total_turn_seconds"] + wall, 3)
+        self.stats["saved_seconds"] = round(self.stats["saved_seconds"] + max(0.0, busy - wall), 3)
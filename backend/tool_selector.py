@@ -0,0 +1,214 @@
+import json
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Set
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from tool_output import estimate_tokens
+
+# --- Configuration ---
+# Scored tools bound per turn, on top of the always-bound and already-used ones.
+DEFAULT_TOP_K = 10
+REQUEST_MORE_TOOLS = "request_more_tools"
+# Bound on every turn: basic page access, paging of truncated results, the canvas.
+ALWAYS_TOOLS = ("chrome_navigate", "chrome_get_web_content", "read_tool_output", "modify_canvas", REQUEST_MORE_TOOLS)
+# Task profiles: when a keyword appears in the task, the profile's tools are bound.
+TASK_PROFILES = {
+    "research": {
+        "keywords": ("search", "find", "research", "look up", "trending", "notes", "images", "photos", "pinterest",
+                     "xiaohongshu", "xhs", "搜索", "查找", "小红书", "笔记", "图片", "热门", "灵感"),
+        "tools": ("chrome_get_interactive_elements", "chrome_click_element", "search_tabs_content",
+                  "extract_images_from_page", "download_files", "chrome_screenshot"),
+    },
+    "publish": {
+        "keywords": ("publish", "post to", "upload", "share", "发布", "上传", "发帖"),
+        "tools": ("chrome_get_interactive_elements", "chrome_click_element", "chrome_fill_or_select",
+                  "chrome_keyboard", "chrome_upload_file", "chrome_file_upload", "chrome_screenshot", "download_file"),
+    },
+    "tabs": {
+        "keywords": ("tab", "tabs", "window", "标签页", "窗口"),
+        "tools": ("get_windows_and_tabs", "chrome_switch_tab", "chrome_close_tabs"),
+    },
+}
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "if", "in", "into", "is", "it", "its", "of",
+    "on", "or", "the", "this", "to", "use", "used", "using", "with", "you", "your", "can", "will", "when", "not",
+    "tool", "tools", "please", "me", "my", "i",
+}
+# The chat prompt wraps the user's words in canvas context and fixed instructions; the raw
+# words travel in the message's additional_kwargs (see task_message), this is the fallback.
+USER_SAYS = re.compile(r"User says: '(.*?)'\n", re.DOTALL)
+TASK_KWARG = "task"
+MAX_TASK_CHARS = 2000
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words (snake_case split) plus character bigrams for CJK runs."""
+    terms = []
+    for word in re.findall(r"[a-z0-9]+|[一-鿿]+", text.lower().replace("_", " ")):
+        if "一" <= word[0] <= "鿿":
+            terms.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+        elif word not in STOPWORDS and len(word) > 1:
+            terms.append(word)
+    return terms
+
+def task_message(prompt: str, task: str) -> HumanMessage:
+    """User message carrying the rendered `prompt`, tagged with the user's own words for tool selection."""
+    return HumanMessage(content=prompt, additional_kwargs={TASK_KWARG: task})
+
+def task_text(messages: List[BaseMessage]) -> str:
+    """The current task: the user's own words from the latest user message."""
+    human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+    if human is None:
+        return ""
+    if isinstance(human.additional_kwargs.get(TASK_KWARG), str):
+        return human.additional_kwargs[TASK_KWARG][:MAX_TASK_CHARS]
+    content = human.content if isinstance(human.content, str) else json.dumps(human.content, ensure_ascii=False)
+    match = USER_SAYS.search(content)
+    return (match.group(1) if match else content)[:MAX_TASK_CHARS]
+
+def _current_task(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Messages since the latest user message."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i + 1:]
+    return list(messages)
+
+class ToolSelector:
+    """
+    Picks the tools bound to the LLM on each agent turn instead of the whole catalog.
+
+    A TF-IDF index over each tool's name, description and argument names is built once.
+    Per turn the bound set is: ALWAYS_TOOLS, tools already called for the current task,
+    the tools of any TASK_PROFILES the task mentions, and the `top_k` best-scoring
+    tools for the task text. `request_more_tools(need)` is the escape hatch: tools
+    matching `need` (or all tools, for "all") are bound from the next turn on.
+    """
+
+    def __init__(self, tools, top_k: int = DEFAULT_TOP_K):
+        self.top_k = max(1, top_k)
+        self.request_tool = StructuredTool.from_function(
+            func=self._request_more_tools,
+            name=REQUEST_MORE_TOOLS,
+            description=(
+                "Call this when none of your available tools can do what you need. Describe the capability "
+                "(e.g. 'upload a file', 'go back in history'); matching tools become available on your next step. "
+                "Pass 'all' to get every tool."
+            ),
+        )
+        self.tools = [t for t in tools if t.name != REQUEST_MORE_TOOLS] + [self.request_tool]
+        self._by_name = {t.name: t for t in self.tools}
+        self._order = {t.name: i for i, t in enumerate(self.tools)}
+        self.schema_tokens = {t.name: estimate_tokens(json.dumps(convert_to_openai_tool(t), ensure_ascii=False)) for t in self.tools}
+        self._build_index()
+        self._bound_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self.stats: Dict[str, Any] = {
+            "turns": 0,
+            "expansions": 0,
+            "bound_tools_total": 0,
+            "schema_tokens_all": sum(self.schema_tokens.values()),
+            "schema_tokens_bound_total": 0,
+            "last_bound": [],
+        }
+
+    def select(self, messages: List[BaseMessage], prompt_tokens: int = 0) -> list:
+        """Tools to bind for the next LLM call, in catalog order. `prompt_tokens` (messages + system) is only logged."""
+        current = _current_task(messages)
+        names: Set[str] = {n for n in ALWAYS_TOOLS if n in self._by_name}
+        requests = []
+        for message in current:
+            for call in getattr(message, "tool_calls", None) or []:
+                names.add(call["name"])
+                if call["name"] == REQUEST_MORE_TOOLS:
+                    requests.append(str(call.get("args", {}).get("need", "")))
+        names &= set(self._by_name)
+
+        if any(need.strip().lower() in ("", "all") for need in requests):
+            names = set(self._by_name)
+        else:
+            task = task_text(messages)
+            names |= self._profile_tools(task)
+            names |= set(self.rank(task)[:self.top_k])
+            for need in requests:
+                names |= set(self.rank(need)[:self.top_k])
+
+        selected = sorted(names, key=self._order.__getitem__)
+        bound_tokens = sum(self.schema_tokens[n] for n in selected)
+        self.stats["turns"] += 1
+        self.stats["bound_tools_total"] += len(selected)
+        self.stats["schema_tokens_bound_total"] += bound_tokens
+        self.stats["last_bound"] = selected
+        print(
+            f"[TOOLS] Bound {len(selected)}/{len(self.tools)} tools; prompt ~{prompt_tokens + bound_tokens} tokens "
+            f"(tool schemas ~{bound_tokens}), ~{prompt_tokens + self.stats['schema_tokens_all']} with all tools"
+        )
+        return [self._by_name[n] for n in selected]
+
+    def bind(self, llm, tools: list):
+        """`llm.bind_tools(tools)`, memoized per tool set (schema conversion is not free)."""
+        key = tuple(t.name for t in tools)
+        bound = self._bound_cache.get(key)
+        if bound is None:
+            bound = self._bound_cache[key] = llm.bind_tools(tools)
+            while len(self._bound_cache) > 32:
+                self._bound_cache.popitem(last=False)
+        self._bound_cache.move_to_end(key)
+        return bound
+
+    def rank(self, text: str) -> List[str]:
+        """Tool names with a positive TF-IDF cosine score against `text`, best first."""
+        query = self._vector(Counter(tokenize(text)))
+        if not query:
+            return []
+        scores = {
+            name: sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            for name, vector in self._vectors.items()
+        }
+        return [name for name, score in sorted(scores.items(), key=lambda kv: -kv[1]) if score > 0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        turns = self.stats["turns"]
+        return {
+            "tools": len(self.tools),
+            "top_k": self.top_k,
+            "avg_bound_tools": round(self.stats["bound_tools_total"] / turns, 1) if turns else None,
+            "avg_schema_tokens_bound": round(self.stats["schema_tokens_bound_total"] / turns) if turns else None,
+            **self.stats,
+        }
+
+    # --- Internals ---
+    def _request_more_tools(self, need: str) -> str:
+        self.stats["expansions"] += 1
+        if need.strip().lower() in ("", "all"):
+            return f"All {len(self.tools)} tools will be available on your next step."
+        matches = self.rank(need)[:self.top_k]
+        if not matches:
+            return "No tool matches that description. Pass 'all' to get every tool."
+        return "These tools will be available on your next step: " + ", ".join(matches)
+
+    def _profile_tools(self, task: str) -> Set[str]:
+        lowered = task.lower()
+        names = set()
+        for profile in TASK_PROFILES.values():
+            if any(keyword in lowered for keyword in profile["keywords"]):
+                names.update(n for n in profile["tools"] if n in self._by_name)
+        return names
+
+    def _build_index(self):
+        documents = {}
+        for tool in self.tools:
+            properties = (tool.args or {}) if hasattr(tool, "args") else {}
+            arg_text = " ".join(f"{name} {spec.get('description', '')}" for name, spec in properties.items())
+            # The name counts double: it is the most specific description of a tool.
+            documents[tool.name] = Counter(tokenize(f"{tool.name} {tool.name} {tool.description or ''} {arg_text}"))
+        df = Counter(term for terms in documents.values() for term in terms)
+        self._idf = {term: math.log((1 + len(documents)) / (1 + n)) + 1 for term, n in df.items()}
+        self._vectors = {name: self._vector(terms) for name, terms in documents.items()}
+
+    def _vector(self, terms: Counter) -> Dict[str, float]:
+        vector = {term: (1 + math.log(count)) * self._idf[term] for term, count in terms.items() if term in self._idf}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
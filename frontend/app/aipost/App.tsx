@@ -26,6 +26,8 @@ export interface CanvasElement {
 
 export type AssistantMessage = { role: 'user' | 'assistant'; content: string };
 
+const PUBLISH_POLL_INTERVAL_MS = 2000;
+
 export default function App() {
   const [elements, setElements] = useState<CanvasElement[]>([]);
   const [selectedElementIds, setSelectedElementIds] = useState<string[]>([]);
@@ -47,6 +49,10 @@ export default function App() {
   const [showPublishModal, setShowPublishModal] = useState(false);
   const [isAiLoading, setIsAiLoading] = useState(false);
   const interactionSnapshot = useRef<CanvasElement[] | null>(null);
+  // Identifies this canvas to the agent server, which keeps one conversation thread per canvas.
+  const canvasIdRef = useRef(`canvas-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`);
+  // Canvas as last acknowledged by the agent server (version + serialized elements), for sending diffs.
+  const syncedCanvasRef = useRef<{ version: number; elements: Map<string, string> } | null>(null);
 
   const selectedElements = useMemo(
     () => elements.filter(el => selectedElementIds.includes(el.id)),
@@ -302,82 +308,165 @@ export default function App() {
     }
   };
 
+  // Applies one canvas action returned by the agent. `localAddedIds` tracks ids added earlier in the same reply.
+  const applyAIAction = (action: any, localAddedIds: Set<string>) => {
+    if (action.action === 'add' && action.element) {
+      // Check if element with this ID already exists (in state OR locally added in this batch)
+      const id = action.element.id;
+      const existingEl = elements.find(e => e.id === id);
+      const alreadyAddedLocally = localAddedIds.has(id);
+
+      if (existingEl || alreadyAddedLocally) {
+        // If it exists, treat as update
+        console.warn(`AI tried to add duplicate ID ${id}, treating as update.`);
+        if (action.element.styles) {
+          updateElementStyles(id, action.element.styles);
+        }
+        const { styles, ...otherProps } = action.element;
+        if (Object.keys(otherProps).length > 0) {
+          updateElement(id, otherProps);
+        }
+      } else {
+        // Generate ID if missing or ensure unique
+        const newEl = { 
+          ...action.element, 
+          id: id || `el-${Date.now()}-${Math.random()}` 
+        };
+        if (newEl.id) localAddedIds.add(newEl.id);
+        addElement(newEl.type, newEl.content, newEl);
+      }
+    } 
+    else if (action.action === 'update' && action.elementId) {
+      // Update styles or properties
+      if (action.element.styles) {
+        updateElementStyles(action.elementId, action.element.styles);
+      }
+      // Update other props (x, y, width, height, content)
+      const { styles, ...otherProps } = action.element;
+      if (Object.keys(otherProps).length > 0) {
+        updateElement(action.elementId, otherProps);
+      }
+    }
+    else if (action.action === 'delete' && action.elementId) {
+       setElements(prev => prev.filter(el => el.id !== action.elementId));
+    }
+  };
+
+  // Changes (CanvasAction shape) between the last synced canvas and the current elements.
+  const diffCanvas = (synced: Map<string, string>, current: CanvasElement[]) => {
+    const changes: any[] = [];
+    current.forEach(el => {
+      const previous = synced.get(el.id);
+      if (previous === undefined) {
+        changes.push({ action: 'add', elementId: el.id, element: el });
+      } else if (previous !== JSON.stringify(el)) {
+        changes.push({ action: 'update', elementId: el.id, element: el });
+      }
+    });
+    const currentIds = new Set(current.map(el => el.id));
+    synced.forEach((_, id) => {
+      if (!currentIds.has(id)) changes.push({ action: 'delete', elementId: id });
+    });
+    return changes;
+  };
+
+  // Reads a Server-Sent Events response, calling onEvent for each `event:`/`data:` block.
+  const readEventStream = async (res: Response, onEvent: (event: string, data: any) => void) => {
+    const reader = res.body!.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        let data = '';
+        block.split('\n').forEach(line => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (data) onEvent(event, JSON.parse(data));
+        boundary = buffer.indexOf('\n\n');
+      }
+    }
+  };
+
   const handleAIModify = async (prompt: string, targets: CanvasElement[] = selectedElements) => {
-    // Send payload to placeholder AI API (server logs it).
+    // Stream the agent's reply: text, canvas actions and suggestions are applied as they arrive.
     setIsAiLoading(true);
     try {
-      const res = await fetch('/api/ai/apply', {
+      const sentElements = new Map(elements.map(el => [el.id, JSON.stringify(el)] as [string, string]));
+      const send = (full: boolean) => fetch('/api/ai/apply/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ 
           prompt, 
-          elements: elements, // Send ALL elements
-          selectedIds: targets.map(t => t.id) // Send IDs of selected elements
+          // Send ALL elements the first time; afterwards only what changed since the last sync
+          ...(full || !syncedCanvasRef.current
+            ? { elements: elements }
+            : { changes: diffCanvas(syncedCanvasRef.current.elements, elements), baseVersion: syncedCanvasRef.current.version }),
+          selectedIds: targets.map(t => t.id), // Send IDs of selected elements
+          canvasId: canvasIdRef.current
         }),
       });
-      
-      const data = await res.json();
-      
-      // 1. Show AI Message
-      if (data.message && data.message !== "AI is offline, using local logic.") {
-         setAiMessages(prev => [
-           ...prev, 
-           { role: 'assistant', content: data.message }
-         ]);
+      let res = await send(false);
+      if (res.status === 409) {
+        // Server no longer has our base version (restart/eviction): resend the full canvas.
+        syncedCanvasRef.current = null;
+        res = await send(true);
       }
-
-      // 1.5 Update Suggestions
-      if (data.suggestions && Array.isArray(data.suggestions) && data.suggestions.length > 0) {
-        setAiSuggestions(data.suggestions);
+      if (!res.ok || !res.body) {
+        throw new Error(`AI stream unavailable: ${res.status}`);
       }
 
-      // 2. Apply AI Actions (if any)
-      if (data.actions && Array.isArray(data.actions)) {
-        console.log("Applying AI Actions:", data.actions);
-        const localAddedIds = new Set<string>();
-
-        data.actions.forEach((action: any) => {
-          if (action.action === 'add' && action.element) {
-            // Check if element with this ID already exists (in state OR locally added in this batch)
-            const id = action.element.id;
-            const existingEl = elements.find(e => e.id === id);
-            const alreadyAddedLocally = localAddedIds.has(id);
-
-            if (existingEl || alreadyAddedLocally) {
-              // If it exists, treat as update
-              console.warn(`AI tried to add duplicate ID ${id}, treating as update.`);
-              if (action.element.styles) {
-                updateElementStyles(id, action.element.styles);
-              }
-              const { styles, ...otherProps } = action.element;
-              if (Object.keys(otherProps).length > 0) {
-                updateElement(id, otherProps);
-              }
-            } else {
-              // Generate ID if missing or ensure unique
-              const newEl = { 
-                ...action.element, 
-                id: id || `el-${Date.now()}-${Math.random()}` 
-              };
-              if (newEl.id) localAddedIds.add(newEl.id);
-              addElement(newEl.type, newEl.content, newEl);
-            }
-          } 
-          else if (action.action === 'update' && action.elementId) {
-            // Update styles or properties
-            if (action.element.styles) {
-              updateElementStyles(action.elementId, action.element.styles);
-            }
-            // Update other props (x, y, width, height, content)
-            const { styles, ...otherProps } = action.element;
-            if (Object.keys(otherProps).length > 0) {
-              updateElement(action.elementId, otherProps);
-            }
+      const localAddedIds = new Set<string>();
+      let appliedActions = 0;
+      let turnText = '';
+      let hasLiveMessage = false;
+      // 1. Show AI Message (one bubble, updated in place while the agent types)
+      const showLiveMessage = (content: string) => {
+        const isNew = !hasLiveMessage;
+        hasLiveMessage = true;
+        setAiMessages(prev => isNew
+          ? [...prev, { role: 'assistant', content }]
+          : [...prev.slice(0, -1), { role: 'assistant', content }]);
+      };
+
+      let completed = false;
+      await readEventStream(res, (event, data) => {
+        if (event === 'token') {
+          turnText += data.text;
+          showLiveMessage(turnText);
+        } else if (event === 'message') {
+          // A turn finished; the next turn (after tools run) streams into the same bubble.
+          showLiveMessage(data.content);
+          turnText = '';
+        } else if (event === 'suggestions' && Array.isArray(data.suggestions) && data.suggestions.length > 0) {
+          // 1.5 Update Suggestions
+          setAiSuggestions(data.suggestions);
+        } else if (event === 'canvas_action') {
+          // 2. Apply AI Actions as soon as they are captured
+          console.log("Applying AI Action:", data.action);
+          applyAIAction(data.action, localAddedIds);
+          appliedActions += 1;
+        } else if (event === 'done') {
+          completed = true;
+          // The server commits the canvas version only when the turn succeeds.
+          if (typeof data.canvasVersion === 'number') {
+            syncedCanvasRef.current = { version: data.canvasVersion, elements: sentElements };
           }
-          else if (action.action === 'delete' && action.elementId) {
-             setElements(prev => prev.filter(el => el.id !== action.elementId));
-          }
-        });
+          if (data.message && !hasLiveMessage) showLiveMessage(data.message);
+        } else if (event === 'error') {
+          if (data.code === 'canvas_version_mismatch') syncedCanvasRef.current = null;
+          console.error('AI apply error', data.message);
+        }
+      });
+
+      if (completed || appliedActions > 0) {
         return; // Skip local mock logic if AI returned actions
       }
 
@@ -459,11 +548,35 @@ export default function App() {
   const handlePublish = async (platform: 'x' | 'xiaohongshu' | 'douyin') => {
     if (elements.length === 0) return;
     try {
-      await fetch('/api/ai/publish', {
+      const res = await fetch('/api/ai/publish', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ elements, platform }),
+        body: JSON.stringify({ elements, platform, canvasId: canvasIdRef.current }),
       });
+      const data = await res.json();
+      if (!res.ok || !data?.jobId) {
+        console.error('AI publish error', data?.detail ?? data?.message ?? res.statusText);
+        return;
+      }
+
+      // Publishing runs as a background job on the agent server; poll it until it finishes.
+      let lastStep: number | undefined;
+      while (true) {
+        await new Promise((resolve) => setTimeout(resolve, PUBLISH_POLL_INTERVAL_MS));
+        const job = await (await fetch(`/api/ai/publish/${data.jobId}`)).json();
+        if (job?.progress?.step !== lastStep) {
+          lastStep = job?.progress?.step;
+          console.info(`[publish ${data.jobId}] step ${lastStep}: ${job?.progress?.tool}`);
+        }
+        if (job?.status === 'succeeded') {
+          console.info(`[publish ${data.jobId}] done:`, job.result?.message);
+          return;
+        }
+        if (!job?.status || job.status === 'failed' || job.status === 'cancelled') {
+          console.error(`[publish ${data.jobId}] ${job?.status ?? 'lost'}:`, job?.error ?? job?.detail);
+          return;
+        }
+      }
     } catch (err) {
       console.error('AI publish error', err);
     }
@@ -24,7 +24,8 @@ export async function POST(request: Request) {
       status: "ok", 
       message: data.message,
       actions: data.actions, // Pass through the actions
-      suggestions: data.suggestions // Pass through the suggestions
+      suggestions: data.suggestions, // Pass through the suggestions
+      threadId: data.threadId
     });
   } catch (error: any) {
     console.error("[AI apply] Error calling Python agent:", error);
@@ -0,0 +1,40 @@
+export async function POST(request: Request) {
+  const body = await request.json().catch(() => ({}));
+  console.log("[AI apply stream] Prompt:", body?.prompt);
+
+  try {
+    // Forward to the Python MCP Agent Server and pipe its Server-Sent Events through unchanged
+    const response = await fetch("http://127.0.0.1:8000/chat/stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(body),
+    });
+
+    if (response.status === 409) {
+      // Canvas version unknown to the server: the client resends the full canvas.
+      return new Response(await response.text(), {
+        status: 409,
+        headers: { "Content-Type": "application/json" },
+      });
+    }
+    if (!response.ok || !response.body) {
+      throw new Error(`Python server error: ${response.statusText}`);
+    }
+
+    return new Response(response.body, {
+      headers: {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        Connection: "keep-alive",
+      },
+    });
+  } catch (error: any) {
+    console.error("[AI apply stream] Error calling Python agent:", error);
+    return new Response(JSON.stringify({ status: "error", message: error.message }), {
+      status: 502,
+      headers: { "Content-Type": "application/json" },
+    });
+  }
+}
@@ -0,0 +1,28 @@
+import { NextResponse } from "next/server";
+
+type Params = { params: Promise<{ jobId: string }> };
+
+// Proxies a publish job on the Python MCP Agent Server: GET polls it, DELETE cancels it.
+async function forward(method: "GET" | "DELETE", jobId: string) {
+  try {
+    const response = await fetch(`http://127.0.0.1:8000/jobs/${encodeURIComponent(jobId)}`, { method });
+    const data = await response.json().catch(() => ({}));
+    return NextResponse.json(data, { status: response.status });
+  } catch (error: any) {
+    console.error(`[AI publish] Error calling Python agent (${method} job ${jobId}):`, error);
+    return NextResponse.json(
+      { status: "error", message: error.message },
+      { status: 502 }
+    );
+  }
+}
+
+export async function GET(_request: Request, { params }: Params) {
+  const { jobId } = await params;
+  return forward("GET", jobId);
+}
+
+export async function DELETE(_request: Request, { params }: Params) {
+  const { jobId } = await params;
+  return forward("DELETE", jobId);
+}
@@ -5,7 +5,7 @@ export async function POST(request: Request) {
   console.log("[AI publish] Elements received for publishing:", body?.elements);
 
   try {
-    // Forward to Python MCP Agent Server
+    // Forward to Python MCP Agent Server; it queues the run and answers with a jobId to poll
     const response = await fetch("http://127.0.0.1:8000/publish", {
       method: "POST",
       headers: {
@@ -14,12 +14,16 @@ export async function POST(request: Request) {
       body: JSON.stringify(body),
     });
 
+    if (response.status === 429) {
+      // Publish queue is full: let the client retry later.
+      return NextResponse.json(await response.json(), { status: 429 });
+    }
     if (!response.ok) {
       throw new Error(`Python server error: ${response.statusText}`);
     }
 
     const data = await response.json();
-    return NextResponse.json(data);
+    return NextResponse.json(data, { status: response.status });
   } catch (error: any) {
     console.error("[AI publish] Error calling Python agent:", error);
     return NextResponse.json(
@@ -35,6 +35,7 @@ class CreatorAgent(BaseAgent):
         user_input: str,
         ip_profile: IPProfile,
         research_notes: Optional[str] = None,
+        use_cache: Optional[bool] = None,
     ) -> str:
         """
         :param mode: cr ag 当前要执行的动作类型：
@@ -45,6 +46,7 @@ class CreatorAgent(BaseAgent):
         :param user_input: 用户本次输入内容 / 需求说明
         :param ip_profile: 用户 IP 画像（价值观、风格、禁忌等）
         :param research_notes: res ag 产出的研究报告 / 热点分析 / 图像库分析等
+        :param use_cache: None 按 LLMClient 规则（仅 temperature 0 的调用缓存）；传 True 让相同画像、输入与研究笔记复用已缓存的草稿，False 强制重新生成
         :return: 由 LLM 生成的文本（可以是文案、结构化 JSON 或提示词）
         """
 
@@ -55,7 +57,7 @@ class CreatorAgent(BaseAgent):
             research_notes=research_notes,
         )
 
-        return await self._llm.generate(system_prompt, user_prompt)
+        return await self._llm.generate(system_prompt, user_prompt, cache=use_cache)
 
     # --------------------------------------------------------------------- #
     # prompt 组装逻辑
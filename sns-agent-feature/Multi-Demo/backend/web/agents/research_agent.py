@@ -16,11 +16,13 @@ ResearchAgent — 轻量研究 Agent，通过 MCP 工具获取热点/图像参
 """
 
 from __future__ import annotations 
-from typing import List, Optional, Any, Dict
+import asyncio
+from typing import AsyncIterator, List, Optional, Any, Dict, Set, Tuple
 
 from .base import BaseAgent
 from ..schemas import ResearchFinding
 from ..services.mcp_tools import MCPToolExecutor
+from ..services.result_cache import FetchAbandoned
 
 
 # ============================
@@ -100,11 +102,23 @@ class ResearchAgent(BaseAgent):
         self,
         executor: MCPToolExecutor,
         llm,
-        default_platform: str = "google"
+        default_platform: str = "google",
+        *,
+        max_concurrency: int = 4,
+        browser_concurrency: int = 2,
+        llm_concurrency: int = 4,
+        topic_timeout: Optional[float] = 90.0,
     ) -> None:
         super().__init__(llm=llm, name="ResearchAgent")
         self._executor = executor
         self._default_platform = default_platform
+        # 总并发上限 + 按路由（浏览器 / LLM）分别限流；浏览器侧还受 BrowserService 标签页数限制
+        self._topic_slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._browser_slots = asyncio.Semaphore(max(1, browser_concurrency))
+        self._llm_slots = asyncio.Semaphore(max(1, llm_concurrency))
+        self._topic_timeout = topic_timeout
+        # 由本 Agent 主动取消的 topic 搜索任务（区分“本轮被取消”与“共享搜索泄漏的取消”）
+        self._cancelled_searches: Set[asyncio.Task] = set()
         
 # --------------------------------------------
     # Step 1 — MCP 搜索：获取热点内容和图像参考
@@ -113,31 +127,109 @@ class ResearchAgent(BaseAgent):
         self,
         topics: List[str],
         *,
-        platform: Optional[str] = None
+        platform: Optional[str] = None,
+        failed_topics: Optional[List[str]] = None,
     ) -> List[ResearchFinding]:
-
+        """
+        各 topic 并发搜索（受信号量限流），结果按输入 topic 顺序合并。
+        超时或失败的 topic 不产出结果；传入 failed_topics 列表可收集这些 topic。
+        """
         if not topics:
             return []
 
+        tasks = [
+            asyncio.create_task(self._search_topic(topic, platform or self._default_platform))
+            for topic in topics
+        ]
+        try:
+            await asyncio.wait(tasks)
+        finally:
+            self._cancel_searches(tasks)
+
         findings: List[ResearchFinding] = []
+        failed: List[str] = []
+        for topic, task in zip(topics, tasks):
+            topic_findings = task.result()
+            if topic_findings is None:
+                failed.append(topic)
+            else:
+                findings.extend(topic_findings)
+        if failed:
+            self.logger.warning(f"Research failed for {len(failed)}/{len(topics)} topics: {failed}")
+            if failed_topics is not None:
+                failed_topics.extend(failed)
+        return findings
 
-        for topic in topics:
-            records = await self._executor.search(
-                topic,
-                platform=platform or self._default_platform
-            )
-            for record in records:
-                findings.append(
-                    ResearchFinding(
-                        topic=record.topic,
-                        source=record.source,
-                        title=record.title,
-                        url=record.url,
-                        summary=record.summary,
-                    )
+    async def iter_findings(
+        self,
+        topics: List[str],
+        *,
+        platform: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, List[ResearchFinding]]]:
+        """
+        与 run() 相同的并发搜索，但每个 topic 完成即产出 (topic, findings)，
+        下游可以提前开始处理。产出顺序为完成顺序；失败的 topic 产出空列表；
+        提前退出迭代会取消剩余搜索。
+        """
+        tasks: Dict[asyncio.Task, str] = {
+            asyncio.create_task(self._search_topic(topic, platform or self._default_platform)): topic
+            for topic in topics
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield tasks[task], task.result() or []
+        finally:
+            self._cancel_searches(tasks)
+
+    def _cancel_searches(self, tasks) -> None:
+        for task in tasks:
+            if not task.done():
+                self._cancelled_searches.add(task)
+                task.add_done_callback(self._cancelled_searches.discard)
+                task.cancel()
+
+    async def _search_topic(self, topic: str, platform: str) -> Optional[List[ResearchFinding]]:
+        """单个 topic 的搜索；失败（超时、出错、共享搜索被放弃）时返回 None。"""
+        route_slots = self._browser_slots if self._executor.uses_browser(platform) else self._llm_slots
+        try:
+            async with self._topic_slots, route_slots:
+                records = await asyncio.wait_for(
+                    self._executor.search(topic, platform=platform),
+                    timeout=self._topic_timeout,
                 )
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Research topic '{topic}' timed out after {self._topic_timeout}s, skipping")
+            return None
+        except asyncio.CancelledError:
+            # Our own cancellation (run()/iter_findings() cancelled this search) propagates;
+            # a cancellation leaking out of a search shared with another topic only fails this topic.
+            if asyncio.current_task() in self._cancelled_searches:
+                raise
+            self.logger.error(f"Research topic '{topic}' was cancelled by a shared search, skipping")
+            return None
+        except FetchAbandoned:
+            # The cache already retried once after the shared search was abandoned.
+            self.logger.error(f"Research topic '{topic}' failed: its shared search was abandoned twice")
+            return None
+        except Exception as e:
+            self.logger.error(f"Research topic '{topic}' failed: {e}")
+            return None
 
-        return findings
+        return [
+            ResearchFinding(
+                topic=record.topic,
+                source=record.source,
+                title=record.title,
+                url=record.url,
+                summary=record.summary,
+                image=record.image,
+                likes=record.likes,
+            )
+            for record in records
+        ]
 
     # --------------------------------------------
     # Step 2 — LLM 分析：结构化研究结果
@@ -145,13 +237,7 @@ class ResearchAgent(BaseAgent):
     async def analyze(self, findings: List[ResearchFinding]) -> Dict[str, Any]:
 
         formatted_records = [
-            {
-                "topic": f.topic,
-                "source": f.source,
-                "title": f.title,
-                "url": f.url,
-                "summary": f.summary
-            }
+            f.model_dump(exclude_none=True)
             for f in findings
         ]
 
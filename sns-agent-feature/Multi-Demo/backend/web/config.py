@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -16,6 +16,18 @@ class Settings(BaseSettings):
     llm_api_key: str = Field(default="", env="LLM_API_KEY")
     llm_model: str = Field(default="gpt-5-chat-latest", env="LLM_MODEL")
     llm_base_url: Optional[str] = Field(default="https://aihubmix.com/v1", env="LLM_BASE_URL")
+    llm_max_concurrency: int = Field(default=8, env="LLM_MAX_CONCURRENCY")
+    llm_max_connections: int = Field(default=20, env="LLM_MAX_CONNECTIONS")
+    llm_max_keepalive_connections: int = Field(default=10, env="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    llm_keepalive_expiry: float = Field(default=30.0, env="LLM_KEEPALIVE_EXPIRY")
+    llm_timeout: float = Field(default=60.0, env="LLM_TIMEOUT")
+    llm_connect_timeout: float = Field(default=10.0, env="LLM_CONNECT_TIMEOUT")
+    llm_max_retries: int = Field(default=2, env="LLM_MAX_RETRIES")
+    llm_temperature: float = Field(default=0.4, env="LLM_TEMPERATURE")
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_ttl: float = Field(default=86400.0, env="LLM_CACHE_TTL")
+    llm_cache_max_entries: int = Field(default=512, env="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_persist: bool = Field(default=True, env="LLM_CACHE_PERSIST")
     storage_path: Path = Field(
         default=Path("backend/web/.data/state.json"), env="BACKEND_STORAGE_PATH"
     )
@@ -26,6 +38,26 @@ class Settings(BaseSettings):
         default=None, env="MCP_PLATFORM_TOKEN"
     )
     default_research_platform: str = Field(default="pinterest", env="DEFAULT_RESEARCH_PLATFORM")
+    browser_pool_size: int = Field(default=4, env="BROWSER_POOL_SIZE")
+    browser_idle_timeout: float = Field(default=300.0, env="BROWSER_IDLE_TIMEOUT")
+    browser_connect_timeout: float = Field(default=30.0, env="BROWSER_CONNECT_TIMEOUT")
+    browser_max_tabs: int = Field(default=4, env="BROWSER_MAX_TABS")
+    browser_direct_search: bool = Field(default=True, env="BROWSER_DIRECT_SEARCH")
+    browser_direct_search_limit: int = Field(default=10, env="BROWSER_DIRECT_SEARCH_LIMIT")
+    browser_checkpointer: str = Field(default="sqlite", env="BROWSER_CHECKPOINTER")
+    research_max_concurrency: int = Field(default=4, env="RESEARCH_MAX_CONCURRENCY")
+    research_browser_concurrency: int = Field(default=2, env="RESEARCH_BROWSER_CONCURRENCY")
+    research_llm_concurrency: int = Field(default=4, env="RESEARCH_LLM_CONCURRENCY")
+    research_topic_timeout: float = Field(default=90.0, env="RESEARCH_TOPIC_TIMEOUT")
+    search_cache_enabled: bool = Field(default=True, env="SEARCH_CACHE_ENABLED")
+    search_cache_ttl: float = Field(default=3600.0, env="SEARCH_CACHE_TTL")
+    search_cache_platform_ttls: Dict[str, float] = Field(
+        default={"xiaohongshu": 1800.0, "douyin": 1800.0, "tiktok": 1800.0, "pinterest": 21600.0},
+        env="SEARCH_CACHE_PLATFORM_TTLS",
+    )
+    search_cache_stale_ttl: float = Field(default=86400.0, env="SEARCH_CACHE_STALE_TTL")
+    search_cache_max_entries: int = Field(default=256, env="SEARCH_CACHE_MAX_ENTRIES")
+    search_cache_persist: bool = Field(default=True, env="SEARCH_CACHE_PERSIST")
 
     class Config:
         env_file = ".env"
@@ -36,6 +68,18 @@ class Settings(BaseSettings):
     def data_dir(self) -> Path:
         return self.storage_path.expanduser().resolve().parent
 
+    @property
+    def search_cache_path(self) -> Path:
+        return self.data_dir / "search_cache.json"
+
+    @property
+    def llm_cache_path(self) -> Path:
+        return self.data_dir / "llm_cache.sqlite"
+
+    @property
+    def browser_checkpoint_path(self) -> Path:
+        return self.data_dir / "browser_checkpoints.sqlite"
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -9,23 +9,46 @@ from fastapi.middleware.cors import CORSMiddleware
 from .config import Settings, get_settings
 from .orchestrator import Orchestrator
 from .schemas import GenerationRequest, GenerationResponse, IPProfile
+from .services.llm_cache import LLMResponseCache
 from .services.llm_client import LLMClient
 from .services.mcp_tools import MCPToolExecutor
 from .services.browser import BrowserService
+from .services.result_cache import SearchResultCache
 from .services.storage import StorageClient
 from .utils.logger import get_logger
 
 settings: Settings = get_settings()
 logger = get_logger("web.main")
 storage = StorageClient(settings.storage_path)
-llm_client = LLMClient(settings)
+llm_cache = (
+    LLMResponseCache(
+        max_entries=settings.llm_cache_max_entries,
+        default_ttl=settings.llm_cache_ttl,
+        persist_path=settings.llm_cache_path if settings.llm_cache_persist else None,
+    )
+    if settings.llm_cache_enabled
+    else None
+)
+llm_client = LLMClient(settings, cache=llm_cache)
 browser_service = BrowserService(settings)
+search_cache = (
+    SearchResultCache(
+        max_entries=settings.search_cache_max_entries,
+        default_ttl=settings.search_cache_ttl,
+        platform_ttls=settings.search_cache_platform_ttls,
+        stale_ttl=settings.search_cache_stale_ttl,
+        persist_path=settings.search_cache_path if settings.search_cache_persist else None,
+    )
+    if settings.search_cache_enabled
+    else None
+)
 
 mcp_executor = MCPToolExecutor(
     llm_client=llm_client,
     browser_service=browser_service,
     pinterest_token=settings.mcp_pinterest_token,
     platform_token=settings.mcp_platform_token,
+    cache=search_cache,
 )
 orchestrator = Orchestrator(
     settings=settings,
@@ -39,6 +62,15 @@ app = FastAPI(title="IP Orchestrator", version="0.1.0")
 @app.on_event("startup")
 async def startup_event():
     await browser_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if search_cache:
+        await search_cache.close()
+    await browser_service.stop()
+    await llm_client.aclose()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -53,6 +85,15 @@ async def health_check() -> dict:
     return {"status": "ok", "environment": settings.environment}
 
 
+@app.get("/stats")
+async def service_stats() -> dict:
+    return {
+        "browser": browser_service.stats(),
+        "search_cache": mcp_executor.cache_stats(),
+        "llm": llm_client.stats(),
+    }
+
+
 @app.get("/ip-profiles", response_model=List[IPProfile])
 async def list_ip_profiles() -> List[IPProfile]:
     return orchestrator.ip_agent.list_profiles()
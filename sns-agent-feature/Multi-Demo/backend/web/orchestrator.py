@@ -36,7 +36,11 @@ class Orchestrator:
         # 1. Research Agent (The Eyes) - Needs LLM and MCP Tools
         self.research_agent = ResearchAgent(
             llm=llm_client,
-            executor=mcp_executor
+            executor=mcp_executor,
+            max_concurrency=settings.research_max_concurrency,
+            browser_concurrency=settings.research_browser_concurrency,
+            llm_concurrency=settings.research_llm_concurrency,
+            topic_timeout=settings.research_topic_timeout,
         )
 
         # 2. Creator Agent (The Hands) - Needs LLM
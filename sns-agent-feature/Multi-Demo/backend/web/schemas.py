@@ -44,6 +44,8 @@ class ResearchFinding(BaseModel):
     title: str
     url: str
     summary: str
+    image: Optional[str] = None
+    likes: Optional[str] = None
 
 
 class AgentStep(BaseModel):
@@ -4,9 +4,15 @@ Browser Service - Wraps the ChromeMCP functionality for the backend.
 from __future__ import annotations
 
 import asyncio
+import importlib
+import importlib.util
 import json
 import sys
 import os
+import time
+import uuid
+from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import List, Optional, Dict, Any
 
 # Add project root to path to import backend modules
@@ -34,57 +40,125 @@ project_root = os.path.abspath(os.path.join(current_dir, "../../../../../"))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from langgraph.checkpoint.memory import MemorySaver
-
-# Import from the existing backend/agent_core.py
-try:
-    # We need to be careful because 'backend' is ambiguous.
-    # There is 'backend' in 'sns-agent-feature/Multi-Demo/backend' (the new one)
-    # And 'backend' in 'xhs-mcp-server/backend' (the old one)
-    
-    # To import the old backend, we can try to import it directly from the path
-    # or rename the import temporarily.
-    
-    import importlib.util
-    
-    # Define the path to the old agent_core.py
-    old_backend_path = os.path.join(project_root, "backend", "agent_core.py")
-    old_session_path = os.path.join(project_root, "backend", "session_manager.py")
-    
-    if os.path.exists(old_backend_path):
-        spec = importlib.util.spec_from_file_location("old_backend_agent_core", old_backend_path)
-        agent_core_module = importlib.util.module_from_spec(spec)
-        sys.modules["old_backend_agent_core"] = agent_core_module
-        spec.loader.exec_module(agent_core_module)
-        
-        create_mcp_tools = agent_core_module.create_mcp_tools
-        build_agent_graph = agent_core_module.build_agent_graph
-        
-        spec_session = importlib.util.spec_from_file_location("old_backend_session_manager", old_session_path)
-        session_module = importlib.util.module_from_spec(spec_session)
-        sys.modules["old_backend_session_manager"] = session_module
-        spec_session.loader.exec_module(session_module)
-        
-        inject_session = session_module.inject_session
-    else:
-        raise ImportError(f"File not found: {old_backend_path}")
-
-except Exception as e:
-    # Fallback for when running in a different context or if imports fail
-    print(f"Warning: Could not import backend.agent_core: {e}. Browser functionality will be limited.")
-    create_mcp_tools = None
-    build_agent_graph = None
-    inject_session = None
+from mcp import StdioServerParameters
+
+# The old backend modules import each other as flat top-level modules
+# (`from agent_core import ...`). They are loaded from their files in dependency
+# order and registered under those names, so the flat imports resolve without
+# putting the old backend directory on sys.path (where names like `history`
+# would shadow other modules). This also guarantees one shared `agent_core`
+# module instance (its CURRENT_TAB context variable must be the same object everywhere).
+OLD_BACKEND_DIR = os.path.join(project_root, "backend")
+AGENT_CORE_PATH = os.path.join(OLD_BACKEND_DIR, "agent_core.py")
+OLD_BACKEND_MODULES = (
+    "tool_output",
+    "tool_latency",
+    "history",
+    "tool_runner",
+    "tool_selector",
+    "downloads",
+    "agent_core",
+    "session_manager",
+    "tab_leases",
+    "sqlite_checkpoint",
+)
+
+_agent_core: Optional[SimpleNamespace] = None
+_agent_core_error: Optional[str] = None
+
+
+def _load_old_backend_module(name: str):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location(name, os.path.join(OLD_BACKEND_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    return module
+
+
+def load_agent_core() -> Optional[SimpleNamespace]:
+    """
+    Import the existing backend/agent_core.py (and its helper modules) on first use.
+    It pulls in LangChain/LangGraph, so importing it eagerly made this module slow to
+    import; BrowserService.start() loads it in a worker thread instead.
+    Returns None (and remembers why) when the import fails.
+    """
+    global _agent_core, _agent_core_error
+    if _agent_core is not None or _agent_core_error is not None:
+        return _agent_core
+    try:
+        # We need to be careful because 'backend' is ambiguous.
+        # There is 'backend' in 'sns-agent-feature/Multi-Demo/backend' (the new one)
+        # And 'backend' in 'xhs-mcp-server/backend' (the old one)
+        if not os.path.exists(AGENT_CORE_PATH):
+            raise ImportError(f"File not found: {AGENT_CORE_PATH}")
+        modules = {name: _load_old_backend_module(name) for name in OLD_BACKEND_MODULES}
+        agent_core_module = modules["agent_core"]
+        session_module = modules["session_manager"]
+        _agent_core = SimpleNamespace(
+            create_mcp_tools=agent_core_module.create_mcp_tools,
+            build_agent_graph=agent_core_module.build_agent_graph,
+            tool_schema_fingerprint=agent_core_module.tool_schema_fingerprint,
+            bound_tab=agent_core_module.bound_tab,
+            run_page_script=agent_core_module.run_page_script,
+            inject_session=session_module.inject_session,
+            session_tracker=session_module.SESSION_TRACKER,
+            TabLeaser=modules["tab_leases"].TabLeaser,
+            MemorySaver=importlib.import_module("langgraph.checkpoint.memory").MemorySaver,
+            SQLiteSaver=modules["sqlite_checkpoint"].SQLiteSaver,
+        )
+    except Exception as e:
+        # Fallback for when running in a different context or if imports fail
+        _agent_core_error = str(e)
+        print(f"Warning: Could not import backend.agent_core: {e}. Browser functionality will be limited.")
+    return _agent_core
 
 from ..utils.logger import get_logger
 from ..config import Settings
+from .session_pool import MCPSessionPool
+from .direct_search import EXTRACT_RESULTS_SCRIPT, get_direct_search_spec
 
 # Hardcoded path to the MCP server (same as in agent_chrome.py)
 # In a real deployment, this should be in config
 MCP_SERVER_PATH = "C:\\Users\\63091\\AppData\\Roaming\\npm\\node_modules\\mcp-chrome-bridge\\dist\\mcp\\mcp-server-stdio.js"
 
+@dataclass
+class AgentBundle:
+    """Tools and compiled agent graph built for one session's tool schema."""
+    fingerprint: str
+    tools: list
+    agent: Any
+    memory: Any
+    built_in: float
+    uses: int = 0
+
+
+# Landing pages used to open a leased tab before the agent starts.
+PLATFORM_HOME_URLS = {
+    "xiaohongshu": "https://www.xiaohongshu.com",
+    "xhs": "https://www.xiaohongshu.com",
+    "rednote": "https://www.xiaohongshu.com",
+    "pinterest": "https://www.pinterest.com",
+    "douyin": "https://www.douyin.com",
+    "tiktok": "https://www.tiktok.com",
+    "google": "https://www.google.com",
+}
+
+
+def platform_home_url(platform: str) -> str:
+    platform_lower = platform.lower()
+    for key, url in PLATFORM_HOME_URLS.items():
+        if key in platform_lower:
+            return url
+    return PLATFORM_HOME_URLS["google"]
+
+
 class BrowserService:
     def __init__(self, settings: Settings):
         self._settings = settings
@@ -94,25 +168,85 @@ class BrowserService:
             args=[MCP_SERVER_PATH],
             env=None
         )
-        self._agent = None
-        self._tools = []
-        self._session_context = None
-        self._lock = asyncio.Lock()
+        self._pool = MCPSessionPool(
+            self._server_params,
+            size=settings.browser_pool_size,
+            idle_timeout=settings.browser_idle_timeout,
+            connect_timeout=settings.browser_connect_timeout,
+        )
+        # Concurrent tasks share one Chrome; each one works in its own leased tab.
+        # Created once agent_core is loaded (see _core).
+        self._tabs = None
+        # Shared by all agent bundles when browser_checkpointer is "sqlite" (see _checkpointer).
+        self._sqlite_saver = None
+        self._bundle_stats = {"hits": 0, "misses": 0}
+        self._direct_stats = {"hits": 0, "empty": 0, "errors": 0, "last_elapsed": None}
+        self._startup: Dict[str, Any] = {}
+        self._warm_task: Optional[asyncio.Task] = None
 
     async def start(self):
-        """Initialize the connection to the MCP server."""
+        """
+        Load agent_core and warm one MCP session in the background, so app startup
+        does not wait for either. Requests arriving earlier load/connect on demand.
+        """
         if not os.path.exists(MCP_SERVER_PATH):
             self._logger.error(f"MCP Server not found at {MCP_SERVER_PATH}")
             return
 
         self._logger.info("Starting Browser Service...")
-        # Note: stdio_client is an async context manager. 
-        # To keep it alive, we might need a different approach or wrap the execution.
-        # For this version, we will connect per-request or use a long-running task.
-        # Given the complexity of keeping stdio pipes open in FastAPI, 
-        # we will implement a 'run_task' method that connects, runs, and disconnects for now,
-        # or we can try to maintain the session if we run this in a background loop.
-        pass
+        self._warm_task = asyncio.create_task(self._warm())
+
+    async def _warm(self):
+        started = time.perf_counter()
+        core = await self._core()
+        self._startup["agent_core_import_seconds"] = round(time.perf_counter() - started, 3)
+        if core is None:
+            return
+        try:
+            await self._pool.start(warm=1)
+            self._startup["pool_warm_seconds"] = round(time.perf_counter() - started, 3)
+            self._logger.info(
+                f"MCP session pool ready (size={self._pool.size}) after {self._startup['pool_warm_seconds']:.2f}s"
+            )
+        except Exception as e:
+            # Sessions are opened lazily on first lease if warming fails.
+            self._logger.error(f"Could not warm MCP session pool: {e}")
+
+    async def _core(self) -> Optional[SimpleNamespace]:
+        """agent_core, imported off the event loop on first use."""
+        core = _agent_core or await asyncio.to_thread(load_agent_core)
+        if core is not None and self._tabs is None:
+            self._tabs = core.TabLeaser(max_tabs=self._settings.browser_max_tabs)
+        return core
+
+    async def stop(self):
+        """Close all pooled MCP sessions."""
+        if self._warm_task and not self._warm_task.done():
+            self._warm_task.cancel()
+            await asyncio.gather(self._warm_task, return_exceptions=True)
+        await self._pool.close()
+        if self._sqlite_saver is not None:
+            self._sqlite_saver.close()
+            self._sqlite_saver = None
+
+    def _checkpointer(self, core: SimpleNamespace):
+        """Checkpointer for a new agent bundle: one shared SQLite store, or a MemorySaver per bundle."""
+        if self._settings.browser_checkpointer != "sqlite":
+            return core.MemorySaver()
+        if self._sqlite_saver is None:
+            self._sqlite_saver = core.SQLiteSaver(str(self._settings.browser_checkpoint_path))
+        return self._sqlite_saver
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool": self._pool.stats(),
+            "agent_bundles": dict(self._bundle_stats),
+            "direct_search": dict(self._direct_stats),
+            "tabs": self._tabs.snapshot() if self._tabs else None,
+            "session_injection": dict(_agent_core.session_tracker.stats) if _agent_core else None,
+            "startup": dict(self._startup),
+            "checkpoints": self._sqlite_saver.snapshot() if self._sqlite_saver else None,
+        }
 
     async def run_custom_task(self, task_description: str) -> str:
         """
@@ -121,55 +255,89 @@ class BrowserService:
         self._logger.info(f"Executing custom browser task: {task_description[:50]}...")
 
         try:
-            async with stdio_client(self._server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    
-                    if inject_session:
-                        await inject_session(session)
-
-                    tools = await create_mcp_tools(session)
-                    memory = MemorySaver()
-                    agent = build_agent_graph(tools, checkpointer=memory, interrupt=False)
-
-                    config = {"configurable": {"thread_id": "custom_browser_task"}, "recursion_limit": 50}
-                    
-                    final_response = ""
-                    
-                    self._logger.info("Starting agent execution loop...")
-                    
-                    async for event in agent.astream(
-                        {"messages": [("user", task_description)]},
-                        config=config
-                    ):
-                        if "agent" in event:
-                            msg = event["agent"]["messages"][0]
-                            if msg.content:
-                                final_response = msg.content
-
-                    return final_response
-
+            return await self._run_agent(task_description, thread_id="custom_browser_task")
         except Exception as e:
             self._logger.error(f"Custom task failed: {e}")
             return f"Error executing custom task: {e}"
 
+    def supports_direct_search(self, platform: str) -> bool:
+        return bool(
+            self._settings.browser_direct_search
+            and _agent_core_error is None
+            and get_direct_search_spec(platform)
+        )
+
+    async def direct_search(self, topic: str, platform: str = "xiaohongshu", limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Open the platform's search-results page in a leased tab and extract result cards
+        with one injected script (no LLM involved).
+        Returns a list of {title, url, summary, image, likes, author} dicts, or None when
+        the platform is unsupported or the scripted path failed (callers fall back to `search`).
+        """
+        spec = get_direct_search_spec(platform)
+        if not spec or not self.supports_direct_search(platform):
+            return None
+
+        core = await self._core()
+        if core is None:
+            return None
+
+        limit = limit or self._settings.browser_direct_search_limit
+        search_url = spec.search_url(topic)
+        started = time.perf_counter()
+        try:
+            async with self._pool.lease() as pooled:
+                session = pooled.session
+                if spec.needs_session:
+                    async with self._tabs.exclusive():
+                        await core.inject_session(session)
+
+                async with self._tabs.lease(session, start_url=search_url, label=f"direct:{topic}") as binding:
+                    with core.bound_tab(binding):
+                        data = await asyncio.wait_for(
+                            core.run_page_script(
+                                session,
+                                "mcp_direct_search",
+                                EXTRACT_RESULTS_SCRIPT,
+                                payload={"selectors": spec.selectors, "limit": limit, "waitMs": 8000},
+                            ),
+                            timeout=self._settings.browser_connect_timeout,
+                        )
+        except Exception as e:
+            self._direct_stats["errors"] += 1
+            self._logger.warning(f"Direct search failed for '{topic}' on {spec.name}: {e}")
+            return None
+
+        elapsed = time.perf_counter() - started
+        self._direct_stats["last_elapsed"] = round(elapsed, 3)
+        items = data.get("items") if isinstance(data, dict) else None
+        if not items:
+            self._direct_stats["empty"] += 1
+            self._logger.info(f"Direct search for '{topic}' on {spec.name} found no results ({elapsed:.2f}s)")
+            return None
+
+        self._direct_stats["hits"] += 1
+        self._logger.info(f"Direct search for '{topic}' on {spec.name}: {len(items)} results in {elapsed:.2f}s")
+        return items[:limit]
+
     async def search(self, topic: str, platform: str = "xiaohongshu") -> str:
         """
         Run a search task using the Browser Agent.
         Returns the raw text summary/result from the agent.
         """
-        if not create_mcp_tools:
+        if await self._core() is None:
             return "Browser integration not available (ImportError)."
 
+        start_url = platform_home_url(platform)
+
         # Enhanced prompt with specific instructions for the browser agent
         # These instructions are derived from the successful patterns in agent_core.py
         prompt = (
             f"TASK: Search for '{topic}' on {platform} and extract relevant content.\n\n"
             f"INSTRUCTIONS:\n"
-            f"1. START: Open a NEW WINDOW using `chrome_navigate(url='...', newWindow=True)`.\n"
-            f"   - If {platform} is 'xiaohongshu' or 'xhs', go to 'https://www.xiaohongshu.com'.\n"
-            f"   - If {platform} is 'google', go to 'https://www.google.com'.\n"
-            f"2. VERIFY: Call `get_windows_and_tabs` to confirm the new window is active.\n"
+            f"1. START: A dedicated tab is already open on {start_url} for this task.\n"
+            f"   - Work in that tab. Do NOT open new windows; other searches run in parallel tabs.\n"
+            f"2. VERIFY: Call `chrome_get_web_content` to confirm the page has loaded.\n"
             f"3. SEARCH: Find the search input box, type '{topic}', and press Enter.\n"
             f"   - Use `chrome_fill_or_select` or `chrome_keyboard`.\n"
             f"4. BROWSE: Wait for results to load. Scroll down if necessary.\n"
@@ -181,47 +349,95 @@ class BrowserService:
 
         self._logger.info(f"Executing browser task: {prompt}")
 
-        # Connect and run
-        # We use a fresh connection for each task to ensure stability for now
         try:
-            async with stdio_client(self._server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    
-                    # Inject cookies if available (important for XHS)
-                    if inject_session:
-                        await inject_session(session)
-
-                    tools = await create_mcp_tools(session)
-                    memory = MemorySaver()
-                    # We must set interrupt=False so the agent runs tools automatically
-                    agent = build_agent_graph(tools, checkpointer=memory, interrupt=False)
-
-                    config = {"configurable": {"thread_id": "browser_search_task"}, "recursion_limit": 50}
-                    
-                    final_response = ""
-                    
-                    # Run the agent
-                    # We need to handle the tool execution loop manually if we are not using the interrupt mechanism
-                    # or if we want to ensure it runs to completion.
-                    # The 'agent' returned by build_agent_graph is a compiled LangGraph.
-                    
-                    # In agent_chrome.py, it iterates over events.
-                    # We need to do the same here.
-                    
-                    self._logger.info("Starting agent execution loop...")
-                    
-                    async for event in agent.astream(
-                        {"messages": [("user", prompt)]},
-                        config=config
-                    ):
-                        if "agent" in event:
-                            msg = event["agent"]["messages"][0]
-                            if msg.content:
-                                final_response = msg.content
-
-                    return final_response
-
+            return await self._run_agent(prompt, thread_id="browser_search_task", start_url=start_url)
         except Exception as e:
             self._logger.error(f"Browser task failed: {e}")
             return f"Error executing browser task: {e}"
+
+    async def _run_agent(self, prompt: str, thread_id: str, start_url: Optional[str] = None) -> str:
+        """
+        Lease a pooled MCP session and a browser tab, then run the browser agent to completion.
+        Every bridge call made by the agent is routed to the leased tab (see agent_core.bound_tab).
+        """
+        core = await self._core()
+        if core is None:
+            raise RuntimeError(f"Browser integration not available: {_agent_core_error}")
+
+        async with self._pool.lease() as pooled:
+            session = pooled.session
+
+            # Inject cookies if available (important for XHS)
+            # Injection drives the active window, so it must not interleave with tab work.
+            async with self._tabs.exclusive():
+                await core.inject_session(session)
+
+            bundle = await self._get_agent_bundle(pooled)
+
+            async with self._tabs.lease(session, start_url=start_url, label=thread_id) as binding:
+                # The compiled graph is shared; each task (and its tab) gets its own checkpoint thread.
+                task_thread_id = f"{thread_id}-tab{binding.tab_id}-{uuid.uuid4().hex[:8]}"
+                config = {"configurable": {"thread_id": task_thread_id}, "recursion_limit": 50}
+
+                final_response = ""
+
+                self._logger.info(
+                    f"Starting agent execution loop on MCP session {pooled.index}, tab {binding.tab_id}..."
+                )
+
+                try:
+                    with core.bound_tab(binding):
+                        async for event in bundle.agent.astream(
+                            {"messages": [("user", prompt)]},
+                            config=config
+                        ):
+                            if "agent" in event:
+                                msg = event["agent"]["messages"][0]
+                                if msg.content:
+                                    final_response = msg.content
+                finally:
+                    delete_thread = getattr(bundle.memory, "delete_thread", None)
+                    if delete_thread:
+                        delete_thread(task_thread_id)
+
+                return final_response
+
+    async def _get_agent_bundle(self, pooled) -> AgentBundle:
+        """
+        Return the tools + compiled graph for this session, rebuilding only when
+        the `list_tools()` fingerprint changes.
+        """
+        core = await self._core()
+        session = pooled.session
+        tools_list = await session.list_tools()
+        fingerprint = core.tool_schema_fingerprint(tools_list)
+
+        bundles: Dict[str, AgentBundle] = pooled.state.setdefault("agent_bundles", {})
+        bundle = bundles.get(fingerprint)
+        if bundle:
+            self._bundle_stats["hits"] += 1
+            bundle.uses += 1
+            return bundle
+
+        self._bundle_stats["misses"] += 1
+        started = time.perf_counter()
+        tools = await core.create_mcp_tools(session, tools_list=tools_list)
+        memory = self._checkpointer(core)
+        # We must set interrupt=False so the agent runs tools automatically
+        agent = core.build_agent_graph(tools, checkpointer=memory, interrupt=False)
+        bundle = AgentBundle(
+            fingerprint=fingerprint,
+            tools=tools,
+            agent=agent,
+            memory=memory,
+            built_in=time.perf_counter() - started,
+            uses=1,
+        )
+        # A schema change invalidates older bundles for this connection.
+        bundles.clear()
+        bundles[fingerprint] = bundle
+        self._logger.info(
+            f"Built agent bundle {fingerprint[:12]} for MCP session {pooled.index} "
+            f"({len(tools)} tools, {bundle.built_in * 1000:.0f} ms)"
+        )
+        return bundle
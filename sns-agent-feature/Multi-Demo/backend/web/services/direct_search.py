@@ -0,0 +1,122 @@
+"""
+Direct Search - Scripted search-result extraction for platforms with stable result pages.
+
+Instead of asking the LLM agent to navigate, fill, click and scroll, the BrowserService
+opens the platform's search-results URL in a leased tab and runs one extraction script
+that returns structured cards. No LLM call is involved; the agent loop is only used as
+a fallback when this path returns nothing.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+
+@dataclass(frozen=True)
+class DirectSearchSpec:
+    name: str
+    search_url_template: str
+    selectors: Dict[str, str] = field(default_factory=dict)
+    # Whether auth.json cookies must be injected before the search page is useful.
+    needs_session: bool = False
+
+    def search_url(self, topic: str) -> str:
+        return self.search_url_template.format(query=quote(topic.strip()))
+
+
+XIAOHONGSHU_SPEC = DirectSearchSpec(
+    name="xiaohongshu",
+    search_url_template="https://www.xiaohongshu.com/search_result?keyword={query}&source=web_search_result_notes",
+    selectors={
+        "item": "section.note-item",
+        "link": "a.cover, a[href*='/search_result/'], a[href*='/explore/']",
+        "title": ".footer .title span, .footer .title, .title",
+        "image": "a.cover img, img",
+        "likes": ".like-wrapper .count, .count",
+        "author": ".author .name, .name",
+    },
+    needs_session=True,
+)
+
+PINTEREST_SPEC = DirectSearchSpec(
+    name="pinterest",
+    search_url_template="https://www.pinterest.com/search/pins/?q={query}",
+    selectors={
+        "item": "div[data-test-id='pin'], div[data-grid-item='true']",
+        "link": "a[href*='/pin/']",
+        "title": "[data-test-id='pin-title'], [data-test-id='pinrep-footer'] a",
+        "image": "img",
+    },
+)
+
+DIRECT_SEARCH_SPECS: Dict[str, DirectSearchSpec] = {
+    "xiaohongshu": XIAOHONGSHU_SPEC,
+    "xhs": XIAOHONGSHU_SPEC,
+    "rednote": XIAOHONGSHU_SPEC,
+    "pinterest": PINTEREST_SPEC,
+}
+
+
+def get_direct_search_spec(platform: str) -> Optional[DirectSearchSpec]:
+    platform_lower = platform.lower()
+    for key, spec in DIRECT_SEARCH_SPECS.items():
+        if key in platform_lower:
+            return spec
+    return None
+
+
+# Handler body for agent_core.run_page_script. Waits (bounded) for result cards to
+# render, then reads title/url/summary/image/likes/author from each card.
+EXTRACT_RESULTS_SCRIPT = """
+const sel = payload.selectors || {};
+const limit = payload.limit || 10;
+const deadline = Date.now() + (payload.waitMs || 8000);
+let cards = [];
+while (Date.now() < deadline) {
+    cards = Array.from(document.querySelectorAll(sel.item));
+    if (cards.length >= Math.min(limit, 3)) break;
+    await new Promise(r => setTimeout(r, 200));
+}
+const text = (root, s) => {
+    if (!s) return '';
+    const el = root.querySelector(s);
+    if (!el) return '';
+    return (el.innerText || el.getAttribute('alt') || el.getAttribute('title') || '').trim();
+};
+const absolute = (href) => {
+    try { return href ? new URL(href, location.origin).href : ''; } catch (e) { return ''; }
+};
+const items = [];
+const seen = new Set();
+for (const card of cards) {
+    if (items.length >= limit) break;
+    const linkEl = sel.link ? card.querySelector(sel.link) : card.closest('a');
+    const url = absolute(linkEl && linkEl.getAttribute('href'));
+    if (!url || seen.has(url)) continue;
+    seen.add(url);
+    const img = sel.image ? card.querySelector(sel.image) : null;
+    const image = img ? (img.currentSrc || img.src || img.getAttribute('data-src') || '') : '';
+    items.push({
+        title: text(card, sel.title) || (img && img.alt) || '',
+        url,
+        summary: text(card, sel.summary),
+        image: image.startsWith('http') ? image : '',
+        likes: text(card, sel.likes),
+        author: text(card, sel.author),
+    });
+}
+return { url: location.href, count: items.length, items };
+"""
+
+
+def summarize_item(item: Dict[str, Any]) -> str:
+    """Builds a one-line summary for cards that carry no description text."""
+    if item.get("summary"):
+        return item["summary"]
+    parts: List[str] = []
+    if item.get("author"):
+        parts.append(f"作者: {item['author']}")
+    if item.get("likes"):
+        parts.append(f"点赞: {item['likes']}")
+    return " · ".join(parts) or item.get("title", "")
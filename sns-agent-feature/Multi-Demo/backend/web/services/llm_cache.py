@@ -0,0 +1,206 @@
+"""
+LLM Response Cache - LRU + TTL cache for LLMClient.generate results.
+
+- Keys hash (model, temperature, system prompt, user prompt) after normalization:
+  whitespace runs collapse to one space, and a prompt that is a JSON document is
+  re-serialized with sorted keys, so formatting-only differences share one entry.
+- The memory tier is LRU-bounded. An optional SQLite file is a second tier that
+  survives restarts; entries found there are promoted to memory.
+- Every entry has a TTL (per call, or the cache default).
+- Concurrent misses for the same key share a single LLM call. If the caller
+  making it is cancelled, the others make the call themselves.
+- Empty responses are returned but not stored.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..utils.logger import get_logger
+from .result_cache import FetchAbandoned
+
+
+def normalize_prompt(text: str) -> str:
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return json.dumps(json.loads(stripped), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except ValueError:
+            pass
+    return " ".join(stripped.split())
+
+
+def make_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+    material = json.dumps(
+        [model, round(temperature, 3), normalize_prompt(system_prompt), normalize_prompt(user_prompt)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 512,
+        default_ttl: float = 86400.0,
+        persist_path: Optional[Path] = None,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self._persist_path = persist_path
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._logger = get_logger("services.LLMResponseCache")
+        self.stats_counters: Dict[str, int] = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "bypassed": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+        self._open()
+
+    # --- Lookup ---
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[str]],
+        *,
+        ttl: Optional[float] = None,
+    ) -> str:
+        """Return the cached response for `key`, calling `fetch` on a miss. Failed or empty fetches are not stored."""
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats_counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except FetchAbandoned:
+                # The calling request was cancelled (client disconnect, timeout); call for ourselves.
+                if key in self._inflight:
+                    return await asyncio.shield(self._inflight[key])
+
+        self.stats_counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except BaseException as e:
+            # Waiters get an ordinary exception, never the calling request's cancellation.
+            future.set_exception(e if isinstance(e, Exception) else FetchAbandoned(key))
+            # Mark retrieved so waiter-less failures don't log "exception never retrieved".
+            future.exception()
+            raise
+        else:
+            if value:
+                self._store(key, value, self.default_ttl if ttl is None else ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def record_bypass(self) -> None:
+        """Count a call that skipped the cache (opted out, or not temperature 0)."""
+        self.stats_counters["bypassed"] += 1
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        if self._db:
+            with self._db:
+                self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        # Coalesced calls were answered without their own LLM request.
+        served = self.stats_counters["hits"] + self.stats_counters["disk_hits"] + self.stats_counters["coalesced"]
+        lookups = served + self.stats_counters["misses"]
+        disk_entries = None
+        if self._db:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_entries": disk_entries,
+            "hit_rate": round(served / lookups, 3) if lookups else None,
+            "persisted": bool(self._persist_path),
+            **self.stats_counters,
+        }
+
+    def close(self) -> None:
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    # --- Internals ---
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry["expires_at"] > now:
+                self._entries.move_to_end(key)
+                self.stats_counters["hits"] += 1
+                return entry["value"]
+            self._entries.pop(key, None)
+            self.stats_counters["expired"] += 1
+
+        if self._db:
+            row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                if row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.stats_counters["disk_hits"] += 1
+                    return row[0]
+                with self._db:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats_counters["expired"] += 1
+        return None
+
+    def _store(self, key: str, value: str, ttl: float) -> None:
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if self._db:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, value, time.time(), expires_at),
+                    )
+            except sqlite3.Error as e:
+                self._logger.warning(f"Could not persist LLM response: {e}")
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = {"value": value, "expires_at": expires_at}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats_counters["evictions"] += 1
+
+    # --- Persistence ---
+    def _open(self) -> None:
+        if not self._persist_path:
+            return
+        try:
+            self._persist_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self._persist_path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            self._logger.warning(f"LLM cache disk tier disabled ({self._persist_path}): {e}")
+            self._db = None
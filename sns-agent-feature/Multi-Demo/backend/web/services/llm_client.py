@@ -3,29 +3,62 @@ from __future__ import annotations
 
 import asyncio
 import textwrap
-from typing import Optional
+import time
+from typing import Any, Dict, Optional
 
 try:  # Optional dependency for environments without OpenAI installed.
-    from openai import OpenAI
+    import httpx
+    from openai import AsyncOpenAI
 except ImportError:  # pragma: no cover
-    OpenAI = None  # type: ignore[misc]
+    httpx = None  # type: ignore[assignment]
+    AsyncOpenAI = None  # type: ignore[misc]
 
 from ..config import Settings
 from ..utils.logger import get_logger
+from .llm_cache import LLMResponseCache, make_key
 
 
 class LLMClient:
-    def __init__(self, settings: Settings) -> None:
+    """
+    Async chat-completions client shared by all agents.
+
+    Requests go through one pooled `httpx.AsyncClient` (keep-alive, connection
+    limits, timeouts) and at most `llm_max_concurrency` run at once. With a
+    `cache`, repeated prompts are answered from it (see `generate`).
+    """
+
+    def __init__(self, settings: Settings, cache: Optional[LLMResponseCache] = None) -> None:
         self._settings = settings
+        self._cache = cache
         self._logger = get_logger("services.LLMClient")
         self._client = None
-        if OpenAI and settings.llm_api_key:
-            self._client = OpenAI(
+        self._http_client = None
+        self._slots = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "queued": 0,
+            "total_seconds": 0.0,
+            "total_wait_seconds": 0.0,
+        }
+        if AsyncOpenAI and settings.llm_api_key:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    keepalive_expiry=settings.llm_keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout),
+            )
+            self._client = AsyncOpenAI(
                 api_key=settings.llm_api_key,
                 base_url=settings.llm_base_url,
+                http_client=self._http_client,
+                max_retries=settings.llm_max_retries,
             )
         else:
-            if not OpenAI:
+            if not AsyncOpenAI:
                 self._logger.warning("openai SDK not installed, using offline stub")
             elif not settings.llm_api_key:
                 self._logger.warning("LLM_API_KEY missing, using offline stub")
@@ -36,26 +69,98 @@ class LLMClient:
         user_prompt: str,
         *,
         model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        temperature: Optional[float] = None,
+        cache: Optional[bool] = None,
+        cache_ttl: Optional[float] = None,
     ) -> str:
+        """
+        `cache=None` caches only temperature-0 calls; pass True/False to opt in or out.
+        `cache_ttl` overrides the cache's default TTL. Offline-stub and failed
+        responses are never cached.
+        """
         if not self._client:
             return self._offline_stub(user_prompt)
 
+        model = model or self._settings.llm_model
+        temperature = self._settings.llm_temperature if temperature is None else temperature
+        use_cache = (temperature == 0) if cache is None else cache
+
+        async def complete() -> str:
+            return await self._complete(system_prompt, user_prompt, model, temperature, timeout)
+
         try:
-            response = await asyncio.to_thread(
-                self._client.chat.completions.create,
-                model=model or self._settings.llm_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.4,
-            )
-            content = response.choices[0].message.content or ""
-            return content.strip()
+            if self._cache is None:
+                return await complete()
+            if not use_cache:
+                self._cache.record_bypass()
+                return await complete()
+            key = make_key(model, temperature, system_prompt, user_prompt)
+            return await self._cache.get_or_fetch(key, complete, ttl=cache_ttl)
+        except asyncio.CancelledError:
+            raise
         except Exception as exc:  # pragma: no cover - logging only
+            self._stats["failures"] += 1
             self._logger.error("LLM request failed: %s", exc)
             return self._offline_stub(user_prompt)
 
+    async def _complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        temperature: float,
+        timeout: Optional[float],
+    ) -> str:
+        queued_at = time.perf_counter()
+        self._stats["queued"] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            # Also when cancelled while waiting (client disconnect, timeout).
+            self._stats["queued"] -= 1
+        try:
+            started = time.perf_counter()
+            self._stats["total_wait_seconds"] += started - queued_at
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            try:
+                response = await self._client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=temperature,
+                    timeout=timeout or self._settings.llm_timeout,
+                )
+            finally:
+                self._stats["in_flight"] -= 1
+                self._stats["total_seconds"] += time.perf_counter() - started
+        finally:
+            self._slots.release()
+        content = response.choices[0].message.content or ""
+        return content.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "max_concurrency": self._settings.llm_max_concurrency,
+            "avg_seconds": round(self._stats["total_seconds"] / requests, 3) if requests else None,
+            "avg_wait_seconds": round(self._stats["total_wait_seconds"] / requests, 3) if requests else None,
+            "cache": self._cache.stats() if self._cache else None,
+        }
+
+    async def aclose(self) -> None:
+        """Close pooled HTTP connections and the response cache."""
+        if self._cache:
+            self._cache.close()
+        if self._client:
+            await self._client.close()
+        if self._http_client:
+            await self._http_client.aclose()
+
     def _offline_stub(self, user_prompt: str) -> str:
         preview = textwrap.shorten(user_prompt, width=160, placeholder="…")
         return textwrap.dedent(
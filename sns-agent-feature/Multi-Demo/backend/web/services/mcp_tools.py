@@ -4,12 +4,18 @@ from __future__ import annotations
 import asyncio
 import json
 import random
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
 
 from ..utils.logger import get_logger
 from .llm_client import LLMClient
 from .browser import BrowserService
+from .direct_search import summarize_item
+from .result_cache import SearchResultCache
+
+
+# Platforms that need a real browser (anti-crawl or visual content).
+BROWSER_PLATFORMS = ["xiaohongshu", "xhs", "rednote", "pinterest", "douyin", "tiktok"]
 
 
 @dataclass
@@ -19,6 +25,10 @@ class MCPRecord:
     title: str
     url: str
     summary: str
+    image: Optional[str] = None
+    likes: Optional[str] = None
+    # Placeholder produced when the real search failed; never cached.
+    degraded: bool = False
 
 
 class MCPToolExecutor:
@@ -36,24 +46,45 @@ class MCPToolExecutor:
         browser_service: Optional[BrowserService] = None,
         pinterest_token: Optional[str] = None,
         platform_token: Optional[str] = None,
+        cache: Optional[SearchResultCache] = None,
     ) -> None:
         self._llm_client = llm_client
         self._browser_service = browser_service
         self._pinterest_token = pinterest_token
         self._platform_token = platform_token
+        self._cache = cache
         self._logger = get_logger("services.MCPToolExecutor")
 
     async def search(self, topic: str, platform: str) -> List[MCPRecord]:
         if not topic.strip():
             return []
+        if not self._cache:
+            return await self._search_uncached(topic, platform)
 
-        # Routing Logic
+        async def fetch() -> List[Dict[str, Any]]:
+            return [asdict(record) for record in await self._search_uncached(topic, platform)]
+
+        rows = await self._cache.get_or_fetch(
+            topic,
+            platform,
+            fetch,
+            cacheable=lambda rows: bool(rows) and not any(row.get("degraded") for row in rows),
+        )
+        # Entries are shared across topic spellings; report the caller's topic.
+        return [MCPRecord(**{**row, "topic": topic}) for row in rows]
+
+    def uses_browser(self, platform: str) -> bool:
+        """Whether searches on `platform` are routed to the browser service."""
         platform_lower = platform.lower()
-        browser_platforms = ["xiaohongshu", "xhs", "rednote", "pinterest", "douyin", "tiktok"]
-        
-        use_browser = any(p in platform_lower for p in browser_platforms)
+        return bool(self._browser_service) and any(p in platform_lower for p in BROWSER_PLATFORMS)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self._cache.stats() if self._cache else None
+
+    async def _search_uncached(self, topic: str, platform: str) -> List[MCPRecord]:
 
-        if use_browser and self._browser_service:
+        # Routing Logic
+        if self.uses_browser(platform):
             self._logger.info(f"Routing to Browser Service: {topic} on {platform}")
             return await self._search_via_browser(topic, platform)
         elif self._llm_client:
@@ -75,7 +106,8 @@ class MCPToolExecutor:
             # Use generate() instead of acomplete() and handle string return
             response_text = await self._llm_client.generate(
                 system_prompt="You are a helpful search engine simulator.",
-                user_prompt=prompt
+                user_prompt=prompt,
+                temperature=0,
             )
             
             # Clean up potential markdown code blocks
@@ -98,6 +130,24 @@ class MCPToolExecutor:
 
     async def _search_via_browser(self, topic: str, platform: str) -> List[MCPRecord]:
         """Use ChromeMCP to browse the actual website."""
+        # Fast path: scripted extraction on the search-results page, no LLM round trips.
+        if self._browser_service.supports_direct_search(platform):
+            items = await self._browser_service.direct_search(topic, platform)
+            if items:
+                return [
+                    MCPRecord(
+                        topic=topic,
+                        source=platform,
+                        title=item.get("title") or f"{platform} result",
+                        url=item["url"],
+                        summary=summarize_item(item),
+                        image=item.get("image") or None,
+                        likes=item.get("likes") or None,
+                    )
+                    for item in items
+                ]
+            self._logger.info(f"Direct search returned nothing for '{topic}', falling back to browser agent")
+
         raw_result = await self._browser_service.search(topic, platform)
         
         # Use LLM to parse the raw browser output into structured MCPRecords
@@ -111,7 +161,8 @@ class MCPToolExecutor:
             # Use generate() instead of acomplete() and handle string return
             response_text = await self._llm_client.generate(
                 system_prompt="You are a data extraction assistant.",
-                user_prompt=parse_prompt
+                user_prompt=parse_prompt,
+                temperature=0,
             )
             
             # Clean up potential markdown code blocks
@@ -136,7 +187,8 @@ class MCPToolExecutor:
                 source=platform,
                 title=f"Raw Browser Result for {topic}",
                 url="browser://session",
-                summary=raw_result[:200] + "..."
+                summary=raw_result[:200] + "...",
+                degraded=True,
             )]
 
     @property
@@ -162,6 +214,7 @@ class MCPToolExecutor:
             title=title,
             url=url,
             summary=summary,
+            degraded=True,
         )
 
     def _remote_search(self, topic: str, platform: str) -> List[MCPRecord]:  # pragma: no cover
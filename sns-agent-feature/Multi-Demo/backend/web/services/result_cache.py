@@ -0,0 +1,230 @@
+"""
+Search Result Cache - TTL + LRU cache for MCPToolExecutor.search results.
+
+- Keys are normalized (topic, platform) pairs, so "  AI 绘画 " on "XHS" and
+  "ai 绘画" on "xiaohongshu" share one entry.
+- Each platform has its own TTL. After expiry an entry stays servable for
+  `stale_ttl` more seconds: it is returned immediately and refreshed in the
+  background (stale-while-revalidate).
+- Concurrent misses for the same key share a single fetch.
+- Optionally mirrored to a JSON file so the cache survives restarts.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from ..utils.logger import get_logger
+
+# Platform aliases share cache entries.
+PLATFORM_ALIASES = {
+    "xhs": "xiaohongshu",
+    "rednote": "xiaohongshu",
+}
+
+
+class FetchAbandoned(Exception):
+    """The caller running a shared fetch was cancelled before it finished."""
+
+
+def normalize_platform(platform: str) -> str:
+    platform = " ".join(platform.lower().split())
+    return PLATFORM_ALIASES.get(platform, platform)
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.casefold().split())
+
+
+class SearchResultCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        default_ttl: float = 3600.0,
+        platform_ttls: Optional[Dict[str, float]] = None,
+        stale_ttl: float = 86400.0,
+        persist_path: Optional[Path] = None,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.platform_ttls = {normalize_platform(k): v for k, v in (platform_ttls or {}).items()}
+        self.stale_ttl = stale_ttl
+        self._persist_path = persist_path
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self._logger = get_logger("services.SearchResultCache")
+        self.stats_counters: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+        self._load()
+
+    # --- Keys & TTLs ---
+    @staticmethod
+    def make_key(topic: str, platform: str) -> str:
+        return f"{normalize_platform(platform)}\x1f{normalize_topic(topic)}"
+
+    def ttl_for(self, platform: str) -> float:
+        return self.platform_ttls.get(normalize_platform(platform), self.default_ttl)
+
+    # --- Lookup ---
+    async def get_or_fetch(
+        self,
+        topic: str,
+        platform: str,
+        fetch: Callable[[], Awaitable[Any]],
+        *,
+        cacheable: Callable[[Any], bool] = bool,
+    ) -> Any:
+        """
+        Return the cached value for (topic, platform), calling `fetch` on a miss.
+        Values rejected by `cacheable` (default: empty values) are returned but not stored.
+        """
+        key = self.make_key(topic, platform)
+        entry = self._entries.get(key)
+        now = time.time()
+
+        if entry is not None:
+            age = now - entry["stored_at"]
+            ttl = self.ttl_for(platform)
+            if age < ttl:
+                self._entries.move_to_end(key)
+                self.stats_counters["hits"] += 1
+                return entry["value"]
+            if age < ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stats_counters["stale_hits"] += 1
+                self._schedule_refresh(key, fetch, cacheable)
+                return entry["value"]
+            self._drop(key)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats_counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except FetchAbandoned:
+                # The fetching caller was cancelled (e.g. its own timeout); fetch for ourselves.
+                if key in self._inflight:
+                    return await asyncio.shield(self._inflight[key])
+
+        self.stats_counters["misses"] += 1
+        return await self._fetch_and_store(key, fetch, cacheable)
+
+    def invalidate(self, topic: Optional[str] = None, platform: Optional[str] = None) -> None:
+        if topic is None or platform is None:
+            self._entries.clear()
+        else:
+            self._drop(self.make_key(topic, platform))
+        self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.stats_counters["hits"] + self.stats_counters["stale_hits"] + self.stats_counters["misses"]
+        served = self.stats_counters["hits"] + self.stats_counters["stale_hits"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(served / lookups, 3) if lookups else None,
+            "refreshing": len(self._refreshing),
+            "persisted": bool(self._persist_path),
+            **self.stats_counters,
+        }
+
+    async def close(self) -> None:
+        """Cancel background refreshes and flush the cache to disk."""
+        for task in list(self._refreshing):
+            task.cancel()
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing, return_exceptions=True)
+        self._save()
+
+    # --- Internals ---
+    async def _fetch_and_store(self, key: str, fetch, cacheable) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except BaseException as e:
+            # Waiters get an ordinary exception, never the fetching caller's cancellation.
+            future.set_exception(e if isinstance(e, Exception) else FetchAbandoned(key))
+            # Mark retrieved so waiter-less failures don't log "exception never retrieved".
+            future.exception()
+            raise
+        else:
+            if cacheable(value):
+                self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _schedule_refresh(self, key: str, fetch, cacheable) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.create_task(self._refresh(key, fetch, cacheable))
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def _refresh(self, key: str, fetch, cacheable) -> None:
+        self.stats_counters["refreshes"] += 1
+        try:
+            await self._fetch_and_store(key, fetch, cacheable)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep serving the stale entry; the next stale hit retries.
+            self.stats_counters["refresh_errors"] += 1
+            self._logger.warning(f"Background refresh failed for {key!r}: {e}")
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = {"value": value, "stored_at": time.time()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats_counters["evictions"] += 1
+        self._save()
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    # --- Persistence ---
+    def _load(self) -> None:
+        if not self._persist_path or not self._persist_path.exists():
+            return
+        try:
+            data = json.loads(self._persist_path.read_text("utf-8"))
+        except Exception as e:
+            self._logger.warning(f"Ignoring unreadable search cache {self._persist_path}: {e}")
+            return
+        entries = sorted(data.get("entries", []), key=lambda item: item.get("stored_at", 0))
+        for item in entries[-self.max_entries:]:
+            self._entries[item["key"]] = {"value": item["value"], "stored_at": item["stored_at"]}
+
+    def _save(self) -> None:
+        if not self._persist_path:
+            return
+        payload = {
+            "entries": [
+                {"key": key, "value": entry["value"], "stored_at": entry["stored_at"]}
+                for key, entry in self._entries.items()
+            ]
+        }
+        try:
+            self._persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._persist_path.with_suffix(self._persist_path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False), "utf-8")
+            os.replace(tmp_path, self._persist_path)
+        except Exception as e:
+            self._logger.warning(f"Could not persist search cache: {e}")
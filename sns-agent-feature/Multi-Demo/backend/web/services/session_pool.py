@@ -0,0 +1,270 @@
+"""
+Session Pool - Keeps long-lived, initialized MCP ClientSessions to the Chrome bridge.
+
+Spawning `node mcp-server-stdio.js` and running the MCP handshake costs seconds,
+so the BrowserService leases warm sessions from this pool instead of opening a
+fresh stdio connection per task.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from ..utils.logger import get_logger
+
+OnConnect = Callable[[ClientSession], Awaitable[Any]]
+
+
+class PooledSession:
+    """
+    One bridge process plus its initialized ClientSession.
+
+    `stdio_client` and `ClientSession` are anyio context managers that must be
+    entered and exited from the same task, so each connection lives inside its
+    own runner task that holds the contexts open until `close()` is called.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, index: int) -> None:
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        # Per-connection artifacts (e.g. tool bundles) that die with the connection.
+        self.state: Dict[str, Any] = {}
+        self._server_params = server_params
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    @property
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    async def open(self, timeout: float) -> None:
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.index}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise ConnectionError(f"MCP session {self.index} did not initialize within {timeout}s")
+        if not self.alive:
+            raise ConnectionError(f"MCP session {self.index} failed to start: {self._error}")
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._task and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, timeout=5.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception:
+                pass
+
+    async def _run(self) -> None:
+        try:
+            async with stdio_client(self._server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as exc:
+            self._error = exc
+        finally:
+            self.session = None
+            self._ready.set()
+
+
+class MCPSessionPool:
+    """
+    Bounded pool of PooledSessions.
+
+    - `lease()` hands out a warm session for the duration of one task.
+    - Sessions idle longer than `health_check_after` are pinged before reuse.
+    - Dead or failing sessions are discarded and replaced with backoff.
+    - Sessions idle longer than `idle_timeout` are closed by a background reaper.
+    """
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters,
+        *,
+        size: int = 2,
+        idle_timeout: float = 300.0,
+        connect_timeout: float = 30.0,
+        health_check_after: float = 30.0,
+        reconnect_attempts: int = 3,
+        on_connect: Optional[OnConnect] = None,
+    ) -> None:
+        self._server_params = server_params
+        self._size = max(1, size)
+        self._idle_timeout = idle_timeout
+        self._connect_timeout = connect_timeout
+        self._health_check_after = health_check_after
+        self._reconnect_attempts = max(1, reconnect_attempts)
+        self._on_connect = on_connect
+        self._logger = get_logger("services.MCPSessionPool")
+
+        self._slots = asyncio.Semaphore(self._size)
+        self._idle: Deque[PooledSession] = deque()
+        self._in_use: Set[PooledSession] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self._counter = 0
+        self._closed = False
+        self._stats: Dict[str, int] = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "reconnects": 0,
+            "health_check_failures": 0,
+            "expired": 0,
+            "connect_failures": 0,
+        }
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def start(self, warm: int = 1) -> None:
+        """Start the idle reaper and pre-open `warm` sessions."""
+        self._closed = False
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle(), name="mcp-session-reaper")
+        for _ in range(min(warm, self._size)):
+            entry = await self._connect()
+            self._idle.append(entry)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        entries = list(self._idle) + list(self._in_use)
+        self._idle.clear()
+        self._in_use.clear()
+        await asyncio.gather(*(entry.close() for entry in entries), return_exceptions=True)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[PooledSession]:
+        """Lease a healthy session for the duration of one task."""
+        if self._closed:
+            raise RuntimeError("MCP session pool is closed")
+
+        async with self._slots:
+            entry = await self._checkout()
+            self._in_use.add(entry)
+            failed = False
+            try:
+                yield entry
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self._in_use.discard(entry)
+                entry.last_used = time.monotonic()
+                entry.uses += 1
+                await self._checkin(entry, failed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self._size,
+            "open": len(self._idle) + len(self._in_use),
+            "idle": len(self._idle),
+            "in_use": len(self._in_use),
+            "idle_timeout": self._idle_timeout,
+            **self._stats,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    async def _checkout(self) -> PooledSession:
+        while self._idle:
+            # LIFO keeps the hottest sessions busy and lets cold ones expire.
+            entry = self._idle.pop()
+            if not entry.alive:
+                self._stats["discarded"] += 1
+                await entry.close()
+                continue
+            if entry.idle_for > self._health_check_after and not await entry.ping(timeout=5.0):
+                self._logger.warning(f"MCP session {entry.index} failed health check, replacing")
+                self._stats["health_check_failures"] += 1
+                self._stats["discarded"] += 1
+                await entry.close()
+                continue
+            self._stats["reused"] += 1
+            return entry
+        return await self._connect()
+
+    async def _checkin(self, entry: PooledSession, failed: bool) -> None:
+        if self._closed:
+            await entry.close()
+            return
+        if failed and not await entry.ping(timeout=5.0):
+            self._logger.warning(f"MCP session {entry.index} is unhealthy after a failed task, dropping")
+            self._stats["health_check_failures"] += 1
+            self._stats["discarded"] += 1
+            await entry.close()
+            return
+        if not entry.alive:
+            self._stats["discarded"] += 1
+            await entry.close()
+            return
+        self._idle.append(entry)
+
+    async def _connect(self) -> PooledSession:
+        delay = 0.5
+        last_error: Optional[BaseException] = None
+        for attempt in range(1, self._reconnect_attempts + 1):
+            if attempt > 1:
+                self._stats["reconnects"] += 1
+            self._counter += 1
+            entry = PooledSession(self._server_params, self._counter)
+            try:
+                await entry.open(timeout=self._connect_timeout)
+                if self._on_connect:
+                    await self._on_connect(entry.session)
+                self._stats["created"] += 1
+                self._logger.info(f"Opened MCP session {entry.index} (attempt {attempt})")
+                return entry
+            except Exception as exc:
+                last_error = exc
+                self._stats["connect_failures"] += 1
+                self._logger.warning(f"MCP connect attempt {attempt} failed: {exc}")
+                await entry.close()
+                if attempt < self._reconnect_attempts:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        raise ConnectionError(f"Could not open MCP session: {last_error}")
+
+    async def _reap_idle(self) -> None:
+        interval = max(1.0, min(self._idle_timeout / 4, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            expired = [entry for entry in self._idle if entry.idle_for > self._idle_timeout]
+            for entry in expired:
+                self._idle.remove(entry)
+                self._stats["expired"] += 1
+                self._logger.info(f"Closing MCP session {entry.index} after {entry.idle_for:.0f}s idle")
+                await entry.close()